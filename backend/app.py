@@ -1,56 +1,229 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context, g, current_app, has_app_context
+from flask.cli import with_appcontext
+import click
 from flask_sqlalchemy import SQLAlchemy
-from flask_marshmallow import Marshmallow
 from flask_cors import CORS
 from flask_restful import Api, Resource
-from flask_migrate import Migrate
 from flask_bcrypt import Bcrypt
-from dotenv import load_dotenv
+from werkzeug.exceptions import ServiceUnavailable, TooManyRequests, Unauthorized, Forbidden
+from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
+from collections import OrderedDict
+from functools import wraps
+from werkzeug.middleware.proxy_fix import ProxyFix
+from concurrent.futures import ProcessPoolExecutor
+import bcrypt as bcrypt_lib
+from sqlalchemy.orm import joinedload
 from datetime import datetime, timedelta, timezone
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import csv
+import functools
+import hashlib
+import heapq
+import io
+import hmac
+import json
+import math
 import os
-
-load_dotenv()
-
-app = Flask(__name__)
-
-# Database configuration - PostgreSQL for production, SQLite for development
-if os.environ.get("DATABASE_URL"):
-    # Production: Use PostgreSQL from Render
-    app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL").replace("postgres://", "postgresql://", 1)
-else:
-    # Development: Use SQLite
-    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///app.db"
-
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-app.config["SECRET_KEY"] = os.environ.get("SECRET_KEY", "dev-secret-key-change-in-production")
-
-db = SQLAlchemy(app)
-ma = Marshmallow(app)
-migrate = Migrate(app, db)
-bcrypt = Bcrypt(app)
-api = Api(app)
-
-# CORS configuration for production
-allowed_origins = [
-    "http://localhost:5173",  # Development frontend
-    "http://localhost:3000",  # Alternative dev port
-    "https://project-p4-lovat.vercel.app",  # Production frontend
-    os.environ.get("FRONTEND_URL", ""),  # Additional frontend URL from env
-]
-
-# Remove empty strings and add wildcard for development
-allowed_origins = [origin for origin in allowed_origins if origin]
-if not os.environ.get("FRONTEND_URL"):
-    allowed_origins.append("*")  # Allow all origins in development
-
-CORS(app, resources={
-    r"/*": {
-        "origins": allowed_origins,
-        "methods": ["GET", "POST", "PUT", "DELETE", "PATCH", "OPTIONS"],
-        "allow_headers": ["Content-Type", "Authorization"],
-        "supports_credentials": True
-    }
-})
+import threading
+import time
+import zlib
+
+from archival import add_months, ensure_monthly_partitions, month_start, move_in_batches, oldest
+from compression import compress, compress_stream, negotiate
+from config import load_config
+from ratelimit import RateLimiter, make_store
+from replicas import ReplicaMonitor, RoutingSession, init_replica, replica_engine, wrote_recently
+from metrics import Registry
+from pubsub import Broker
+from querywatch import explain, n_plus_one_suspects, statement_shape
+from serializers import RowSerializer
+from webhooks import WebhookSender
+
+# Extensions are bound to an app in create_app(); the session routes GET reads to a replica
+db = SQLAlchemy(session_options={"class_": RoutingSession})
+bcrypt = Bcrypt()
+api = Api()
+
+
+# Request, database, bcrypt and expiry sweep instrumentation, exposed at /metrics
+metrics = Registry()
+REQUEST_LABELS = ("method", "route")
+requests_total = metrics.counter(
+    "http_requests_total", "Requests handled, by route and status code", ("method", "route", "status"))
+request_seconds = metrics.histogram(
+    "http_request_duration_seconds", "Time until the response starts", REQUEST_LABELS)
+request_queries = metrics.histogram(
+    "http_request_db_queries", "SQL statements executed per request", REQUEST_LABELS,
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100))
+request_db_seconds = metrics.histogram(
+    "http_request_db_seconds", "Total time spent in SQL per request", REQUEST_LABELS)
+db_queries_total = metrics.counter(
+    "db_queries_total", "SQL statements executed, by route", ("route",))
+n_plus_one_total = metrics.counter(
+    "db_n_plus_one_suspects_total", "Requests that repeated one statement shape (QUERY_DEBUG only)", ("route",))
+bcrypt_seconds = metrics.histogram(
+    "bcrypt_duration_seconds", "Time callers spend waiting on bcrypt, including pool queueing", ("operation",),
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0))
+expired_total = metrics.counter(
+    "subscriptions_expired_total", "Subscriptions the expiry sweeper moved to expired")
+expiry_rows_per_second = metrics.gauge(
+    "expiry_sweep_rows_per_second", "Rows expired per second in the last sweep")
+expiry_lag_seconds = metrics.gauge(
+    "expiry_sweep_lag_seconds", "How long the oldest overdue subscription had been left active at the last sweep")
+
+# Per-request SQL tally; greenlet-local under gevent's monkey-patching
+query_stats = threading.local()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_query_started", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    if getattr(query_stats, "active", False):
+        query_stats.count += 1
+        query_stats.seconds += elapsed
+        if query_stats.shapes is not None:
+            query_stats.shapes.append(statement_shape(statement))
+
+    # Engines outside an app (e.g. the benchmarks' scratch databases) are never logged
+    slow_ms = current_app.config["SLOW_QUERY_MS"] if has_app_context() else 0
+    if slow_ms and elapsed * 1000 >= slow_ms:
+        plan = None if executemany else explain(conn, statement, parameters)
+        current_app.logger.warning("Slow query (%.1f ms): %s\n%s", elapsed * 1000, statement, plan or "")
+
+
+def report_n_plus_one(route, response):
+    """Log statement shapes this request repeated; exposes the tally in debug headers"""
+    response.headers["X-Query-Count"] = str(query_stats.count)
+    suspects = n_plus_one_suspects(query_stats.shapes, current_app.config["N_PLUS_ONE_THRESHOLD"])
+    if not suspects:
+        return
+    n_plus_one_total.inc((route,))
+    response.headers["X-N-Plus-One"] = str(len(suspects))
+    for shape, count in suspects:
+        current_app.logger.warning("Possible N+1 in %s %s: %d x %s", request.method, route, count, shape)
+
+
+def start_request_metrics():
+    config = current_app.config
+    if not (config["METRICS_ENABLED"] or config["QUERY_DEBUG"]):
+        return
+    if config["METRICS_ENABLED"]:
+        metrics.start(config["METRICS_DIR"] or None, config["METRICS_FLUSH_INTERVAL"])
+    g.request_started = time.perf_counter()
+    query_stats.active = True
+    query_stats.count = 0
+    query_stats.seconds = 0.0
+    query_stats.shapes = [] if config["QUERY_DEBUG"] else None
+
+
+def record_request_metrics(response):
+    started = g.pop("request_started", None)
+    if started is None:
+        return response
+    query_stats.active = False
+    # Label by URL rule, never the raw path, to keep the series count bounded
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    if query_stats.shapes is not None:
+        report_n_plus_one(route, response)
+    if not current_app.config["METRICS_ENABLED"]:
+        return response
+
+    labels = (request.method, route)
+    request_seconds.observe(time.perf_counter() - started, labels)
+    requests_total.inc((request.method, route, str(response.status_code)))
+    request_queries.observe(query_stats.count, labels)
+    request_db_seconds.observe(query_stats.seconds, labels)
+    if query_stats.count:
+        db_queries_total.inc((route,), query_stats.count)
+    return response
+
+
+# Text bodies worth compressing; text/event-stream is deliberately absent so SSE
+# events are never held back in a compressor's buffer
+COMPRESSIBLE_TYPES = {"application/json", "application/x-ndjson", "text/csv", "text/plain", "text/html"}
+
+
+def compress_response(response):
+    """Gzip/brotli-encode text responses for clients that send a matching Accept-Encoding"""
+    config = current_app.config
+    if not config["COMPRESSION_ENABLED"] or response.mimetype not in COMPRESSIBLE_TYPES:
+        return response
+    response.vary.add("Accept-Encoding")
+    if (response.status_code < 200 or response.status_code in (204, 304)
+            or "Content-Encoding" in response.headers or request.method == "HEAD"):
+        return response
+    encoding = negotiate(request.headers.get("Accept-Encoding"))
+    if encoding is None:
+        return response
+
+    level = config["COMPRESSION_LEVEL"]
+    if response.is_streamed:
+        response.response = compress_stream(response.iter_encoded(), encoding, level)
+        response.headers.pop("Content-Length", None)
+    else:
+        data = response.get_data()
+        if len(data) < config["COMPRESSION_MIN_SIZE"]:
+            return response
+        response.set_data(compress(data, encoding, level))
+    response.headers["Content-Encoding"] = encoding
+    # The encoded bytes differ from the identity body; a weak ETag still satisfies If-None-Match
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+# Read/write routing: GETs read from the replica unless the client just wrote or the replica lags
+def replica_monitor():
+    return current_app.extensions["replica_monitor"]
+
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+def route_reads():
+    engine = replica_engine()
+    if engine is None:
+        return
+    db.session.info["read_replica"] = (
+        request.method in ("GET", "HEAD")
+        and not wrote_recently(request.headers.get("X-Last-Write"), current_app.config["REPLICA_MAX_LAG"])
+        and replica_monitor().healthy(engine)
+    )
+
+
+def mark_writes(response):
+    """Tell the client when it last wrote so it can send X-Last-Write back and read its own writes"""
+    if (replica_engine() is not None and request.method not in SAFE_METHODS
+            and response.status_code < 400):
+        response.headers["X-Last-Write"] = f"{time.time():.3f}"
+    return response
+
+
+def reporting_engine():
+    """The replica for long report reads while it is healthy, otherwise the primary"""
+    engine = replica_engine()
+    if engine is not None and replica_monitor().healthy(engine):
+        return engine
+    return db.engine
+
+
+def read_from_primary(f):
+    """For GET handlers that must see writes the moment they commit"""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        db.session.info["read_replica"] = False
+        return f(*args, **kwargs)
+    return decorated
 
 
 class User(db.Model):
@@ -66,6 +239,17 @@ class Plan(db.Model):
     price = db.Column(db.Integer, nullable=False)
 
 class Subscription(db.Model):
+    __table_args__ = (
+        # Overlap check, per-user listing and status filters
+        db.Index("ix_subscription_user_status_ends", "user_id", "status", "ends_at"),
+        # Only the (small) active set, ordered by expiry
+        db.Index(
+            "ix_subscription_active_ends", "ends_at",
+            postgresql_where=db.text("status = 'active'"),
+            sqlite_where=db.text("status = 'active'"),
+        ),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
     plan_id = db.Column(db.Integer, db.ForeignKey("plan.id"), nullable=False)
@@ -73,7 +257,13 @@ class Subscription(db.Model):
     timestamp = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     ends_at = db.Column(db.DateTime)
 
+    plan = db.relationship("Plan", backref="subscriptions")
+
 class UserPlanHistory(db.Model):
+    __table_args__ = (
+        db.Index("ix_user_plan_history_user_purchase", "user_id", "purchase_date"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
     plan_id = db.Column(db.Integer, db.ForeignKey("plan.id"), nullable=False)
@@ -84,41 +274,658 @@ class UserPlanHistory(db.Model):
     user = db.relationship("User", backref="plan_history")
     plan = db.relationship("Plan", backref="user_history")
 
+class SubscriptionArchive(db.Model):
+    """Subscriptions moved out of the hot table by `flask archive` once they ended.
+
+    On PostgreSQL this is natively partitioned by month of ends_at (the
+    command creates partitions as needed), which is why ends_at is part of
+    the key; elsewhere it is a plain table.
+    """
+    __tablename__ = "subscription_archive"
+    __table_args__ = (
+        db.Index("ix_subscription_archive_user_ends", "user_id", "ends_at"),
+        {"postgresql_partition_by": "RANGE (ends_at)"},
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    plan_id = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(50))
+    timestamp = db.Column(db.DateTime)
+    ends_at = db.Column(db.DateTime, primary_key=True)
+
+class UserPlanHistoryArchive(db.Model):
+    """Purchase history moved out of the hot table by `flask archive`, partitioned by month of purchase_date"""
+    __tablename__ = "user_plan_history_archive"
+    __table_args__ = (
+        db.Index("ix_user_plan_history_archive_user_purchase", "user_id", "purchase_date"),
+        {"postgresql_partition_by": "RANGE (purchase_date)"},
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    plan_id = db.Column(db.Integer, nullable=False)
+    purchase_date = db.Column(db.DateTime, primary_key=True)
+    rating = db.Column(db.Integer, nullable=True)
+    review = db.Column(db.Text, nullable=True)
+
+class PlanStats(db.Model):
+    """Running per-plan totals, kept up to date as history rows are written"""
+    __tablename__ = "plan_stats"
+
+    plan_id = db.Column(db.Integer, db.ForeignKey("plan.id"), primary_key=True)
+    purchase_count = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.BigInteger, nullable=False, default=0)
+    rating_count = db.Column(db.Integer, nullable=False, default=0)
+    rating_sum = db.Column(db.Integer, nullable=False, default=0)
+    review_count = db.Column(db.Integer, nullable=False, default=0)
+
+
+@functools.cache
+def schema_classes():
+    """Define the marshmallow schemas on first use; importing marshmallow-sqlalchemy is slow"""
+    from flask_marshmallow import Marshmallow
+
+    ma = Marshmallow()
+
+    class PlanSchema(ma.SQLAlchemyAutoSchema):
+        class Meta:
+            model = Plan
+            load_instance = True
+
+    class UserSchema(ma.SQLAlchemyAutoSchema):
+        class Meta:
+            model = User
+            load_instance = True
+
+    class SubscriptionSchema(ma.SQLAlchemyAutoSchema):
+        class Meta:
+            model = Subscription
+            load_instance = True
+            include_fk = True
+
+    class UserPlanHistorySchema(ma.SQLAlchemyAutoSchema):
+        class Meta:
+            model = UserPlanHistory
+            load_instance = True
+            include_fk = True
+
+    return {
+        "plan": PlanSchema,
+        "user": UserSchema,
+        "subscription": SubscriptionSchema,
+        "user_plan_history": UserPlanHistorySchema,
+    }
+
+
+class LazySchema:
+    """Stands in for a schema instance and builds the real one when first used"""
+
+    def __init__(self, model, **kwargs):
+        self.model = model
+        self.kwargs = kwargs
+        self._schema = None
+
+    def __getattr__(self, name):
+        if self._schema is None:
+            self._schema = schema_classes()[self.model](**self.kwargs)
+        return getattr(self._schema, name)
+
+
+plan_schema = LazySchema("plan")
+plans_schema = LazySchema("plan", many=True)
+user_schema = LazySchema("user")
+users_schema = LazySchema("user", many=True)
+subscription_schema = LazySchema("subscription")
+subscriptions_schema = LazySchema("subscription", many=True)
+user_plan_history_schema = LazySchema("user_plan_history")
+user_plan_histories_schema = LazySchema("user_plan_history", many=True)
+
+
+@functools.lru_cache(maxsize=256)
+def row_serializer(model, fields=None):
+    """Tuple-row encoder for list endpoints (same JSON as the schemas), one per sparse fieldset"""
+    return RowSerializer(model, fields)
+
+
+def with_archive(model, archive, include_archived):
+    """`model`'s table, or a UNION ALL of it and its archive table when archived rows are wanted.
+
+    Either way the result has the same .c columns, so queries are written once.
+    """
+    if not include_archived:
+        return model.__table__
+    columns = [column.name for column in model.__table__.columns]
+    return db.union_all(
+        db.select(*(model.__table__.c[name] for name in columns)),
+        db.select(*(archive.__table__.c[name] for name in columns)),
+    ).subquery(f"{model.__tablename__}_all")
+
+
+STATS_COUNTERS = ["purchase_count", "revenue", "rating_count", "rating_sum", "review_count"]
+
+
+def plan_stats_summary(stats):
+    """Public view of a PlanStats row (or zeros for a plan nobody has bought)"""
+    if stats is None:
+        return {"purchase_count": 0, "revenue": 0, "review_count": 0, "rating_count": 0, "average_rating": None}
+    return {
+        "purchase_count": stats.purchase_count,
+        "revenue": stats.revenue,
+        "review_count": stats.review_count,
+        "rating_count": stats.rating_count,
+        "average_rating": round(stats.rating_sum / stats.rating_count, 2) if stats.rating_count else None,
+    }
+
+
+def bump_plan_stats(entries):
+    """Add newly written purchases and reviews to the plan_stats rollup.
+
+    `entries` holds (plan_id, purchases, price, rating, review) per change:
+    purchases is 1 for a new subscription, -1 for a cancelled one and 0 for a
+    review, and revenue moves by purchases * price. Runs in the caller's
+    transaction, one atomic increment-upsert per plan, so the totals commit
+    (or roll back) together with the rows they count.
+    """
+    for stmt in plan_stats_upserts(entries, db.engine.dialect.name):
+        db.session.execute(stmt)
+
+
+def plan_stats_upserts(entries, dialect_name):
+    """The increment-upserts bump_plan_stats runs for `entries`, in plan order"""
+    totals = {}
+    for plan_id, purchases, price, rating, review in entries:
+        counters = totals.setdefault(plan_id, dict.fromkeys(STATS_COUNTERS, 0))
+        counters["purchase_count"] += purchases
+        counters["revenue"] += purchases * (price or 0)
+        if rating is not None:
+            counters["rating_count"] += 1
+            counters["rating_sum"] += rating
+        if review:
+            counters["review_count"] += 1
+
+    from sqlalchemy.dialects import postgresql, sqlite
+
+    dialect_insert = postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+    # Plan order keeps concurrent writers from deadlocking on the stats rows
+    for plan_id in sorted(totals):
+        stmt = dialect_insert(PlanStats).values(plan_id=plan_id, **totals[plan_id])
+        yield stmt.on_conflict_do_update(
+            index_elements=[PlanStats.plan_id],
+            set_={name: getattr(PlanStats, name) + getattr(stmt.excluded, name) for name in STATS_COUNTERS},
+        )
+
+
+def rebuild_plan_stats():
+    """Recompute plan_stats, archived rows included; returns the number of plans.
+
+    Purchases and revenue come from subscriptions, ratings and reviews from
+    history: every purchase also writes a history row, so counting those would
+    turn each review into a sale.
+    """
+    db.session.execute(db.delete(PlanStats))
+    subs = with_archive(Subscription, SubscriptionArchive, True)
+    history = with_archive(UserPlanHistory, UserPlanHistoryArchive, True)
+    purchases = (
+        db.select(subs.c.plan_id, db.func.count().label("purchase_count"))
+        .group_by(subs.c.plan_id)
+        .subquery()
+    )
+    reviews = (
+        db.select(
+            history.c.plan_id,
+            db.func.count(history.c.rating).label("rating_count"),
+            db.func.coalesce(db.func.sum(history.c.rating), 0).label("rating_sum"),
+            db.func.count(db.case((history.c.review != "", 1))).label("review_count"),
+        )
+        .group_by(history.c.plan_id)
+        .subquery()
+    )
+    aggregates = (
+        db.select(
+            Plan.id,
+            db.func.coalesce(purchases.c.purchase_count, 0),
+            db.func.coalesce(purchases.c.purchase_count, 0) * Plan.price,
+            db.func.coalesce(reviews.c.rating_count, 0),
+            db.func.coalesce(reviews.c.rating_sum, 0),
+            db.func.coalesce(reviews.c.review_count, 0),
+        )
+        .outerjoin(purchases, purchases.c.plan_id == Plan.id)
+        .outerjoin(reviews, reviews.c.plan_id == Plan.id)
+        .where(db.or_(purchases.c.plan_id.is_not(None), reviews.c.plan_id.is_not(None)))
+    )
+    result = db.session.execute(
+        db.insert(PlanStats).from_select(["plan_id"] + STATS_COUNTERS, aggregates)
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+PLAN_CATALOG = db.select(Plan, PlanStats).outerjoin(PlanStats, PlanStats.plan_id == Plan.id).order_by(Plan.id)
+
+
+def render_catalog(rows):
+    """The /plans JSON body for PLAN_CATALOG's (Plan, PlanStats) rows"""
+    catalog = []
+    for plan, stats in rows:
+        item = plan_schema.dump(plan)
+        item["stats"] = plan_stats_summary(stats)
+        catalog.append(item)
+    return json.dumps(catalog).encode("utf-8")
+
+
+class PlanCatalogCache:
+    """Per-worker cache of the serialized /plans payload and its ETag.
+
+    Writes through this process invalidate it straight away; the TTL bounds how
+    long other gunicorn workers can keep serving an older catalog, and how
+    stale the embedded plan_stats figures can get.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entry = None
+
+    def get(self):
+        entry = self._entry
+        if entry and entry["expires"] > time.monotonic():
+            return entry
+
+        with self._lock:
+            entry = self._entry
+            if entry and entry["expires"] > time.monotonic():
+                return entry
+            # Rebuilt from the primary, or a plan write made here could be cached stale for the whole TTL
+            body = render_catalog(db.session.execute(PLAN_CATALOG, bind_arguments={"bind": db.engine}).all())
+            entry = {
+                "body": body,
+                "etag": hashlib.sha256(body).hexdigest(),
+                "expires": time.monotonic() + current_app.config["PLAN_CACHE_TTL"],
+            }
+            self._entry = entry
+            return entry
+
+    def invalidate(self):
+        self._entry = None
+
+
+def plan_cache():
+    return current_app.extensions["plan_cache"]
+
+
+@event.listens_for(db.session, "after_flush")
+def mark_plan_changes(session, flush_context):
+    if any(isinstance(obj, Plan) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info["plans_changed"] = True
+
+
+@event.listens_for(db.session, "after_commit")
+def invalidate_plan_cache(session):
+    # Only drop the cache once the new rows are visible to other connections
+    if session.info.pop("plans_changed", False):
+        plan_cache().invalidate()
+
+
+def hash_password(password, rounds):
+    """Return a bcrypt hash of `password`; runs inside the hashing pool"""
+    return bcrypt_lib.hashpw(password.encode("utf-8"), bcrypt_lib.gensalt(rounds)).decode("utf-8")
+
+
+def check_password(password_hash, password):
+    """Check `password` against a stored bcrypt hash; runs inside the hashing pool"""
+    return bcrypt_lib.checkpw(password.encode("utf-8"), password_hash.encode("utf-8"))
+
+
+class HashingBusy(ServiceUnavailable):
+    description = "Server is busy, please try again shortly"
+
+
+class PasswordHasher:
+    """Runs bcrypt in a per-worker process pool instead of on the request thread.
+
+    At most `max_pending` hashes may be queued or running; callers past that
+    wait up to `wait_timeout` seconds and then get a 503 instead of piling up.
+    """
+
+    def __init__(self, rounds=12, pool_size=0, max_pending=64, wait_timeout=10):
+        self.wait_timeout = wait_timeout
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pool_pid = None
+        self.rounds = rounds
+        self.pool_size = pool_size
+        self.max_pending = max_pending
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def _executor(self):
+        # Created lazily, and again after a fork, so every gunicorn worker owns its pool
+        if self._pool is None or self._pool_pid != os.getpid():
+            with self._lock:
+                if self._pool is None or self._pool_pid != os.getpid():
+                    self._pool = ProcessPoolExecutor(max_workers=self.pool_size)
+                    self._pool_pid = os.getpid()
+        return self._pool
+
+    def executor(self):
+        """The hashing pool, or None when BCRYPT_POOL_SIZE is 0 and hashes run on the caller's thread"""
+        return self._executor() if self.pool_size else None
+
+    def _run(self, fn, *args):
+        if not self.pool_size:
+            return fn(*args)
+        if not self._slots.acquire(timeout=self.wait_timeout):
+            raise HashingBusy()
+        try:
+            return self._executor().submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def _timed(self, operation, fn, *args):
+        started = time.perf_counter()
+        try:
+            return self._run(fn, *args)
+        finally:
+            bcrypt_seconds.observe(time.perf_counter() - started, (operation,))
+
+    def hash(self, password):
+        return self._timed("hash", hash_password, password, self.rounds)
+
+    def verify(self, password_hash, password):
+        return self._timed("verify", check_password, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """True when a stored hash was made with a different work factor than ours"""
+        try:
+            return int(password_hash.split("$")[2]) != self.rounds
+        except (IndexError, ValueError):
+            return False
+
+
+# Each app builds its own services in init_services() and keeps them in app.extensions
+def password_hasher():
+    return current_app.extensions["password_hasher"]
+
+
+def rate_limiter():
+    return current_app.extensions["rate_limiter"]
+
+
+def enforce_rate_limits(*checks):
+    """Abort with 429 if any (limit name, key) pair is out of tokens.
+
+    Called before any database or bcrypt work so rejected requests stay cheap.
+    """
+    if not current_app.config["RATE_LIMIT_ENABLED"]:
+        return
+    retry_after = max([rate_limiter().hit(name, key) for name, key in checks if key], default=0)
+    if retry_after:
+        raise TooManyRequests("Too many attempts, please try again later", retry_after=math.ceil(retry_after))
+
+
+class TTLCache:
+    """Small LRU cache whose entries also expire at a per-entry deadline"""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires <= time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, expires=None):
+        deadline = time.time() + self.ttl
+        if expires is not None:
+            deadline = min(deadline, expires)
+        with self._lock:
+            self._data[key] = (value, deadline)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+def principal_cache():
+    return current_app.extensions["principal_cache"]
+
+
+def token_serializer():
+    return current_app.extensions["access_tokens"]
+
+
+def stream_token_serializer():
+    return current_app.extensions["stream_tokens"]
+
+
+def issue_access_token(user):
+    """Sign the user's identity into an expiring bearer token"""
+    return token_serializer().dumps({"id": user.id, "name": user.username, "email": user.email})
+
+
+def resolve_principal(token):
+    """Return the identity inside a valid token, without touching the database"""
+    principal = principal_cache().get(token)
+    if principal is not None:
+        return principal
+
+    max_age = current_app.config["ACCESS_TOKEN_TTL"]
+    try:
+        principal, signed_at = token_serializer().loads(token, max_age=max_age, return_timestamp=True)
+    except SignatureExpired:
+        raise Unauthorized("Access token expired, please log in again")
+    except BadSignature:
+        raise Unauthorized("Invalid access token")
+
+    principal_cache().set(token, principal, expires=signed_at.timestamp() + max_age)
+    return principal
+
+
+def bearer_principal(headers):
+    """The identity in an `Authorization: Bearer <token>` header; 401 when it is missing or invalid"""
+    scheme, _, token = headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise Unauthorized("Missing access token")
+    return resolve_principal(token.strip())
+
+
+def require_auth(method):
+    """Resource method decorator: verify the bearer token and expose it as g.principal"""
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        g.principal = bearer_principal(request.headers)
+        return method(*args, **kwargs)
+    return wrapper
+
+
+def issue_stream_token(user_id):
+    """A token that only opens `user_id`'s event stream, valid for SSE_TOKEN_TTL seconds"""
+    return stream_token_serializer().dumps({"id": user_id})
+
+
+def require_stream_auth(method):
+    """Like require_auth, but also takes ?stream_token= since EventSource cannot send headers.
+
+    Query strings end up in access logs, so the URL carries a stream token
+    that expires within a minute and opens nothing else, never the access token.
+    """
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        token = request.args.get("stream_token")
+        if not token:
+            return require_auth(method)(*args, **kwargs)
+        try:
+            g.principal = stream_token_serializer().loads(token, max_age=current_app.config["SSE_TOKEN_TTL"])
+        except BadSignature:
+            # SignatureExpired included: the client asks for a new one and reconnects
+            raise Unauthorized("Invalid or expired stream token")
+        return method(*args, **kwargs)
+    return wrapper
+
+
+def require_same_user(user_id, message="You can only access your own subscriptions"):
+    if g.principal["id"] != user_id:
+        raise Forbidden(message)
+
+
+def require_operator(method):
+    """Resource method decorator: only callers presenting OPERATOR_API_KEY get through"""
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        expected = current_app.config["OPERATOR_API_KEY"]
+        supplied = request.headers.get("X-Operator-Key", "")
+        if not expected or not hmac.compare_digest(supplied.encode(), expected.encode()):
+            raise Forbidden("Operator key required")
+        return method(*args, **kwargs)
+    return wrapper
+
+
+# Keyset pagination settings for the list endpoints
+DEFAULT_PAGE_LIMIT = 50
+MAX_PAGE_LIMIT = 500
+STREAM_BATCH_SIZE = 1000
+
+
+def as_utc(value):
+    """Treat naive datetimes read back from the database as UTC"""
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def utc_naive(value):
+    """`value` as the naive UTC datetime DateTime columns hold; asyncpg refuses aware ones"""
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def arg_flag(name, args=None):
+    """Return True when a query-string flag such as ?stream=true is set (in `args`, default: this request's)"""
+    args = request.args if args is None else args
+    return args.get(name, "").lower() in ("1", "true", "yes")
+
+
+def int_arg(args, name, default):
+    """An integer query-string argument, or `default` when it is missing or not a number"""
+    try:
+        return int(args.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+RATING_RANGE = (1, 5)
+
+
+def parse_rating(value):
+    """A review rating as an int within RATING_RANGE (None for None); ValueError otherwise"""
+    if value is None:
+        return None
+    low, high = RATING_RANGE
+    # bool is an int subclass, and "5" would reach the rating sums as a string
+    if isinstance(value, bool) or not isinstance(value, int) or not low <= value <= high:
+        raise ValueError(f"rating must be a whole number from {low} to {high}")
+    return value
+
+
+def requested_fields(allowed):
+    """The ?fields= sparse fieldset as a frozenset, or None when every field is wanted"""
+    return parse_fields(request.args.get("fields"), allowed)
+
+
+def parse_fields(raw, allowed):
+    """A comma-separated fieldset as a frozenset (None for None); ValueError names unknown fields"""
+    if raw is None:
+        return None
+    fields = frozenset(name.strip() for name in raw.split(",") if name.strip())
+    unknown = fields.difference(allowed)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}. Choose from: {', '.join(allowed)}")
+    return fields
+
+
+def list_serializer(model, args=None):
+    """The row serializer for `model` narrowed to ?fields=, so unrequested columns are never selected"""
+    args = request.args if args is None else args
+    return row_serializer(model, parse_fields(args.get("fields"), row_serializer(model).keys))
+
+
+def source_columns(serializer, source, filters):
+    """`serializer`'s columns and `column == value` filters, read from `source` (default: the model's table)"""
+    source = serializer.model.__table__ if source is None else source
+    return [source.c[key] for key in serializer.keys], [source.c[key] == value for key, value in filters.items()]
+
+
+def keyset_statement(serializer, source, filters, after, limit):
+    """SELECT the next `limit` of `serializer`'s rows with ids above `after`, in id order"""
+    columns, criteria = source_columns(serializer, source, filters)
+    model_id = columns[0]
+    return db.select(*columns).where(model_id > after, *criteria).order_by(model_id).limit(limit)
+
+
+def page_args(args):
+    """The (after, limit) keyset cursor from ?after= and ?limit=, with the limit clamped"""
+    limit = max(1, min(int_arg(args, "limit", DEFAULT_PAGE_LIMIT), MAX_PAGE_LIMIT))
+    return int_arg(args, "after", 0), limit
 
-class PlanSchema(ma.SQLAlchemyAutoSchema):
-    class Meta:
-        model = Plan
-        load_instance = True
 
-class UserSchema(ma.SQLAlchemyAutoSchema):
-    class Meta:
-        model = User
-        load_instance = True
+def page_body(serializer, rows, limit):
+    """The JSON page for up to limit + 1 rows; the extra row only says another page exists"""
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = json.dumps(rows[-1][0] if has_more else None)
+    return f'{{"items": {serializer.encode_all(rows)}, "limit": {limit}, "next_cursor": {next_cursor}}}\n'
 
-class SubscriptionSchema(ma.SQLAlchemyAutoSchema):
-    class Meta:
-        model = Subscription
-        load_instance = True
-        include_fk = True
 
-class UserPlanHistorySchema(ma.SQLAlchemyAutoSchema):
-    class Meta:
-        model = UserPlanHistory
-        load_instance = True
-        include_fk = True
+def keyset_page(serializer, source=None, **filters):
+    """Return one page of `serializer`'s rows ordered by id, starting after the ?after= cursor.
 
-plan_schema = PlanSchema()
-plans_schema = PlanSchema(many=True)
-user_schema = UserSchema()
-users_schema = UserSchema(many=True)
-subscription_schema = SubscriptionSchema()
-subscriptions_schema = SubscriptionSchema(many=True)
-user_plan_history_schema = UserPlanHistorySchema()
-user_plan_histories_schema = UserPlanHistorySchema(many=True)
+    Fetches limit + 1 rows so we know whether another page exists without
+    running a COUNT(*) over the whole table. Rows are read as tuples and
+    encoded straight to the JSON Flask-RESTful would have written for the
+    equivalent dict.
+    """
+    after, limit = page_args(request.args)
+    rows = db.session.execute(keyset_statement(serializer, source, filters, after, limit + 1)).all()
+    return Response(page_body(serializer, rows, limit), mimetype="application/json")
+
+
+def stream_all(serializer, source=None, **filters):
+    """Stream every one of `serializer`'s rows as one JSON array, walking them in id-ordered batches"""
+    encode = serializer.encode
+
+    def generate():
+        yield "["
+        after = 0
+        first = True
+        while True:
+            statement = keyset_statement(serializer, source, filters, after, STREAM_BATCH_SIZE)
+            rows = db.session.execute(statement).all()
+            if not rows:
+                break
+            # Plain tuples never enter the identity map, so memory stays flat
+            yield ("" if first else ",") + ",".join(map(encode, rows))
+            first = False
+            after = rows[-1][0]
+        yield "]"
+
+    return Response(stream_with_context(generate()), mimetype="application/json")
 
 
 class RegisterResource(Resource):
     def post(self):
+        enforce_rate_limits(("register_ip", request.remote_addr))
+
         data = request.json
         name = data.get("name")
         email = data.get("email")
@@ -131,7 +938,7 @@ class RegisterResource(Resource):
         if existing_user:
             return {"message": "User already exists"}, 400
 
-        hashed_password = bcrypt.generate_password_hash(password).decode('utf-8')
+        hashed_password = password_hasher().hash(password)
         new_user = User(username=name, email=email, password_hash=hashed_password)
         db.session.add(new_user)
         db.session.commit()
@@ -147,6 +954,11 @@ class LoginResource(Resource):
         email = data.get("email")
         password = data.get("password")
 
+        enforce_rate_limits(
+            ("login_ip", request.remote_addr),
+            ("login_email", email.strip().lower() if isinstance(email, str) else None),
+        )
+
         if not email or not password:
             return {"message": "Email and password required"}, 400
 
@@ -154,22 +966,48 @@ class LoginResource(Resource):
         if not user:
             return {"message": "Invalid credentials"}, 401
 
-        if not bcrypt.check_password_hash(user.password_hash, password):
+        hasher = password_hasher()
+        if not hasher.verify(user.password_hash, password):
             return {"message": "Invalid credentials"}, 401
 
-        return {"id": user.id, "name": user.username, "email": user.email}, 200
+        # Upgrade hashes made with an older work factor while we have the plaintext
+        if hasher.needs_rehash(user.password_hash):
+            user.password_hash = hasher.hash(password)
+            db.session.commit()
+
+        return {
+            "id": user.id,
+            "name": user.username,
+            "email": user.email,
+            "access_token": issue_access_token(user),
+            "token_type": "Bearer",
+            "expires_in": current_app.config["ACCESS_TOKEN_TTL"],
+        }, 200
 
 class PlansResource(Resource):
     def get(self):
-        plans = Plan.query.all()
-        return plans_schema.dump(plans), 200
+        catalog = plan_cache().get()
+        response = Response(catalog["body"], mimetype="application/json")
+        response.set_etag(catalog["etag"])
+        response.cache_control.public = True
+        response.cache_control.max_age = current_app.config["PLANS_MAX_AGE"]
+        # Turns the response into a 304 when If-None-Match matches the ETag
+        return response.make_conditional(request)
 
 class UsersResource(Resource):
+    method_decorators = {"patch": [require_auth], "delete": [require_auth]}
+
     def get(self):
-        users = User.query.all()
-        return users_schema.dump(users), 200
+        try:
+            serializer = list_serializer(User)
+        except ValueError as e:
+            return {"error": str(e)}, 400
+        if arg_flag("stream"):
+            return stream_all(serializer)
+        return keyset_page(serializer)
 
     def patch(self, user_id):
+        require_same_user(user_id, "You can only change your own account")
         user = User.query.get_or_404(user_id)
         data = request.json
 
@@ -178,34 +1016,106 @@ class UsersResource(Resource):
         if 'email' in data:
             user.email = data['email']
         if 'password' in data:
-            user.password_hash = bcrypt.generate_password_hash(data['password']).decode('utf-8')
+            user.password_hash = password_hasher().hash(data['password'])
 
         db.session.commit()
         return user_schema.dump(user), 200
 
     def delete(self, user_id):
+        require_same_user(user_id, "You can only delete your own account")
         user = User.query.get_or_404(user_id)
         db.session.delete(user)
         db.session.commit()
         return {"message": "User deleted successfully"}, 200
 
+def lock_user(user_id):
+    """Load a user and hold a write lock on their row until the transaction ends.
+
+    Concurrent purchases for the same user queue up here, so the overlap check
+    that follows always sees the other request's committed subscription.
+    """
+    if db.engine.dialect.name == "sqlite":
+        # SQLite has no row locks; a write takes the database-wide RESERVED
+        # lock up front, which is the strongest guard it offers
+        db.session.execute(db.update(User).where(User.id == user_id).values(id=User.id))
+    return db.session.query(User).filter(User.id == user_id).with_for_update().first()
+
+
+# Keep IN (...) lists well under SQLite's bound-parameter limit
+IN_CLAUSE_CHUNK = 900
+
+
+def chunked(values, size=IN_CLAUSE_CHUNK):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def lock_users(user_ids):
+    """Bulk lock_user: lock every existing user in `user_ids` and return the ids found"""
+    user_ids = sorted(set(user_ids))
+    if user_ids and db.engine.dialect.name == "sqlite":
+        db.session.execute(db.update(User).where(User.id == user_ids[0]).values(id=User.id))
+
+    found = set()
+    # Locking in id order means two overlapping batches can never deadlock
+    for chunk in chunked(user_ids):
+        found.update(db.session.scalars(
+            db.select(User.id).where(User.id.in_(chunk)).order_by(User.id).with_for_update()
+        ))
+    return found
+
+
+def subscription_conflict(expires_at, now):
+    """The 409 body for a purchase made while a subscription ending at `expires_at` is still active"""
+    # Calculate remaining time
+    remaining_time = as_utc(expires_at) - now
+    hours = int(remaining_time.total_seconds() // 3600)
+    minutes = int((remaining_time.total_seconds() % 3600) // 60)
+
+    time_str = ""
+    if hours > 0:
+        time_str += f"{hours} hour{'s' if hours > 1 else ''}"
+    if minutes > 0:
+        if time_str:
+            time_str += f" and {minutes} minute{'s' if minutes > 1 else ''}"
+        else:
+            time_str = f"{minutes} minute{'s' if minutes > 1 else ''}"
+
+    return {
+        "error": "You already have an active subscription",
+        "message": f"Your current subscription expires in {time_str}. Please wait until it expires before subscribing to a new plan.",
+        "current_subscription": {
+            "expires_at": expires_at.isoformat(),
+            "remaining_time": time_str
+        }
+    }
+
+
 class SubscriptionsResource(Resource):
+    method_decorators = {"post": [require_auth]}
+
     def post(self):
         try:
             data = request.get_json()
             if not data:
                 return {"error": "Missing JSON body"}, 400
 
-            user_id = data.get("user_id")
+            # The buyer is whoever the access token says, never a client-supplied id
+            user_id = g.principal["id"]
             plan_id = data.get("plan_id")
 
-            if not user_id or not plan_id:
-                return {"error": "user_id and plan_id required"}, 400
+            if data.get("user_id") not in (None, user_id):
+                return {"error": "You can only purchase subscriptions for yourself"}, 403
+            if not plan_id:
+                return {"error": "plan_id required"}, 400
 
-            user = db.session.get(User, user_id)
+            # Everything below runs in one transaction, serialized per user
+            user = lock_user(user_id)
             plan = db.session.get(Plan, plan_id)
 
             if not user or not plan:
+                db.session.rollback()
                 return {"error": "Invalid user or plan"}, 400
 
             # Check for existing active subscriptions that haven't expired
@@ -217,33 +1127,10 @@ class SubscriptionsResource(Resource):
             ).first()
 
             if existing_active_sub:
-                # Ensure both datetimes are timezone-aware for comparison
-                ends_at = existing_active_sub.ends_at
-                if ends_at.tzinfo is None:
-                    ends_at = ends_at.replace(tzinfo=timezone.utc)
-
-                # Calculate remaining time
-                remaining_time = ends_at - now
-                hours = int(remaining_time.total_seconds() // 3600)
-                minutes = int((remaining_time.total_seconds() % 3600) // 60)
-
-                time_str = ""
-                if hours > 0:
-                    time_str += f"{hours} hour{'s' if hours > 1 else ''}"
-                if minutes > 0:
-                    if time_str:
-                        time_str += f" and {minutes} minute{'s' if minutes > 1 else ''}"
-                    else:
-                        time_str = f"{minutes} minute{'s' if minutes > 1 else ''}"
-
-                return {
-                    "error": "You already have an active subscription",
-                    "message": f"Your current subscription expires in {time_str}. Please wait until it expires before subscribing to a new plan.",
-                    "current_subscription": {
-                        "expires_at": existing_active_sub.ends_at.isoformat(),
-                        "remaining_time": time_str
-                    }
-                }, 409  # Conflict status code
+                # Release the user lock; nothing is written on a conflict
+                expires_at = existing_active_sub.ends_at
+                db.session.rollback()
+                return subscription_conflict(expires_at, now), 409  # Conflict status code
 
             ends_at = now + timedelta(minutes=plan.duration_minutes)
 
@@ -255,69 +1142,623 @@ class SubscriptionsResource(Resource):
                 timestamp=now
             )
 
-            db.session.add(sub)
-            db.session.commit()
-
             # Also create UserPlanHistory entry
             history = UserPlanHistory(
                 user_id=user.id,
                 plan_id=plan.id,
                 purchase_date=now
             )
-            db.session.add(history)
+            db.session.add_all([sub, history])
+            bump_plan_stats([(plan.id, 1, plan.price, None, None)])
             db.session.commit()
+            access_index().grant(user.id, sub.id, ends_at)
+            expiry_scheduler().notify(sub.id, user.id, ends_at)
+            subscription_events().publish(user.id, {"type": "created", "subscription_id": sub.id})
 
             return subscription_schema.dump(sub), 201
 
         except Exception as e:
-            print("Error creating subscription:", str(e))
+            db.session.rollback()
+            current_app.logger.exception("Error creating subscription")
             return {"error": "Subscription failed", "details": str(e)}, 500
 
-class UserSubscriptionsResource(Resource):
-    def get(self, user_id):
-        subs = Subscription.query.filter_by(user_id=user_id).all()
+class BulkSubscriptionsResource(Resource):
+    """Provision many (user_id, plan_id) pairs at once for venue operators.
+
+    Users, plans and the overlap check are each resolved with set-based
+    queries, and every Subscription/UserPlanHistory row is written with bulk
+    inserts in a single transaction. Each item gets its own result.
+    """
+
+    method_decorators = [require_operator]
+
+    def post(self):
+        data = request.get_json(silent=True) or {}
+        items = data.get("items")
+        if not isinstance(items, list) or not items:
+            return {"error": "items must be a non-empty list of {user_id, plan_id}"}, 400
+        if len(items) > current_app.config["BULK_MAX_ITEMS"]:
+            return {"error": f"At most {current_app.config['BULK_MAX_ITEMS']} items per request"}, 400
+
         results = []
-        for sub in subs:
-            plan = db.session.get(Plan, sub.plan_id)
-            results.append({
-                "id": sub.id,
-                "status": sub.status,
-                "timestamp": sub.timestamp.isoformat() if sub.timestamp else None,
-                "ends_at": sub.ends_at.isoformat() if sub.ends_at else None,
-                "plan": {
-                    "id": plan.id,
-                    "name": plan.name,
-                    "duration_minutes": plan.duration_minutes,
-                    "price": plan.price
-                }
-            })
+        pairs = []
+        for index, item in enumerate(items):
+            user_id = item.get("user_id") if isinstance(item, dict) else None
+            plan_id = item.get("plan_id") if isinstance(item, dict) else None
+            results.append({"index": index, "user_id": user_id, "plan_id": plan_id})
+            if isinstance(user_id, int) and isinstance(plan_id, int):
+                pairs.append((index, user_id, plan_id))
+            else:
+                results[index].update(status="invalid", error="user_id and plan_id must be integers")
+
+        try:
+            now = datetime.now(timezone.utc)
+            known_users = lock_users(user_id for _, user_id, _ in pairs)
+            durations, prices = {}, {}
+            for chunk in chunked({plan_id for _, _, plan_id in pairs}):
+                for plan_id, duration, price in db.session.execute(
+                    db.select(Plan.id, Plan.duration_minutes, Plan.price).where(Plan.id.in_(chunk))
+                ):
+                    durations[plan_id] = duration
+                    prices[plan_id] = price
+
+            active_until = {}
+            for chunk in chunked(known_users):
+                active_until.update(db.session.execute(
+                    db.select(Subscription.user_id, db.func.max(Subscription.ends_at))
+                    .where(
+                        Subscription.user_id.in_(chunk),
+                        Subscription.status == "active",
+                        Subscription.ends_at > now
+                    )
+                    .group_by(Subscription.user_id)
+                ).all())
+
+            accepted = []
+            sub_ids = []
+            for index, user_id, plan_id in pairs:
+                result = results[index]
+                if user_id not in known_users or plan_id not in durations:
+                    result.update(status="invalid", error="Invalid user or plan")
+                elif user_id in active_until:
+                    result.update(status="conflict", error="User already has an active subscription",
+                                  expires_at=active_until[user_id].isoformat())
+                else:
+                    ends_at = now + timedelta(minutes=durations[plan_id])
+                    # Later items for the same user conflict with this one
+                    active_until[user_id] = ends_at
+                    accepted.append((index, user_id, plan_id, ends_at))
+
+            if accepted:
+                sub_ids = db.session.scalars(
+                    db.insert(Subscription).returning(Subscription.id, sort_by_parameter_order=True),
+                    [
+                        {"user_id": user_id, "plan_id": plan_id, "status": "active",
+                         "timestamp": now, "ends_at": ends_at}
+                        for _, user_id, plan_id, ends_at in accepted
+                    ],
+                ).all()
+                db.session.execute(
+                    db.insert(UserPlanHistory),
+                    [
+                        {"user_id": user_id, "plan_id": plan_id, "purchase_date": now}
+                        for _, user_id, plan_id, _ in accepted
+                    ],
+                )
+                bump_plan_stats((plan_id, 1, prices[plan_id], None, None) for _, _, plan_id, _ in accepted)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.exception("Error provisioning subscriptions")
+            return {"error": "Bulk provisioning failed", "details": str(e)}, 500
+
+        for (index, user_id, _, ends_at), sub_id in zip(accepted, sub_ids):
+            results[index].update(status="created", subscription_id=sub_id, ends_at=ends_at.isoformat())
+            access_index().grant(user_id, sub_id, ends_at)
+            expiry_scheduler().notify(sub_id, user_id, ends_at)
+            subscription_events().publish(user_id, {"type": "created", "subscription_id": sub_id})
 
-        return results, 200
+        summary = {status: sum(1 for r in results if r["status"] == status)
+                   for status in ("created", "conflict", "invalid")}
+        return {"summary": summary, "results": results}, 200
+
+
+def serialize_subscription(sub):
+    plan = sub.plan
+    return {
+        "id": sub.id,
+        "status": sub.status,
+        "timestamp": sub.timestamp.isoformat() if sub.timestamp else None,
+        "ends_at": sub.ends_at.isoformat() if sub.ends_at else None,
+        "plan": {
+            "id": plan.id,
+            "name": plan.name,
+            "duration_minutes": plan.duration_minutes,
+            "price": plan.price
+        }
+    }
+
+
+SUBSCRIPTION_FIELDS = ("id", "status", "timestamp", "ends_at")
+PLAN_FIELDS = {
+    "id": Plan.id,
+    "name": Plan.name,
+    "duration_minutes": Plan.duration_minutes,
+    "price": Plan.price,
+}
+
+
+def user_subscriptions_query(user_id, args):
+    """The SELECT behind GET /subscriptions/<user_id> for query-string `args`, with its column keys.
+
+    Returns (query, sub_keys, plan_keys); raises ValueError for an unknown ?fields= name.
+    """
+    # ?fields=status,ends_at,plan.name picks columns; "plan" means every plan field
+    fields = parse_fields(args.get("fields"), [*SUBSCRIPTION_FIELDS, "plan", *(f"plan.{name}" for name in PLAN_FIELDS)])
+    sub_keys = [key for key in SUBSCRIPTION_FIELDS if fields is None or key in fields or key == "id"]
+    plan_keys = [
+        key for key in PLAN_FIELDS
+        if fields is None or "plan" in fields or f"plan.{key}" in fields
+    ]
+
+    # Only the requested columns are selected; plans are joined into the same SELECT when needed.
+    # Ended subscriptions moved to the archive are only read with ?include_archived=true.
+    subs = with_archive(Subscription, SubscriptionArchive, arg_flag("include_archived", args)).c
+    query = (
+        db.select(*(subs[key] for key in sub_keys), *(PLAN_FIELDS[key] for key in plan_keys))
+        .where(subs.user_id == user_id)
+    )
+    if plan_keys:
+        query = query.join(Plan, Plan.id == subs.plan_id)
+
+    status = args.get("status")
+    if status:
+        query = query.where(subs.status == status)
+    if arg_flag("active_only", args):
+        query = query.where(
+            subs.status == "active",
+            subs.ends_at > utc_naive(datetime.now(timezone.utc))
+        )
+
+    if args.get("order") == "asc":
+        query = query.order_by(subs.ends_at.asc(), subs.id.asc())
+    else:
+        query = query.order_by(subs.ends_at.desc(), subs.id.desc())
+    return query, sub_keys, plan_keys
+
+
+def subscription_items(rows, sub_keys, plan_keys):
+    """Shape user_subscriptions_query() rows into the response list"""
+    results = []
+    for row in rows:
+        item = {
+            key: value.isoformat() if isinstance(value, datetime) else value
+            for key, value in zip(sub_keys, row)
+        }
+        if plan_keys:
+            item["plan"] = dict(zip(plan_keys, row[len(sub_keys):]))
+        results.append(item)
+    return results
+
+
+class UserSubscriptionsResource(Resource):
+    # Clients don't echo X-Last-Write, and a purchase must show up on the very next read
+    method_decorators = [require_auth, read_from_primary]
+
+    def get(self, user_id):
+        require_same_user(user_id)
+        try:
+            query, sub_keys, plan_keys = user_subscriptions_query(user_id, request.args)
+        except ValueError as e:
+            return {"error": str(e)}, 400
+        return subscription_items(db.session.execute(query), sub_keys, plan_keys), 200
 
 class SubscriptionResource(Resource):
+    method_decorators = [require_auth]
+
     def delete(self, sub_id):
         sub = Subscription.query.get(sub_id)
         if not sub:
             return {"error": "Subscription not found"}, 404
+        require_same_user(sub.user_id)
 
+        user_id = sub.user_id
+        bump_plan_stats([(sub.plan_id, -1, sub.plan.price, None, None)])
         db.session.delete(sub)
         db.session.commit()
+        access_index().revoke(user_id, sub_id)
+        subscription_events().publish(user_id, {"type": "cancelled", "subscription_id": sub_id})
         return {"message": f"Subscription {sub_id} cancelled"}, 200
 
+
+# Purchases and cancellations made by this worker are published per user id
+def subscription_events():
+    return current_app.extensions["subscription_events"]
+
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def load_subscriptions(user_id, sub_ids=None):
+    """Serialized active subscriptions for a user; releases the connection before returning"""
+    query = (
+        Subscription.query
+        .options(joinedload(Subscription.plan))
+        .filter(
+            Subscription.user_id == user_id,
+            Subscription.status == "active",
+            Subscription.ends_at > datetime.now(timezone.utc)
+        )
+    )
+    if sub_ids is not None:
+        query = query.filter(Subscription.id.in_(sub_ids))
+    subs = [serialize_subscription(sub) for sub in query.order_by(Subscription.ends_at.desc()).all()]
+    # Streams stay open for minutes; never hold a pooled connection while idle
+    db.session.rollback()
+    return subs
+
+
+def subscription_stream(user_id, listener, snapshot):
+    """Yield SSE frames: the snapshot, then created/cancelled/expired events as they happen.
+
+    Expiries are timed locally from the known ends_at values, so they need no
+    publisher. The stream ends after SSE_MAX_DURATION (or when it falls behind
+    its queue); EventSource then reconnects and gets a fresh snapshot, which
+    also picks up changes made by other workers.
+    """
+    heartbeat = current_app.config["SSE_HEARTBEAT"]
+    deadline = time.monotonic() + current_app.config["SSE_MAX_DURATION"]
+    expiries = {sub["id"]: as_utc(datetime.fromisoformat(sub["ends_at"])) for sub in snapshot}
+
+    try:
+        yield "retry: 3000\n\n"
+        yield sse("snapshot", snapshot)
+        last_sent = time.monotonic()
+
+        while not listener.overflowed:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            wait = min(remaining, heartbeat - (time.monotonic() - last_sent))
+            if expiries:
+                soonest = min(expiries.values())
+                wait = min(wait, (soonest - datetime.now(timezone.utc)).total_seconds())
+
+            frames = []
+            event = listener.get(max(0.0, wait))
+            if event is not None and event["type"] == "created":
+                for sub in load_subscriptions(user_id, [event["subscription_id"]]):
+                    expiries[sub["id"]] = as_utc(datetime.fromisoformat(sub["ends_at"]))
+                    frames.append(sse("created", sub))
+            elif event is not None and event["type"] == "cancelled":
+                expiries.pop(event["subscription_id"], None)
+                frames.append(sse("cancelled", event))
+
+            now = datetime.now(timezone.utc)
+            for sub_id, ends_at in list(expiries.items()):
+                if ends_at <= now:
+                    del expiries[sub_id]
+                    frames.append(sse("expired", {"subscription_id": sub_id, "ends_at": ends_at.isoformat()}))
+
+            if not frames and time.monotonic() - last_sent >= heartbeat:
+                frames.append(": keep-alive\n\n")
+            if frames:
+                yield "".join(frames)
+                last_sent = time.monotonic()
+    finally:
+        listener.close()
+
+
+class SubscriptionEventsResource(Resource):
+    """Server-Sent Events feed of a user's active subscriptions.
+
+    An alternative to polling GET /subscriptions/<user_id>: an idle stream is
+    one queue waiting in the worker, with no database work until something
+    changes. Off unless SSE_ENABLED, which needs gunicorn's gevent worker so
+    each open stream costs a greenlet rather than a whole worker. Reads go to
+    the primary: events are published right after commits a replica may not
+    have yet.
+    """
+    method_decorators = [require_stream_auth, read_from_primary]
+
+    def get(self, user_id):
+        if not current_app.config["SSE_ENABLED"]:
+            return {"error": "Live updates are disabled"}, 404
+        require_same_user(user_id)
+        if subscription_events().listener_count() >= current_app.config["SSE_MAX_STREAMS"]:
+            raise ServiceUnavailable("Too many open streams, retry shortly")
+
+        listener = subscription_events().subscribe(user_id)
+        try:
+            snapshot = load_subscriptions(user_id)
+        except Exception:
+            listener.close()
+            raise
+
+        response = Response(
+            stream_with_context(subscription_stream(user_id, listener, snapshot)),
+            mimetype="text/event-stream",
+        )
+        response.headers["Cache-Control"] = "no-cache"
+        response.headers["X-Accel-Buffering"] = "no"
+        return response
+
+
+class StreamTokenResource(Resource):
+    """Hands out the short-lived token that opens a user's event stream"""
+    method_decorators = [require_auth]
+
+    def post(self, user_id):
+        if not current_app.config["SSE_ENABLED"]:
+            return {"error": "Live updates are disabled"}, 404
+        require_same_user(user_id)
+        return {"stream_token": issue_stream_token(user_id), "expires_in": current_app.config["SSE_TOKEN_TTL"]}, 201
+
+
+class AccessIndex:
+    """In-memory map of user_id -> (subscription id, ends_at) for active subscriptions.
+
+    Answers "may this user be online right now?" without touching the
+    database. Entries stop granting access exactly at ends_at; writes made by
+    this worker apply immediately, and the whole index is reloaded every
+    ACCESS_INDEX_REFRESH seconds to pick up other workers' writes.
+    """
+
+    def __init__(self, refresh_interval):
+        self.refresh_interval = refresh_interval
+        self._entries = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._journal = None
+
+    def grant(self, user_id, sub_id, ends_at):
+        entry = (sub_id, as_utc(ends_at).timestamp())
+        with self._lock:
+            self._entries[user_id] = entry
+            if self._journal is not None:
+                self._journal.append((user_id, entry))
+
+    def revoke(self, user_id, sub_id):
+        with self._lock:
+            if self._entries.get(user_id, (None,))[0] == sub_id:
+                del self._entries[user_id]
+            if self._journal is not None:
+                self._journal.append((user_id, (sub_id, None)))
+
+    def reload(self):
+        """Replace the index with the active subscriptions currently in the database"""
+        with self._lock:
+            self._journal = []
+        now = datetime.now(timezone.utc)
+        try:
+            # Always the primary: a lagging replica would hand cancelled subscriptions their access back
+            rows = db.session.execute(
+                db.select(Subscription.user_id, Subscription.id, Subscription.ends_at)
+                .where(Subscription.status == "active", Subscription.ends_at > now),
+                bind_arguments={"bind": db.engine},
+            ).all()
+            db.session.rollback()
+        except Exception:
+            with self._lock:
+                self._journal = None
+            raise
+
+        entries = {}
+        for user_id, sub_id, ends_at in rows:
+            expires = as_utc(ends_at).timestamp()
+            if expires > entries.get(user_id, (None, 0))[1]:
+                entries[user_id] = (sub_id, expires)
+
+        with self._lock:
+            # Replay grants/revokes that raced with the query above
+            for user_id, (sub_id, expires) in self._journal:
+                if expires is not None:
+                    entries[user_id] = (sub_id, expires)
+                elif entries.get(user_id, (None,))[0] == sub_id:
+                    del entries[user_id]
+            self._journal = None
+            self._entries = entries
+            self._loaded_at = time.monotonic()
+
+    def _refresh_if_stale(self):
+        loaded_at = self._loaded_at
+        if loaded_at is not None and time.monotonic() - loaded_at < self.refresh_interval:
+            return
+        # One thread reloads; the others keep answering from the current index
+        if self._reload_lock.acquire(blocking=loaded_at is None):
+            try:
+                if self._loaded_at is None or time.monotonic() - self._loaded_at >= self.refresh_interval:
+                    self.reload()
+            finally:
+                self._reload_lock.release()
+
+    def check(self, user_ids):
+        """Return an access decision for each user id"""
+        self._refresh_if_stale()
+        now = time.time()
+        entries = self._entries
+        results = []
+        for user_id in user_ids:
+            sub_id, expires = entries.get(user_id, (None, 0))
+            allowed = expires > now
+            results.append({
+                "user_id": user_id,
+                "allowed": allowed,
+                "subscription_id": sub_id if allowed else None,
+                "expires_at": datetime.fromtimestamp(expires, timezone.utc).isoformat() if allowed else None,
+                "seconds_remaining": int(expires - now) if allowed else 0,
+            })
+        return results
+
+
+def access_index():
+    return current_app.extensions["access_index"]
+
+
+class AccessCheckResource(Resource):
+    """Gateway-facing access checks, answered from the in-memory AccessIndex"""
+
+    method_decorators = [require_operator, read_from_primary]
+
+    def get(self, user_id):
+        return access_index().check([user_id])[0], 200
+
+    def post(self):
+        data = request.get_json(silent=True) or {}
+        user_ids = data.get("user_ids")
+        if not isinstance(user_ids, list) or not all(isinstance(user_id, int) for user_id in user_ids):
+            return {"error": "user_ids must be a list of integers"}, 400
+        if len(user_ids) > current_app.config["ACCESS_CHECK_MAX_USERS"]:
+            return {"error": f"At most {current_app.config['ACCESS_CHECK_MAX_USERS']} user_ids per request"}, 400
+        return {"results": access_index().check(user_ids)}, 200
+
+EXPORT_COLUMNS = ["id", "user_id", "plan_id", "plan_name", "price", "purchase_date", "rating", "review"]
+EXPORT_BATCH_SIZE = 5000
+
+
+def parse_date_bound(value):
+    """Parse an ISO date/datetime export bound; naive values are taken as UTC"""
+    if not value:
+        return None
+    return as_utc(datetime.fromisoformat(value))
+
+
+def iter_history_rows(start=None, end=None, include_archived=False):
+    """Yield purchase history joined with plan as plain tuples, streamed from the database.
+
+    Uses a server-side cursor on PostgreSQL so memory stays constant however
+    many rows match; nothing is loaded into ORM or marshmallow objects.
+    """
+    history = with_archive(UserPlanHistory, UserPlanHistoryArchive, include_archived)
+    stmt = (
+        db.select(
+            history.c.id, history.c.user_id, history.c.plan_id,
+            Plan.name, Plan.price, history.c.purchase_date,
+            history.c.rating, history.c.review,
+        )
+        .join(Plan, Plan.id == history.c.plan_id)
+        .order_by(history.c.id)
+    )
+    if start:
+        stmt = stmt.where(history.c.purchase_date >= start)
+    if end:
+        stmt = stmt.where(history.c.purchase_date < end)
+
+    # The heavy report read goes to the replica when there is a healthy one
+    with reporting_engine().connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE).execute(stmt)
+        for partition in result.partitions():
+            yield from partition
+
+
+def render_ndjson(rows):
+    batch = []
+    for row in rows:
+        record = dict(zip(EXPORT_COLUMNS, row))
+        if record["purchase_date"] is not None:
+            record["purchase_date"] = record["purchase_date"].isoformat()
+        batch.append(json.dumps(record))
+        if len(batch) >= EXPORT_BATCH_SIZE:
+            yield "\n".join(batch) + "\n"
+            batch = []
+    if batch:
+        yield "\n".join(batch) + "\n"
+
+
+def render_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if count % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def gzip_stream(chunks):
+    """Compress a stream of text chunks into gzip bytes without buffering it all"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def history_export(export_format, start=None, end=None, compress=False, include_archived=False):
+    """Return (chunk generator, mimetype, filename) for a purchase history export"""
+    if export_format not in ("ndjson", "csv"):
+        raise ValueError("format must be ndjson or csv")
+    render = render_csv if export_format == "csv" else render_ndjson
+    chunks = render(iter_history_rows(start, end, include_archived))
+    mimetype = "text/csv" if export_format == "csv" else "application/x-ndjson"
+    filename = f"history.{export_format}"
+    if compress:
+        return gzip_stream(chunks), "application/gzip", filename + ".gz"
+    return (chunk.encode("utf-8") for chunk in chunks), mimetype, filename
+
+
+class HistoryExportResource(Resource):
+    method_decorators = [require_operator]
+
+    def get(self):
+        try:
+            start = parse_date_bound(request.args.get("start"))
+            end = parse_date_bound(request.args.get("end"))
+            chunks, mimetype, filename = history_export(
+                request.args.get("format", "ndjson"), start, end, compress=arg_flag("gzip"),
+                include_archived=arg_flag("include_archived"),
+            )
+        except ValueError as e:
+            return {"error": str(e)}, 400
+
+        return Response(
+            stream_with_context(chunks),
+            mimetype=mimetype,
+            headers={"Content-Disposition": f"attachment; filename={filename}"},
+        )
+
+
 class UserPlanHistoryResource(Resource):
+    method_decorators = [require_auth]
+
     def get(self, user_id):
-        histories = UserPlanHistory.query.filter_by(user_id=user_id).all()
-        return user_plan_histories_schema.dump(histories), 200
+        require_same_user(user_id)
+        try:
+            serializer = list_serializer(UserPlanHistory)
+        except ValueError as e:
+            return {"error": str(e)}, 400
+        # Archived purchases are only read when asked for
+        history = with_archive(UserPlanHistory, UserPlanHistoryArchive, arg_flag("include_archived"))
+        if arg_flag("stream"):
+            return stream_all(serializer, history, user_id=user_id)
+        return keyset_page(serializer, history, user_id=user_id)
 
     def post(self):
         data = request.json
-        user_id = data.get("user_id")
+        # History is always recorded against the caller, never a client-supplied id
+        user_id = g.principal["id"]
         plan_id = data.get("plan_id")
         rating = data.get("rating")
         review = data.get("review")
 
-        if not user_id or not plan_id:
-            return {"error": "user_id and plan_id required"}, 400
+        if data.get("user_id") not in (None, user_id):
+            return {"error": "You can only review your own purchases"}, 403
+        if not plan_id:
+            return {"error": "plan_id required"}, 400
+        try:
+            rating = parse_rating(rating)
+        except ValueError as e:
+            return {"error": str(e)}, 400
+
+        plan = db.session.get(Plan, plan_id)
+        if not plan:
+            return {"error": "Invalid plan"}, 400
 
         history = UserPlanHistory(
             user_id=user_id,
@@ -327,12 +1768,261 @@ class UserPlanHistoryResource(Resource):
         )
 
         db.session.add(history)
+        bump_plan_stats([(plan.id, 0, plan.price, rating, review)])
         db.session.commit()
 
         return user_plan_history_schema.dump(history), 201
 
+class ExpirySweeper:
+    """Moves subscriptions whose ends_at has passed from "active" to "expired".
+
+    Works through overdue rows oldest first in batches of `batch_size`, one
+    short transaction per batch, so the active set (and its partial index)
+    stays small. Several workers can sweep at once: on PostgreSQL each batch
+    skips rows another sweeper has locked.
+    """
+
+    def __init__(self, batch_size=500, app=None):
+        self.batch_size = batch_size
+        self.app = app
+        self.stats = {
+            "runs": 0,
+            "expired_total": 0,
+            "last_run_at": None,
+            "last_run_expired": 0,
+            "last_run_seconds": 0.0,
+            "rows_per_second": 0.0,
+            "lag_seconds": 0.0,
+        }
+        self._thread = None
+        self._stop = threading.Event()
+
+    def sweep(self, max_batches=None):
+        """Expire overdue subscriptions, returning how many rows were updated"""
+        started = time.perf_counter()
+        now = datetime.now(timezone.utc)
+        expired = 0
+        batches = 0
+        lag = 0.0
+
+        while max_batches is None or batches < max_batches:
+            rows = db.session.execute(
+                db.select(Subscription.id, Subscription.ends_at)
+                .where(Subscription.status == "active", Subscription.ends_at <= now)
+                .order_by(Subscription.ends_at)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            ).all()
+            if not rows:
+                db.session.rollback()
+                break
+            if batches == 0:
+                # How far behind we are: the oldest subscription still marked active
+                lag = (now - as_utc(rows[0].ends_at)).total_seconds()
+
+            db.session.execute(
+                db.update(Subscription)
+                .where(Subscription.id.in_([row.id for row in rows]))
+                .values(status="expired")
+            )
+            db.session.commit()
+            expired += len(rows)
+            batches += 1
+            if len(rows) < self.batch_size:
+                break
+
+        elapsed = time.perf_counter() - started
+        self.stats.update(
+            runs=self.stats["runs"] + 1,
+            expired_total=self.stats["expired_total"] + expired,
+            last_run_at=now.isoformat(),
+            last_run_expired=expired,
+            last_run_seconds=round(elapsed, 4),
+            rows_per_second=round(expired / elapsed, 1) if elapsed else 0.0,
+            lag_seconds=round(lag, 1),
+        )
+        expired_total.inc(amount=expired)
+        expiry_rows_per_second.set(self.stats["rows_per_second"])
+        expiry_lag_seconds.set(self.stats["lag_seconds"])
+        if expired:
+            current_app.logger.info("Expired %d subscriptions in %.3fs (lag %.1fs)", expired, elapsed, lag)
+        return expired
+
+    def start(self, interval):
+        """Run `sweep` every `interval` seconds on a daemon thread"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="expiry-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self, interval):
+        while not self._stop.wait(interval):
+            with self.app.app_context():
+                try:
+                    self.sweep()
+                except Exception:
+                    db.session.rollback()
+                    self.app.logger.exception("Expiry sweep failed")
+
+
+def expiry_sweeper():
+    return current_app.extensions["expiry_sweeper"]
+
+
+class ExpiryScheduler:
+    """Emits a subscription.expired event to the gateway webhook as each subscription ends.
+
+    Pending expiries sit in a min-heap keyed by ends_at. The heap is filled from
+    the active subscriptions every `poll_interval` seconds (a cheap scan of the
+    partial active index) and straight away for purchases made in this process.
+    Due entries are re-checked in one query before firing, so cancelled or
+    changed subscriptions never produce an event. The first poll after startup
+    also loads subscriptions that ended up to `catch_up` seconds ago, whether
+    or not the sweeper has marked them expired yet, so expiries missed while no
+    scheduler ran fire late; the gateway dedupes repeats by event id.
+    """
+
+    def __init__(self, sender, poll_interval, app=None, catch_up=0):
+        self.sender = sender
+        self.poll_interval = poll_interval
+        self.app = app
+        self.catch_up = catch_up
+        self._heap = []
+        self._scheduled = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def schedule(self, sub_id, user_id, ends_at):
+        expires = as_utc(ends_at).timestamp()
+        with self._lock:
+            if self._scheduled.get(sub_id) == expires:
+                return
+            self._scheduled[sub_id] = expires
+            heapq.heappush(self._heap, (expires, sub_id, user_id))
+            earliest = self._heap[0][0] == expires
+        if earliest:
+            self._wakeup.set()
+
+    def notify(self, sub_id, user_id, ends_at):
+        """Schedule a subscription written by this process, if the scheduler runs here"""
+        if self.running:
+            self.schedule(sub_id, user_id, ends_at)
+
+    def poll(self, since=None):
+        """Schedule active subscriptions ending after `since` (default: now), plus swept ones already past it"""
+        now = datetime.now(timezone.utc)
+        live = Subscription.status == "active"
+        if since is not None:
+            live = live | ((Subscription.status == "expired") & (Subscription.ends_at <= now))
+        rows = db.session.execute(
+            db.select(Subscription.id, Subscription.user_id, Subscription.ends_at)
+            .where(live, Subscription.ends_at > (since or now))
+        ).all()
+        db.session.rollback()
+        for sub_id, user_id, ends_at in rows:
+            self.schedule(sub_id, user_id, ends_at)
+        return len(rows)
+
+    def next_due(self):
+        with self._lock:
+            return self._heap[0][0] if self._heap else None
+
+    def fire_due(self):
+        """Queue events for every entry whose time has come; returns how many were sent"""
+        now = time.time()
+        due = {}
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                expires, sub_id, user_id = heapq.heappop(self._heap)
+                # Skip heap entries superseded by a later schedule() of the same subscription
+                if self._scheduled.get(sub_id) == expires:
+                    del self._scheduled[sub_id]
+                    due[sub_id] = (user_id, expires)
+        if not due:
+            return 0
+
+        current = {}
+        for chunk in chunked(due):
+            current.update(db.session.execute(
+                db.select(Subscription.id, Subscription.ends_at).where(Subscription.id.in_(chunk))
+            ).all())
+        db.session.rollback()
+
+        sent = 0
+        for sub_id, (user_id, expires) in due.items():
+            ends_at = current.get(sub_id)
+            if ends_at is None or as_utc(ends_at).timestamp() != expires:
+                continue
+            self.sender.send({
+                "id": f"{sub_id}:{int(expires)}",
+                "type": "subscription.expired",
+                "subscription_id": sub_id,
+                "user_id": user_id,
+                "ends_at": datetime.fromtimestamp(expires, timezone.utc).isoformat(),
+            })
+            sent += 1
+        return sent
+
+    def run(self):
+        """Poll and fire until stopped; sleeps until the next expiry or poll, whichever is sooner"""
+        next_poll = 0.0
+        # Later polls only look ahead: an overdue row stays active until swept and would fire again.
+        # Catching up can repeat an event sent just before a restart; its id stays the same
+        since = datetime.now(timezone.utc) - timedelta(seconds=self.catch_up)
+        while not self._stop.is_set():
+            with self.app.app_context():
+                try:
+                    if time.monotonic() >= next_poll:
+                        self.poll(since)
+                        since = None
+                        next_poll = time.monotonic() + self.poll_interval
+                    self.fire_due()
+                except Exception:
+                    db.session.rollback()
+                    self.app.logger.exception("Expiry scheduler iteration failed")
+
+            wait = next_poll - time.monotonic()
+            next_due = self.next_due()
+            if next_due is not None:
+                wait = min(wait, next_due - time.time())
+            self._wakeup.wait(max(0.0, wait))
+            self._wakeup.clear()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self.sender.start()
+        self._thread = threading.Thread(target=self.run, name="expiry-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+
+
+def expiry_scheduler():
+    return current_app.extensions["expiry_scheduler"]
+
+
+def start_background_workers():
+    # Started lazily so `flask db upgrade` and other CLI commands never spawn threads
+    config = current_app.config
+    if config["EXPIRY_SWEEP_INTERVAL"] > 0:
+        expiry_sweeper().start(config["EXPIRY_SWEEP_INTERVAL"])
+    if config["EXPIRY_WEBHOOK_URL"] and config["EXPIRY_SCHEDULER_IN_PROCESS"]:
+        expiry_scheduler().start()
+
+
 # Root endpoint for API health check
-@app.route('/')
 def api_root():
     return {
         "message": "WiFi Portal API",
@@ -347,25 +2037,44 @@ def api_root():
         }
     }
 
+def prometheus_metrics():
+    if not current_app.config["METRICS_ENABLED"]:
+        return {"error": "Metrics are disabled"}, 404
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
 # Register API routes
 api.add_resource(RegisterResource, '/register')
 api.add_resource(LoginResource, '/login')
 api.add_resource(PlansResource, '/plans')
 api.add_resource(UsersResource, '/users', '/users/<int:user_id>')
 api.add_resource(SubscriptionsResource, '/subscriptions')
+api.add_resource(BulkSubscriptionsResource, '/subscriptions/bulk')
 api.add_resource(UserSubscriptionsResource, '/subscriptions/<int:user_id>')
 api.add_resource(SubscriptionResource, '/subscriptions/<int:sub_id>')
+api.add_resource(SubscriptionEventsResource, '/subscriptions/<int:user_id>/events')
+api.add_resource(StreamTokenResource, '/subscriptions/<int:user_id>/events/token')
 api.add_resource(UserPlanHistoryResource, '/user-plan-history', '/user-plan-history/<int:user_id>')
+api.add_resource(HistoryExportResource, '/exports/history')
+api.add_resource(AccessCheckResource, '/access/check', '/access/<int:user_id>')
 
 
-@app.cli.command("init-db")
-def init_db():
+@click.command("init-db")
+@click.option("--if-empty", is_flag=True, help="Only seed a database that has no users yet")
+@with_appcontext
+def init_db(if_empty=False):
+    """Recreate the tables and load sample users, plans and history"""
+    if if_empty and db.session.execute(db.select(User.id).limit(1)).first():
+        print("Database already has data, skipping initialization.")
+        return
+
     db.drop_all()
     db.create_all()
 
     # Create test users with valid credentials
-    user1 = User(username="user1", email="user1@gmail.com", password_hash=bcrypt.generate_password_hash("User1!").decode('utf-8'))
-    user2 = User(username="user2", email="user2@gmail.com", password_hash=bcrypt.generate_password_hash("Test2@").decode('utf-8'))
+    hasher = password_hasher()
+    user1 = User(username="user1", email="user1@gmail.com", password_hash=hasher.hash("User1!"))
+    user2 = User(username="user2", email="user2@gmail.com", password_hash=hasher.hash("Test2@"))
 
     # Create WiFi plans as specified
     plan1 = Plan(name="1 Hour", duration_minutes=60, price=15)
@@ -382,9 +2091,216 @@ def init_db():
 
     db.session.add_all([history1, history2])
     db.session.commit()
+    rebuild_plan_stats()
+    plan_cache().invalidate()
 
     print("Database initialized with sample data.")
 
 
+def archive_cold_rows(cutoff, batch_size=1000):
+    """Move ended subscriptions and purchase history from before `cutoff` into the archive tables.
+
+    Returns {table name: rows moved}. Active subscriptions stay hot however
+    old their ends_at, so the overlap check and access index never miss one.
+    """
+    jobs = [
+        (Subscription, SubscriptionArchive, "ends_at",
+         db.and_(Subscription.ends_at < cutoff, Subscription.status != "active")),
+        (UserPlanHistory, UserPlanHistoryArchive, "purchase_date", UserPlanHistory.purchase_date < cutoff),
+    ]
+    moved = {}
+    for model, archive, column, condition in jobs:
+        with db.engine.begin() as conn:
+            first = oldest(conn, model.__table__, column, condition)
+            if first is not None:
+                ensure_monthly_partitions(conn, archive.__table__, first, add_months(cutoff, -1))
+        moved[model.__tablename__] = move_in_batches(
+            db.engine, model.__table__, archive.__table__, condition, batch_size
+        )
+    return moved
+
+
+@click.command("archive")
+@click.option("--months", type=int, default=None, help="Whole months to keep hot (default: ARCHIVE_AFTER_MONTHS)")
+@click.option("--batch-size", type=int, default=None, help="Rows moved per transaction")
+@with_appcontext
+def archive_command(months, batch_size):
+    """Move ended subscriptions and old purchase history into the archive tables"""
+    config = current_app.config
+    months = config["ARCHIVE_AFTER_MONTHS"] if months is None else months
+    cutoff = add_months(month_start(datetime.now(timezone.utc)), -months)
+    started = time.perf_counter()
+    moved = archive_cold_rows(cutoff, batch_size or config["ARCHIVE_BATCH_SIZE"])
+    for table, count in moved.items():
+        print(f"Archived {count} {table} rows from before {cutoff:%Y-%m-%d}.")
+    print(f"Done in {time.perf_counter() - started:.1f}s")
+
+
+@click.command("expire-subscriptions")
+@click.option("--batch-size", type=int, default=None, help="Rows updated per transaction")
+@click.option("--max-batches", type=int, default=None, help="Stop after this many batches")
+@with_appcontext
+def expire_subscriptions(batch_size, max_batches):
+    """Mark subscriptions past their ends_at as expired"""
+    sweeper = expiry_sweeper()
+    if batch_size:
+        sweeper.batch_size = batch_size
+    expired = sweeper.sweep(max_batches=max_batches)
+    stats = sweeper.stats
+    config = current_app.config
+    if config["METRICS_ENABLED"]:
+        # Leave the count for the web workers' /metrics; this process's gauges go when it exits
+        metrics.start(config["METRICS_DIR"] or None, config["METRICS_FLUSH_INTERVAL"])
+        metrics.export()
+    print(f"Expired {expired} subscriptions in {stats['last_run_seconds']}s "
+          f"({stats['rows_per_second']} rows/s, lag {stats['lag_seconds']}s)")
+
+
+
+@click.command("rebuild-plan-stats")
+@with_appcontext
+def rebuild_plan_stats_command():
+    """Recompute every plan's purchase, revenue and rating totals from history"""
+    plans = rebuild_plan_stats()
+    plan_cache().invalidate()
+    print(f"Rebuilt stats for {plans} plans.")
+
+
+@click.command("expiry-scheduler")
+@with_appcontext
+def run_expiry_scheduler():
+    """Push subscription expiry events to EXPIRY_WEBHOOK_URL until interrupted"""
+    if not current_app.config["EXPIRY_WEBHOOK_URL"]:
+        raise click.UsageError("Set EXPIRY_WEBHOOK_URL first")
+    print(f"Delivering expiry events to {current_app.config['EXPIRY_WEBHOOK_URL']}")
+    scheduler = expiry_scheduler()
+    scheduler.sender.start()
+    scheduler.run()
+
+
+@click.command("export-history")
+@click.option("--format", "export_format", type=click.Choice(["ndjson", "csv"]), default="ndjson")
+@click.option("--start", help="Only purchases on or after this ISO date/datetime (UTC)")
+@click.option("--end", help="Only purchases before this ISO date/datetime (UTC)")
+@click.option("--gzip", "compress", is_flag=True, help="gzip the output")
+@click.option("--include-archived", is_flag=True, help="Also export purchases moved by `flask archive`")
+@click.option("--output", type=click.Path(dir_okay=False), help="File to write (default: stdout)")
+@with_appcontext
+def export_history(export_format, start, end, compress, include_archived, output):
+    """Stream purchase history joined with plans as NDJSON or CSV"""
+    chunks, _, _ = history_export(
+        export_format, parse_date_bound(start), parse_date_bound(end), compress, include_archived
+    )
+    stream = open(output, "wb") if output else click.get_binary_stream("stdout")
+    try:
+        for chunk in chunks:
+            stream.write(chunk)
+    finally:
+        if output:
+            stream.close()
+
+
+@click.command("deploy")
+@with_appcontext
+def deploy():
+    """Apply migrations and seed an empty database, in one process (used by start.sh)"""
+    from flask_migrate import upgrade
+
+    upgrade()
+    click.get_current_context().invoke(init_db, if_empty=True)
+
+
+CLI_COMMANDS = [init_db, expire_subscriptions, rebuild_plan_stats_command, run_expiry_scheduler,
+                export_history, archive_command, deploy]
+
+
+def init_services(app):
+    """Build `app`'s own services from its settings; nothing here is shared with other apps"""
+    config = app.config
+    app.extensions["access_tokens"] = URLSafeTimedSerializer(config["SECRET_KEY"], salt="access-token")
+    app.extensions["stream_tokens"] = URLSafeTimedSerializer(config["SECRET_KEY"], salt="stream-token")
+    app.extensions["password_hasher"] = PasswordHasher(
+        config["BCRYPT_LOG_ROUNDS"], config["BCRYPT_POOL_SIZE"], config["BCRYPT_MAX_PENDING"])
+    app.extensions["rate_limiter"] = RateLimiter(
+        make_store(config["RATE_LIMIT_STORAGE"], config["RATE_LIMIT_MAX_KEYS"]), config["RATE_LIMITS"])
+    app.extensions["principal_cache"] = TTLCache(config["PRINCIPAL_CACHE_SIZE"], config["PRINCIPAL_CACHE_TTL"])
+    app.extensions["plan_cache"] = PlanCatalogCache()
+    app.extensions["subscription_events"] = Broker(config["SSE_QUEUE_SIZE"])
+    app.extensions["access_index"] = AccessIndex(config["ACCESS_INDEX_REFRESH"])
+    app.extensions["replica_monitor"] = ReplicaMonitor(config["REPLICA_MAX_LAG"], config["REPLICA_LAG_CHECK_INTERVAL"])
+    app.extensions["expiry_sweeper"] = ExpirySweeper(config["EXPIRY_BATCH_SIZE"], app)
+    sender = WebhookSender(
+        config["EXPIRY_WEBHOOK_URL"],
+        secret=config["EXPIRY_WEBHOOK_SECRET"],
+        batch_size=config["EXPIRY_WEBHOOK_BATCH_SIZE"],
+        max_retries=config["EXPIRY_WEBHOOK_MAX_RETRIES"],
+    )
+    app.extensions["expiry_scheduler"] = ExpiryScheduler(
+        sender, config["EXPIRY_SCHEDULER_POLL"], app, catch_up=config["EXPIRY_SCHEDULER_CATCH_UP"])
+
+
+def cors_origins(config):
+    """Origins allowed by CORS; any origin is accepted in development (no FRONTEND_URL)"""
+    # CORS configuration for production
+    allowed_origins = [
+        "http://localhost:5173",  # Development frontend
+        "http://localhost:3000",  # Alternative dev port
+        "https://project-p4-lovat.vercel.app",  # Production frontend
+        config["FRONTEND_URL"],  # Additional frontend URL from env
+    ]
+
+    # Remove empty strings and add wildcard for development
+    allowed_origins = [origin for origin in allowed_origins if origin]
+    if not config["FRONTEND_URL"]:
+        allowed_origins.append("*")  # Allow all origins in development
+    return allowed_origins
+
+
+def create_app(profile=None, **overrides):
+    """Build the Flask app for a config profile (see config.py); keyword arguments override settings"""
+    app = Flask(__name__)
+    load_config(app, profile, overrides)
+
+    if app.config["TRUSTED_PROXY_COUNT"]:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config["TRUSTED_PROXY_COUNT"])
+
+    db.init_app(app)
+    init_replica(app)
+    bcrypt.init_app(app)
+    api.init_app(app)
+    # Alembic is only needed by `flask db ...`; skip importing it when serving requests
+    if click.get_current_context(silent=True) is not None:
+        from flask_migrate import Migrate
+
+        Migrate(app, db)
+
+    CORS(app, resources={
+        r"/*": {
+            "origins": cors_origins(app.config),
+            "methods": ["GET", "POST", "PUT", "DELETE", "PATCH", "OPTIONS"],
+            "allow_headers": ["Content-Type", "Authorization", "X-Last-Write"],
+            "expose_headers": ["X-Last-Write"],
+            "supports_credentials": True
+        }
+    })
+
+    app.before_request(start_request_metrics)
+    app.after_request(record_request_metrics)
+    app.before_request(start_background_workers)
+    app.before_request(route_reads)
+    app.after_request(mark_writes)
+    app.after_request(compress_response)
+    app.add_url_rule('/', view_func=api_root)
+    app.add_url_rule('/metrics', view_func=prometheus_metrics)
+    for command in CLI_COMMANDS:
+        app.cli.add_command(command)
+
+    init_services(app)
+    return app
+
+
+app = create_app()
+
+
 if __name__ == "__main__":
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,75 @@
+"""
+Moving cold rows from hot tables into their archive tables.
+
+- month_start() / months(): calendar-month boundaries (naive UTC, like the
+  stored timestamps)
+- ensure_monthly_partitions(): create the PostgreSQL partitions of a
+  RANGE-partitioned archive table for every month in a span
+- move_in_batches(): copy-then-delete rows matching a condition, one short
+  transaction per batch, so no lock is held for longer than one batch and
+  concurrent purchases never wait on the whole run
+"""
+
+from datetime import datetime
+
+from sqlalchemy import delete, func, insert, select, text
+
+
+def month_start(value):
+    return datetime(value.year, value.month, 1)
+
+
+def add_months(value, count):
+    index = value.year * 12 + value.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def months(start, end):
+    """Start of every month from `start`'s up to (not including) `end`'s"""
+    current, end = month_start(start), month_start(end)
+    while current < end:
+        yield current
+        current = add_months(current, 1)
+
+
+def ensure_monthly_partitions(conn, table, start, end):
+    """Create `table`'s partitions covering [month of start, month of end]; a no-op off PostgreSQL"""
+    if conn.dialect.name != "postgresql":
+        return []
+    created = []
+    for lower in months(start, add_months(end, 1)):
+        name = f"{table.name}_{lower:%Y_%m}"
+        upper = add_months(lower, 1)
+        conn.execute(text(
+            f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{table.name}" '
+            f"FOR VALUES FROM ('{lower:%Y-%m-%d}') TO ('{upper:%Y-%m-%d}')"
+        ))
+        created.append(name)
+    return created
+
+
+def oldest(conn, table, column, condition):
+    return conn.execute(select(func.min(table.c[column])).where(condition)).scalar()
+
+
+def move_in_batches(engine, source, target, condition, batch_size=1000):
+    """Move rows of `source` matching `condition` into `target` in id order; returns the count.
+
+    Each batch picks ids (skipping rows another transaction holds on
+    PostgreSQL), inserts their current values into the archive and deletes
+    them, all in one transaction. The condition is re-checked on insert and
+    delete so a row that changed since it was picked stays where it is.
+    """
+    columns = [column.name for column in target.columns]
+    moved = 0
+    while True:
+        with engine.begin() as conn:
+            pick = select(source.c.id).where(condition).order_by(source.c.id).limit(batch_size)
+            if conn.dialect.name == "postgresql":
+                pick = pick.with_for_update(skip_locked=True)
+            ids = conn.execute(pick).scalars().all()
+            if not ids:
+                return moved
+            rows = select(*(source.c[name] for name in columns)).where(source.c.id.in_(ids), condition)
+            conn.execute(insert(target).from_select(columns, rows))
+            moved += conn.execute(delete(source).where(source.c.id.in_(ids), condition)).rowcount
@@ -0,0 +1,501 @@
+"""
+Async deployment of the core API: Starlette on SQLAlchemy's asyncio engine.
+
+Serves /register, /login, /plans, /subscriptions and /user-plan-history with
+the same request and response formats as the Flask app, reusing its models,
+config, query builders, serializers, tokens and rate limits. Each worker
+keeps thousands of connections open on one event loop instead of one thread
+per request; bcrypt runs on the hashing process pool (or the loop's thread
+pool when BCRYPT_POOL_SIZE is 0) so it never blocks the loop.
+
+    pip install starlette uvicorn aiosqlite     # asyncpg instead of aiosqlite for PostgreSQL
+    uvicorn asgi:app --port 5000
+    GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker gunicorn --config gunicorn.conf.py asgi:app
+
+DATABASE_URL is the same as for the Flask app; its driver is swapped for
+aiosqlite or asyncpg. Everything else (bulk provisioning, SSE events,
+access checks, exports, /users, /metrics and the read replica) is only
+served by `app:app`, so route those paths to the WSGI deployment.
+"""
+
+import asyncio
+import contextlib
+import hashlib
+import json
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+
+from flask import current_app, g
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+from werkzeug.exceptions import BadRequest, HTTPException
+
+from app import (
+    app as flask_app, api_root, arg_flag, bcrypt_seconds, bearer_principal, check_password, cors_origins, db,
+    enforce_rate_limits, hash_password, issue_access_token, keyset_statement, list_serializer, page_args,
+    page_body, parse_rating, password_hasher, plan_stats_upserts, render_catalog, require_same_user,
+    row_serializer, subscription_conflict, subscription_items, user_subscriptions_query, utc_naive, with_archive,
+    HashingBusy, Plan, PLAN_CATALOG, STREAM_BATCH_SIZE, Subscription, User, UserPlanHistory,
+    UserPlanHistoryArchive,
+)
+
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+logger = logging.getLogger(__name__)
+
+
+def async_database_url(url):
+    """`url` rewritten for its asyncio driver, plus the connect_args that driver needs"""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No asyncio driver for {backend} databases")
+    query = dict(url.query)
+    connect_args = {}
+    if backend == "postgresql" and "sslmode" in query:
+        # asyncpg takes ssl= where libpq takes sslmode=
+        connect_args["ssl"] = query.pop("sslmode")
+    return url.set(drivername=ASYNC_DRIVERS[backend], query=query), connect_args
+
+
+class AsyncPasswordHasher:
+    """Awaitable front for the Flask app's PasswordHasher, with the same pending limit and 503 when it's reached"""
+
+    def __init__(self, hasher):
+        self.hasher = hasher
+        self._slots = asyncio.Semaphore(hasher.max_pending)
+
+    async def _run(self, operation, fn, *args):
+        started = time.perf_counter()
+        try:
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.hasher.wait_timeout)
+            except asyncio.TimeoutError:
+                raise HashingBusy()
+            try:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self.hasher.executor(), fn, *args)
+            finally:
+                self._slots.release()
+        finally:
+            bcrypt_seconds.observe(time.perf_counter() - started, (operation,))
+
+    async def hash(self, password):
+        return await self._run("hash", hash_password, password, self.hasher.rounds)
+
+    async def verify(self, password_hash, password):
+        return await self._run("verify", check_password, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        return self.hasher.needs_rehash(password_hash)
+
+
+class PlanCatalog:
+    """PlanCatalogCache for the event loop: one coroutine rebuilds an expired entry, the rest wait for it"""
+
+    def __init__(self):
+        self._lock = asyncio.Lock()
+        self._entry = None
+
+    async def get(self, sessions):
+        entry = self._entry
+        if entry and entry["expires"] > time.monotonic():
+            return entry
+
+        async with self._lock:
+            entry = self._entry
+            if entry and entry["expires"] > time.monotonic():
+                return entry
+            async with sessions() as session:
+                body = render_catalog((await session.execute(PLAN_CATALOG)).all())
+            entry = {
+                "body": body,
+                "etag": f'"{hashlib.sha256(body).hexdigest()}"',
+                "expires": time.monotonic() + current_app.config["PLAN_CACHE_TTL"],
+            }
+            self._entry = entry
+            return entry
+
+
+def json_response(data, status=200, headers=None):
+    # Byte for byte what Flask-RESTful writes for the same data
+    return Response(json.dumps(data) + "\n", status, headers, media_type="application/json")
+
+
+def raw_json_response(body, status=200):
+    return Response(body + "\n", status, media_type="application/json")
+
+
+async def json_body(request):
+    """The parsed JSON body ({} for an empty one); 400 when it isn't JSON"""
+    body = await request.body()
+    if not body:
+        return {}
+    try:
+        return json.loads(body)
+    except ValueError:
+        raise BadRequest("Failed to decode JSON object")
+
+
+def client_ip(request):
+    """The caller's address, taken from X-Forwarded-For behind TRUSTED_PROXY_COUNT proxies like ProxyFix"""
+    trusted = current_app.config["TRUSTED_PROXY_COUNT"]
+    forwarded = [value.strip() for value in request.headers.get("X-Forwarded-For", "").split(",") if value.strip()]
+    if trusted and len(forwarded) >= trusted:
+        return forwarded[-trusted]
+    return request.client.host if request.client else None
+
+
+def endpoint(handler):
+    """Run a handler inside the Flask app's context, so the shared helpers see its config and `g`.
+
+    Their werkzeug errors (401, 403, 429, 503) become the JSON Flask-RESTful would send.
+    """
+    @wraps(handler)
+    async def wrapper(request):
+        with request.app.state.flask_app.app_context():
+            try:
+                return await handler(request, request.app.state.sessions)
+            except HTTPException as e:
+                headers = {name: value for name, value in e.get_headers() if name.lower() != "content-type"}
+                return json_response({"message": e.description}, e.code, headers)
+    return wrapper
+
+
+def authenticate(request):
+    g.principal = bearer_principal(request.headers)
+    return g.principal
+
+
+async def lock_user(session, user_id):
+    """lock_user() on an AsyncSession; True when the user exists"""
+    if session.bind.dialect.name == "sqlite":
+        await session.execute(update(User).where(User.id == user_id).values(id=User.id))
+    found = await session.scalar(select(User.id).where(User.id == user_id).with_for_update())
+    return found is not None
+
+
+async def bump_plan_stats(session, entries):
+    for stmt in plan_stats_upserts(entries, session.bind.dialect.name):
+        await session.execute(stmt)
+
+
+@endpoint
+async def root(request, sessions):
+    return json_response(api_root())
+
+
+@endpoint
+async def register(request, sessions):
+    enforce_rate_limits(("register_ip", client_ip(request)))
+
+    data = await json_body(request)
+    name = data.get("name")
+    email = data.get("email")
+    password = data.get("password")
+
+    if not name or not email or not password:
+        return json_response({"message": "All fields are required"}, 400)
+
+    async with sessions() as session:
+        existing_user = await session.scalar(select(User.id).filter_by(email=email).limit(1))
+    if existing_user is not None:
+        return json_response({"message": "User already exists"}, 400)
+
+    # No connection is held while bcrypt runs
+    hashed_password = await request.app.state.hasher.hash(password)
+    async with sessions() as session:
+        user_id = await session.scalar(
+            insert(User).values(username=name, email=email, password_hash=hashed_password).returning(User.id)
+        )
+        await session.commit()
+
+    return json_response({
+        "message": "User registered successfully",
+        "user": {"id": user_id, "name": name, "email": email}
+    }, 201)
+
+
+@endpoint
+async def login(request, sessions):
+    data = await json_body(request)
+    email = data.get("email")
+    password = data.get("password")
+
+    enforce_rate_limits(
+        ("login_ip", client_ip(request)),
+        ("login_email", email.strip().lower() if isinstance(email, str) else None),
+    )
+
+    if not email or not password:
+        return json_response({"message": "Email and password required"}, 400)
+
+    async with sessions() as session:
+        user = (await session.execute(
+            select(User.id, User.username, User.email, User.password_hash).filter_by(email=email).limit(1)
+        )).first()
+    if not user:
+        return json_response({"message": "Invalid credentials"}, 401)
+
+    hasher = request.app.state.hasher
+    if not await hasher.verify(user.password_hash, password):
+        return json_response({"message": "Invalid credentials"}, 401)
+
+    # Upgrade hashes made with an older work factor while we have the plaintext
+    if hasher.needs_rehash(user.password_hash):
+        new_hash = await hasher.hash(password)
+        async with sessions() as session:
+            await session.execute(update(User).where(User.id == user.id).values(password_hash=new_hash))
+            await session.commit()
+
+    return json_response({
+        "id": user.id,
+        "name": user.username,
+        "email": user.email,
+        "access_token": issue_access_token(user),
+        "token_type": "Bearer",
+        "expires_in": current_app.config["ACCESS_TOKEN_TTL"],
+    })
+
+
+@endpoint
+async def plans(request, sessions):
+    catalog = await request.app.state.plan_catalog.get(sessions)
+    headers = {
+        "ETag": catalog["etag"],
+        "Cache-Control": f"public, max-age={current_app.config['PLANS_MAX_AGE']}",
+    }
+    if_none_match = [tag.strip() for tag in request.headers.get("If-None-Match", "").split(",")]
+    if catalog["etag"] in if_none_match or "*" in if_none_match:
+        return Response(status_code=304, headers=headers)
+    return Response(catalog["body"], headers=headers, media_type="application/json")
+
+
+@endpoint
+async def purchase(request, sessions):
+    authenticate(request)
+    data = await json_body(request)
+    if not data:
+        return json_response({"error": "Missing JSON body"}, 400)
+
+    # The buyer is whoever the access token says, never a client-supplied id
+    user_id = g.principal["id"]
+    plan_id = data.get("plan_id")
+
+    if data.get("user_id") not in (None, user_id):
+        return json_response({"error": "You can only purchase subscriptions for yourself"}, 403)
+    if not plan_id:
+        return json_response({"error": "plan_id required"}, 400)
+
+    serializer = row_serializer(Subscription)
+    async with sessions() as session:
+        try:
+            # Everything below runs in one transaction, serialized per user
+            user_found = await lock_user(session, user_id)
+            plan = await session.get(Plan, plan_id)
+            if not user_found or not plan:
+                await session.rollback()
+                return json_response({"error": "Invalid user or plan"}, 400)
+
+            now = datetime.now(timezone.utc)
+            expires_at = await session.scalar(
+                select(Subscription.ends_at)
+                .where(
+                    Subscription.user_id == user_id,
+                    Subscription.status == "active",
+                    Subscription.ends_at > utc_naive(now)
+                )
+                .limit(1)
+            )
+            if expires_at is not None:
+                await session.rollback()
+                return json_response(subscription_conflict(expires_at, now), 409)
+
+            ends_at = now + timedelta(minutes=plan.duration_minutes)
+            sub = (await session.execute(
+                insert(Subscription)
+                .values(user_id=user_id, plan_id=plan.id, status="active",
+                        ends_at=utc_naive(ends_at), timestamp=utc_naive(now))
+                .returning(*serializer.columns)
+            )).one()
+            await session.execute(
+                insert(UserPlanHistory).values(user_id=user_id, plan_id=plan.id, purchase_date=utc_naive(now))
+            )
+            await bump_plan_stats(session, [(plan.id, 1, plan.price, None, None)])
+            await session.commit()
+        except Exception as e:
+            await session.rollback()
+            logger.exception("Error creating subscription")
+            return json_response({"error": "Subscription failed", "details": str(e)}, 500)
+
+    return raw_json_response(serializer.encode(sub), 201)
+
+
+@endpoint
+async def user_subscriptions(request, sessions):
+    authenticate(request)
+    user_id = request.path_params["user_id"]
+    require_same_user(user_id)
+    try:
+        query, sub_keys, plan_keys = user_subscriptions_query(user_id, request.query_params)
+    except ValueError as e:
+        return json_response({"error": str(e)}, 400)
+    async with sessions() as session:
+        rows = (await session.execute(query)).all()
+    return json_response(subscription_items(rows, sub_keys, plan_keys))
+
+
+@endpoint
+async def cancel_subscription(request, sessions):
+    authenticate(request)
+    sub_id = request.path_params["sub_id"]
+    async with sessions() as session:
+        row = (await session.execute(
+            select(Subscription.user_id, Subscription.plan_id, Plan.price)
+            .join(Plan, Plan.id == Subscription.plan_id)
+            .where(Subscription.id == sub_id)
+        )).first()
+        if row is None:
+            return json_response({"error": "Subscription not found"}, 404)
+        user_id, plan_id, price = row
+        require_same_user(user_id)
+        await bump_plan_stats(session, [(plan_id, -1, price, None, None)])
+        await session.execute(delete(Subscription).where(Subscription.id == sub_id))
+        await session.commit()
+    return json_response({"message": f"Subscription {sub_id} cancelled"})
+
+
+async def stream_all(sessions, serializer, source, filters):
+    """stream_all() over an AsyncSession: one JSON array, read in id-ordered batches"""
+    encode = serializer.encode
+    async with sessions() as session:
+        yield "["
+        after = 0
+        first = True
+        while True:
+            statement = keyset_statement(serializer, source, filters, after, STREAM_BATCH_SIZE)
+            rows = (await session.execute(statement)).all()
+            if not rows:
+                break
+            yield ("" if first else ",") + ",".join(map(encode, rows))
+            first = False
+            after = rows[-1][0]
+        yield "]"
+
+
+@endpoint
+async def user_plan_history(request, sessions):
+    authenticate(request)
+    require_same_user(request.path_params["user_id"])
+    args = request.query_params
+    try:
+        serializer = list_serializer(UserPlanHistory, args)
+    except ValueError as e:
+        return json_response({"error": str(e)}, 400)
+    # Archived purchases are only read when asked for
+    history = with_archive(UserPlanHistory, UserPlanHistoryArchive, arg_flag("include_archived", args))
+    filters = {"user_id": request.path_params["user_id"]}
+    if arg_flag("stream", args):
+        return StreamingResponse(stream_all(sessions, serializer, history, filters), media_type="application/json")
+
+    after, limit = page_args(args)
+    async with sessions() as session:
+        rows = (await session.execute(keyset_statement(serializer, history, filters, after, limit + 1))).all()
+    return Response(page_body(serializer, rows, limit), media_type="application/json")
+
+
+@endpoint
+async def add_history(request, sessions):
+    authenticate(request)
+    data = await json_body(request)
+    user_id = g.principal["id"]
+    plan_id = data.get("plan_id")
+    rating = data.get("rating")
+    review = data.get("review")
+
+    if data.get("user_id") not in (None, user_id):
+        return json_response({"error": "You can only review your own purchases"}, 403)
+    if not plan_id:
+        return json_response({"error": "plan_id required"}, 400)
+    try:
+        rating = parse_rating(rating)
+    except ValueError as e:
+        return json_response({"error": str(e)}, 400)
+
+    serializer = row_serializer(UserPlanHistory)
+    async with sessions() as session:
+        plan = await session.get(Plan, plan_id)
+        if not plan:
+            return json_response({"error": "Invalid plan"}, 400)
+
+        history = (await session.execute(
+            insert(UserPlanHistory)
+            .values(user_id=user_id, plan_id=plan_id, rating=rating, review=review,
+                    purchase_date=utc_naive(datetime.now(timezone.utc)))
+            .returning(*serializer.columns)
+        )).one()
+        await bump_plan_stats(session, [(plan.id, 0, plan.price, rating, review)])
+        await session.commit()
+
+    return raw_json_response(serializer.encode(history), 201)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    # Each worker process opens its own engine once its event loop is running
+    flask_app = app.state.flask_app
+    with flask_app.app_context():
+        url, connect_args = async_database_url(db.engine.url)
+        app.state.hasher = AsyncPasswordHasher(password_hasher())
+    engine = create_async_engine(url, connect_args=connect_args, **flask_app.config["SQLALCHEMY_ENGINE_OPTIONS"])
+    app.state.sessions = async_sessionmaker(engine, expire_on_commit=False)
+    app.state.plan_catalog = PlanCatalog()
+    try:
+        yield
+    finally:
+        await engine.dispose()
+
+
+def create_asgi_app(flask_app=flask_app):
+    """Build the Starlette app from a Flask app's settings and services (app.py's own by default)"""
+    config = flask_app.config
+    middleware = [
+        Middleware(
+            CORSMiddleware,
+            allow_origins=cors_origins(config),
+            allow_methods=["GET", "POST", "PUT", "DELETE", "PATCH", "OPTIONS"],
+            allow_headers=["Content-Type", "Authorization", "X-Last-Write"],
+            expose_headers=["X-Last-Write"],
+            allow_credentials=True,
+        ),
+    ]
+    if config["COMPRESSION_ENABLED"]:
+        middleware.append(Middleware(
+            GZipMiddleware, minimum_size=config["COMPRESSION_MIN_SIZE"], compresslevel=config["COMPRESSION_LEVEL"],
+        ))
+    routes = [
+        Route("/", root),
+        Route("/register", register, methods=["POST"]),
+        Route("/login", login, methods=["POST"]),
+        Route("/plans", plans),
+        Route("/subscriptions", purchase, methods=["POST"]),
+        Route("/subscriptions/{user_id:int}", user_subscriptions),
+        Route("/subscriptions/{sub_id:int}", cancel_subscription, methods=["DELETE"]),
+        Route("/user-plan-history", add_history, methods=["POST"]),
+        Route("/user-plan-history/{user_id:int}", user_plan_history),
+    ]
+    app = Starlette(routes=routes, middleware=middleware, lifespan=lifespan)
+    app.state.flask_app = flask_app
+    return app
+
+
+app = create_asgi_app()
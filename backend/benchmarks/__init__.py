@@ -0,0 +1,5 @@
+"""
+Benchmarks for the WiFi Portal backend.
+
+Run them from the backend directory, e.g. `python -m benchmarks.indexes`.
+"""
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Compare concurrent-connection throughput of the sync (app:app) and async (asgi:app) deployments.
+
+Seeds a scratch database like benchmarks.load (reseeded before each
+deployment so both start from the same rows), then starts gunicorn with
+gunicorn.conf.py twice with the same number of workers: app:app on gthread
+workers and asgi:app on uvicorn workers. Every scenario is driven at each
+--concurrency level with keep-alive clients, each logged in as its own user.
+
+    python -m benchmarks.async_server --concurrency 32 128 512 --duration 10 --output async.json
+
+The async deployment needs `pip install starlette uvicorn aiosqlite` (asyncpg
+instead of aiosqlite with a PostgreSQL --database-url); it is skipped otherwise.
+"""
+
+import argparse
+import importlib.util
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+from datetime import datetime, timezone
+
+import sqlalchemy as sa
+
+from benchmarks.load import SCENARIOS, Client, drive, prepare_database
+from benchmarks.server import BACKEND_DIR, free_port, wait_until_up
+
+CPUS = multiprocessing.cpu_count()
+
+DEPLOYMENTS = {
+    "sync": ("app:app", {"GUNICORN_WORKER_CLASS": "gthread"}),
+    "async": ("asgi:app", {"GUNICORN_WORKER_CLASS": "uvicorn.workers.UvicornWorker"}),
+}
+
+
+def missing_async_requirements(database_url):
+    driver = "asyncpg" if sa.engine.make_url(database_url).get_backend_name() == "postgresql" else "aiosqlite"
+    return [name for name in ("starlette", "uvicorn", driver) if importlib.util.find_spec(name) is None]
+
+
+def log_in_all(clients):
+    """Log every client in at once; one at a time would take minutes of bcrypt at high concurrency"""
+    failures = []
+
+    def run(client):
+        try:
+            client.log_in()
+        except RuntimeError as e:
+            failures.append(e)
+
+    threads = [threading.Thread(target=run, args=(client,)) for client in clients]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if failures:
+        raise failures[0]
+
+
+def run_deployment(name, args, database_url):
+    target, deployment_env = DEPLOYMENTS[name]
+    prepare_database(database_url, args.rows, args.users, args.bcrypt_rounds)
+    port = free_port()
+    env = dict(
+        os.environ,
+        DATABASE_URL=database_url,
+        PORT=str(port),
+        RATE_LIMIT_ENABLED="false",
+        EXPIRY_SWEEP_INTERVAL="0",
+        BCRYPT_LOG_ROUNDS=str(args.bcrypt_rounds),
+        WEB_CONCURRENCY=args.workers,
+        GUNICORN_THREADS=args.threads,
+        # Clients sit idle between scenarios; a closed or recycled connection would count as an error
+        GUNICORN_KEEPALIVE="120",
+        GUNICORN_MAX_REQUESTS="0",
+        **deployment_env,
+    )
+    env.pop("FLASK_APP", None)
+    subprocess.run([sys.executable, "-m", "flask", "--app", "app", "rebuild-plan-stats"], cwd=BACKEND_DIR,
+                   env=env, check=True, stdout=subprocess.DEVNULL)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "--config", "gunicorn.conf.py", target],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+    results = []
+    try:
+        wait_until_up(port)
+        for concurrency in args.concurrency:
+            clients = [Client("127.0.0.1", port, user_id, args.users, user_id) for user_id in range(1, concurrency + 1)]
+            log_in_all(clients)
+            for scenario in args.scenarios:
+                row = dict(drive(clients, scenario, args.duration), deployment=name)
+                results.append(row)
+                print(f"⚡ {name:<6} {scenario:<20} c={concurrency:<4} {row['throughput_rps']:>9} req/s  "
+                      f"p50 {row['p50_ms']} ms  p95 {row['p95_ms']} ms  errors {row['errors']}", file=sys.stderr)
+            for client in clients:
+                client.conn.close()
+    finally:
+        server.terminate()
+        server.wait()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--deployments", nargs="+", choices=list(DEPLOYMENTS), default=list(DEPLOYMENTS))
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[32, 128, 512])
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per (scenario, concurrency)")
+    parser.add_argument("--users", type=int, default=2_000)
+    parser.add_argument("--rows", type=int, default=50_000, help="subscription and history rows to seed")
+    parser.add_argument("--bcrypt-rounds", type=int, default=10)
+    parser.add_argument("--database-url", help="scratch database to seed (default: temporary SQLite file)")
+    parser.add_argument("--workers", default=str(CPUS), help="WEB_CONCURRENCY for both deployments")
+    parser.add_argument("--threads", default="8", help="GUNICORN_THREADS for the sync deployment")
+    parser.add_argument("--output", help="write the JSON report here as well as to stdout")
+    args = parser.parse_args()
+
+    if max(args.concurrency) > args.users:
+        parser.error("--users must be at least the highest --concurrency")
+
+    workdir = tempfile.mkdtemp()
+    database_url = args.database_url or f"sqlite:///{os.path.join(workdir, 'async.db')}"
+    results = []
+    for name in args.deployments:
+        missing = missing_async_requirements(database_url) if name == "async" else []
+        if missing:
+            print(f"⏭️  {name}: skipped (pip install {' '.join(missing)})", file=sys.stderr)
+            continue
+        print(f"🚀 {name}: {DEPLOYMENTS[name][0]} x{args.workers}", file=sys.stderr)
+        results.extend(run_deployment(name, args, database_url))
+
+    by_key = {(row["deployment"], row["scenario"], row["concurrency"]): row for row in results}
+    print(f"\n{'scenario':<20}{'conns':>7}{'sync req/s':>12}{'async req/s':>13}{'speedup':>9}", file=sys.stderr)
+    for concurrency in args.concurrency:
+        for scenario in args.scenarios:
+            sync = by_key.get(("sync", scenario, concurrency))
+            asynchronous = by_key.get(("async", scenario, concurrency))
+            speedup = (
+                f"{asynchronous['throughput_rps'] / sync['throughput_rps']:.2f}x"
+                if sync and asynchronous and sync["throughput_rps"] else "-"
+            )
+            print(f"{scenario:<20}{concurrency:>7}{sync['throughput_rps'] if sync else '-':>12}"
+                  f"{asynchronous['throughput_rps'] if asynchronous else '-':>13}{speedup:>9}", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "cpus": CPUS,
+            "database": sa.engine.make_url(database_url).get_backend_name(),
+            "users": args.users,
+            "rows": args.rows,
+            "duration": args.duration,
+            "bcrypt_rounds": args.bcrypt_rounds,
+            "workers": args.workers,
+            "sync_threads": args.threads,
+        },
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
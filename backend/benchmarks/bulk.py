@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Benchmark POST /subscriptions/bulk provisioning for a venue-sized batch.
+
+Runs the app in-process against a scratch SQLite database, seeds --items
+fresh users and provisions one subscription for each in a single request,
+--runs times. The target is 10,000 subscriptions in under a second.
+
+    python -m benchmarks.bulk --items 10000 --runs 3
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from app import create_app, db, Plan, User
+
+OPERATOR_KEY = "bench-operator-key"
+TARGET_SECONDS = 1.0
+
+
+def seed(app, count, run):
+    with app.app_context():
+        users = [User(username=f"bulk{run}_{i}", email=f"bulk{run}_{i}@example.com", password_hash="x")
+                 for i in range(count)]
+        plan = Plan(name=f"Bulk {run}", duration_minutes=120, price=20)
+        db.session.add_all(users + [plan])
+        db.session.commit()
+        return [user.id for user in users], plan.id
+
+
+def provision(app, user_ids, plan_id):
+    items = [{"user_id": user_id, "plan_id": plan_id} for user_id in user_ids]
+    started = time.perf_counter()
+    response = app.test_client().post("/subscriptions/bulk", json={"items": items},
+                                      headers={"X-Operator-Key": OPERATOR_KEY})
+    elapsed = time.perf_counter() - started
+    assert response.status_code == 200, response.get_data(as_text=True)
+    assert response.get_json()["summary"]["created"] == len(user_ids), response.get_json()["summary"]
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, default=10_000, help="subscriptions per request")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        app = create_app(
+            "testing",
+            SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(workdir, 'bulk.db')}",
+            OPERATOR_API_KEY=OPERATOR_KEY,
+            BULK_MAX_ITEMS=max(args.items, 10_000),
+        )
+        with app.app_context():
+            db.create_all()
+
+        print(f"📦 /subscriptions/bulk with {args.items} items")
+        timings = []
+        for run in range(args.runs):
+            user_ids, plan_id = seed(app, args.items, run)
+            timings.append(provision(app, user_ids, plan_id))
+            print(f"   run {run + 1}: {timings[-1]:.3f}s ({args.items / timings[-1]:,.0f} subscriptions/s)")
+
+        with app.app_context():
+            db.engine.dispose()
+
+    best = min(timings)
+    verdict = "within" if best < TARGET_SECONDS else "over"
+    print(f"best {best:.3f}s, {verdict} the {TARGET_SECONDS:.0f}s target")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Benchmark the subscription/history hot-path queries with and without indexes.
+
+Seeds a scratch database (SQLite by default, or --database-url for PostgreSQL),
+prints the query plan and median timing of each query, creates the indexes
+declared on the models and measures again.
+
+    python -m benchmarks.indexes --rows 1000000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import sqlalchemy as sa
+
+from app import db, User, Plan, Subscription, UserPlanHistory
+
+QUERIES = {
+    "overlap check": (
+        "SELECT id, ends_at FROM subscription "
+        "WHERE user_id = :user_id AND status = 'active' AND ends_at > :now LIMIT 1"
+    ),
+    "user subscriptions": (
+        "SELECT subscription.id, subscription.ends_at, plan.name FROM subscription "
+        "JOIN plan ON plan.id = subscription.plan_id "
+        "WHERE subscription.user_id = :user_id ORDER BY subscription.ends_at DESC"
+    ),
+    "active subscriptions": (
+        "SELECT subscription.id FROM subscription "
+        "WHERE subscription.user_id = :user_id AND status = 'active' AND ends_at > :now "
+        "ORDER BY ends_at DESC"
+    ),
+    "user history": (
+        "SELECT id, plan_id, purchase_date FROM user_plan_history "
+        "WHERE user_id = :user_id ORDER BY purchase_date DESC LIMIT 50"
+    ),
+    "expiry sweep": (
+        "SELECT id FROM subscription WHERE status = 'active' AND ends_at <= :now "
+        "ORDER BY ends_at LIMIT 500"
+    ),
+}
+
+INDEXED_TABLES = [Subscription.__table__, UserPlanHistory.__table__]
+
+
+def seed(engine, rows, users):
+    """Insert `users` users, four plans and `rows` subscriptions and history rows"""
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    rng = random.Random(42)
+    batch = 50_000
+
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [
+            {"id": i, "username": f"user{i}", "email": f"user{i}@example.com", "password_hash": "x"}
+            for i in range(1, users + 1)
+        ])
+        conn.execute(Plan.__table__.insert(), [
+            {"id": i, "name": f"{i} Hours", "duration_minutes": 60 * i, "price": 10 * i}
+            for i in range(1, 5)
+        ])
+
+        for start in range(0, rows, batch):
+            subs, history = [], []
+            for _ in range(min(batch, rows - start)):
+                user_id = rng.randint(1, users)
+                plan_id = rng.randint(1, 4)
+                bought = now - timedelta(minutes=rng.randint(0, 365 * 24 * 60))
+                ends_at = bought + timedelta(hours=plan_id)
+                # Roughly the live shape: a small tail is still active
+                status = "active" if ends_at > now - timedelta(days=2) else "expired"
+                subs.append({"user_id": user_id, "plan_id": plan_id, "status": status,
+                             "timestamp": bought, "ends_at": ends_at})
+                history.append({"user_id": user_id, "plan_id": plan_id, "purchase_date": bought})
+            conn.execute(Subscription.__table__.insert(), subs)
+            conn.execute(UserPlanHistory.__table__.insert(), history)
+
+
+def explain(conn, sql, params):
+    if conn.dialect.name == "postgresql":
+        rows = conn.execute(sa.text("EXPLAIN ANALYZE " + sql), params)
+        return "\n".join(row[0] for row in rows)
+    rows = conn.execute(sa.text("EXPLAIN QUERY PLAN " + sql), params)
+    return "\n".join(row[-1] for row in rows)
+
+
+def measure(engine, users, repeat, label):
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    rng = random.Random(7)
+    results = {}
+
+    with engine.connect() as conn:
+        # Refresh planner statistics so the indexes are actually considered
+        conn.execute(sa.text("ANALYZE"))
+
+        for name, sql in QUERIES.items():
+            statement = sa.text(sql)
+            if ":now" in sql:
+                statement = statement.bindparams(sa.bindparam("now", type_=sa.DateTime))
+            params = {"user_id": rng.randint(1, users), "now": now}
+            plan = explain(conn, str(statement), params)
+
+            timings = []
+            for _ in range(repeat):
+                params["user_id"] = rng.randint(1, users)
+                started = time.perf_counter()
+                conn.execute(statement, params).fetchall()
+                timings.append((time.perf_counter() - started) * 1000)
+
+            results[name] = statistics.median(timings)
+            print(f"--- [{label}] {name}: median {results[name]:.3f} ms")
+            print("    " + plan.replace("\n", "\n    "))
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000, help="subscription and history rows to seed")
+    parser.add_argument("--users", type=int, default=100_000, help="distinct users to spread rows across")
+    parser.add_argument("--repeat", type=int, default=50, help="timed executions per query")
+    parser.add_argument("--database-url", help="scratch database to use (default: temporary SQLite file)")
+    args = parser.parse_args()
+
+    scratch = None
+    url = args.database_url
+    if not url:
+        scratch = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+        url = f"sqlite:///{scratch.name}"
+    engine = sa.create_engine(url)
+
+    try:
+        db.metadata.drop_all(engine)
+        db.metadata.create_all(engine)
+        for table in INDEXED_TABLES:
+            for index in table.indexes:
+                index.drop(engine)
+
+        print(f"🌱 Seeding {args.rows:,} subscriptions and history rows across {args.users:,} users...")
+        started = time.perf_counter()
+        seed(engine, args.rows, args.users)
+        print(f"   done in {time.perf_counter() - started:.1f}s\n")
+
+        before = measure(engine, args.users, args.repeat, "no indexes")
+
+        print("\n🔧 Creating indexes...")
+        started = time.perf_counter()
+        for table in INDEXED_TABLES:
+            for index in table.indexes:
+                index.create(engine)
+        print(f"   done in {time.perf_counter() - started:.1f}s\n")
+
+        after = measure(engine, args.users, args.repeat, "indexed")
+
+        print("\n📊 Median latency (ms)")
+        print(f"{'query':<24}{'before':>12}{'after':>12}{'speedup':>10}")
+        for name in QUERIES:
+            speedup = before[name] / after[name] if after[name] else float("inf")
+            print(f"{name:<24}{before[name]:>12.3f}{after[name]:>12.3f}{speedup:>9.1f}x")
+    finally:
+        engine.dispose()
+        if scratch:
+            scratch.close()
+            os.unlink(scratch.name)
+
+
+if __name__ == "__main__":
+    main()
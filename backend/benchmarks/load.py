@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Load-test the API endpoints and report throughput and latency percentiles as JSON.
+
+Seeds a scratch database (SQLite by default, or --database-url for PostgreSQL)
+with --users users and --rows subscriptions/history rows, starts gunicorn with
+gunicorn.conf.py against it (or targets --url, which must use the same
+database), then drives each scenario at every --concurrency level with
+keep-alive clients, each logged in as its own seeded user.
+
+    python -m benchmarks.load --concurrency 1 8 32 --duration 10 --output run.json
+    python -m benchmarks.load --baseline run.json --threshold 15
+
+With --baseline the run is compared scenario by scenario; a throughput drop
+or p95 increase beyond --threshold percent is reported as a regression and
+the process exits with status 1.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+import sqlalchemy as sa
+
+from app import db, User, hash_password
+from benchmarks.indexes import seed
+from benchmarks.server import BACKEND_DIR, free_port, percentile, wait_until_up
+
+PASSWORD = "Bench1!"
+PLANS = 4
+
+
+def login(client):
+    return "POST", "/login", {"email": f"user{client.user_id}@example.com", "password": PASSWORD}
+
+
+def plans(client):
+    return "GET", "/plans", None
+
+
+def purchase(client):
+    # Most attempts hit the overlap check and get a 409, which is the common path at peak
+    return "POST", "/subscriptions", {"plan_id": client.rng.randint(1, PLANS)}
+
+
+def user_subscriptions(client):
+    return "GET", f"/subscriptions/{client.user_id}", None
+
+
+def history(client):
+    return "GET", f"/user-plan-history/{client.user_id}", None
+
+
+SCENARIOS = {
+    "login": login,
+    "plans": plans,
+    "purchase": purchase,
+    "user-subscriptions": user_subscriptions,
+    "history": history,
+}
+
+
+class Client:
+    """One keep-alive connection acting as a single logged-in user"""
+
+    def __init__(self, host, port, user_id, users, seed_value):
+        self.host, self.port = host, port
+        self.user_id = user_id
+        self.users = users
+        self.rng = random.Random(seed_value)
+        self.token = None
+        self.conn = http.client.HTTPConnection(host, port, timeout=30)
+
+    def request(self, method, path, body=None):
+        headers = {}
+        if body is not None:
+            headers["Content-Type"] = "application/json"
+            body = json.dumps(body)
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        try:
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+            return response.status, response.read()
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            return None, b""
+
+    def log_in(self):
+        status, body = self.request(*login(self))
+        if status != 200:
+            raise RuntimeError(f"login for user{self.user_id} failed with {status}")
+        self.token = json.loads(body)["access_token"]
+
+
+def drive(clients, scenario, duration):
+    """Run every client against `scenario` for `duration` seconds; returns one result row"""
+    build = SCENARIOS[scenario]
+    latencies, statuses = [], {}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def run(client):
+        mine, counts = [], {}
+        while time.monotonic() < deadline:
+            method, path, body = build(client)
+            started = time.perf_counter()
+            status, _ = client.request(method, path, body)
+            mine.append((time.perf_counter() - started) * 1000)
+            counts[status] = counts.get(status, 0) + 1
+        with lock:
+            latencies.extend(mine)
+            for status, count in counts.items():
+                statuses[status] = statuses.get(status, 0) + count
+
+    threads = [threading.Thread(target=run, args=(client,)) for client in clients]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    errors = sum(count for status, count in statuses.items() if status is None or status >= 500)
+    return {
+        "scenario": scenario,
+        "concurrency": len(clients),
+        "requests": len(latencies),
+        "errors": errors,
+        "status_counts": {str(status): count for status, count in sorted(statuses.items(), key=str)},
+        "throughput_rps": round(len(latencies) / duration, 1),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+    }
+
+
+def compare(results, baseline, threshold):
+    """Return a list of human-readable regressions against a previous run"""
+    previous = {(row["scenario"], row["concurrency"]): row for row in baseline["results"]}
+    regressions = []
+    for row in results:
+        before = previous.get((row["scenario"], row["concurrency"]))
+        if before is None:
+            continue
+        label = f"{row['scenario']} @ {row['concurrency']}"
+        if before["throughput_rps"] and row["throughput_rps"] < before["throughput_rps"] * (1 - threshold / 100):
+            regressions.append(f"{label}: throughput {before['throughput_rps']} -> {row['throughput_rps']} req/s")
+        if before["p95_ms"] and row["p95_ms"] > before["p95_ms"] * (1 + threshold / 100):
+            regressions.append(f"{label}: p95 {before['p95_ms']} -> {row['p95_ms']} ms")
+        if row["errors"] > before["errors"]:
+            regressions.append(f"{label}: errors {before['errors']} -> {row['errors']}")
+    return regressions
+
+
+def prepare_database(url, rows, users, rounds):
+    engine = sa.create_engine(url)
+    try:
+        db.metadata.drop_all(engine)
+        db.metadata.create_all(engine)
+        seed(engine, rows, users)
+        # Every seeded user shares one real hash so /login does genuine bcrypt work
+        with engine.begin() as conn:
+            conn.execute(User.__table__.update().values(password_hash=hash_password(PASSWORD, rounds)))
+    finally:
+        engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per (scenario, concurrency)")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--rows", type=int, default=100_000, help="subscription and history rows to seed")
+    parser.add_argument("--bcrypt-rounds", type=int, default=10)
+    parser.add_argument("--database-url", help="scratch database to seed (default: temporary SQLite file)")
+    parser.add_argument("--url", help="benchmark an already running server instead of starting gunicorn")
+    parser.add_argument("--workers", default="4", help="WEB_CONCURRENCY for the local server")
+    parser.add_argument("--worker-class", default="gthread", help="GUNICORN_WORKER_CLASS for the local server")
+    parser.add_argument("--threads", default="8", help="GUNICORN_THREADS for the local server")
+    parser.add_argument("--output", help="write the JSON report here as well as to stdout")
+    parser.add_argument("--baseline", help="previous JSON report to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0, help="regression tolerance in percent")
+    args = parser.parse_args()
+
+    if max(args.concurrency) > args.users:
+        parser.error("--users must be at least the highest --concurrency")
+
+    workdir = tempfile.mkdtemp()
+    database_url = args.database_url or f"sqlite:///{os.path.join(workdir, 'load.db')}"
+    print(f"🌱 Seeding {args.users:,} users and {args.rows:,} subscriptions...", file=sys.stderr)
+    prepare_database(database_url, args.rows, args.users, args.bcrypt_rounds)
+
+    server = None
+    if args.url:
+        parts = urlsplit(args.url)
+        host, port = parts.hostname, parts.port or 80
+    else:
+        host, port = "127.0.0.1", free_port()
+        env = dict(
+            os.environ,
+            DATABASE_URL=database_url,
+            PORT=str(port),
+            RATE_LIMIT_ENABLED="false",
+            EXPIRY_SWEEP_INTERVAL="0",
+            BCRYPT_LOG_ROUNDS=str(args.bcrypt_rounds),
+            WEB_CONCURRENCY=args.workers,
+            GUNICORN_WORKER_CLASS=args.worker_class,
+            GUNICORN_THREADS=args.threads,
+        )
+        env.pop("FLASK_APP", None)
+        subprocess.run([sys.executable, "-m", "flask", "--app", "app", "rebuild-plan-stats"], cwd=BACKEND_DIR,
+                       env=env, check=True, stdout=subprocess.DEVNULL)
+        server = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "--config", "gunicorn.conf.py", "app:app"],
+            cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+
+    results = []
+    try:
+        if server:
+            wait_until_up(port)
+        for concurrency in args.concurrency:
+            clients = [Client(host, port, user_id, args.users, user_id) for user_id in range(1, concurrency + 1)]
+            for client in clients:
+                client.log_in()
+            for scenario in args.scenarios:
+                row = drive(clients, scenario, args.duration)
+                results.append(row)
+                print(f"⚡ {scenario:<20} c={concurrency:<4} {row['throughput_rps']:>9} req/s  "
+                      f"p50 {row['p50_ms']} ms  p95 {row['p95_ms']} ms  p99 {row['p99_ms']} ms  "
+                      f"errors {row['errors']}", file=sys.stderr)
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    report = {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "database": sa.engine.make_url(database_url).get_backend_name(),
+            "users": args.users,
+            "rows": args.rows,
+            "duration": args.duration,
+            "bcrypt_rounds": args.bcrypt_rounds,
+            "server": args.url or f"gunicorn {args.worker_class} x{args.workers} ({args.threads} threads)",
+        },
+        "results": results,
+    }
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        report["regressions"] = regressions
+        for regression in regressions:
+            print(f"❌ regression: {regression}", file=sys.stderr)
+        if regressions:
+            exit_code = 1
+        else:
+            print(f"✅ No regressions beyond {args.threshold}% against {args.baseline}", file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark /login latency against concurrency for several bcrypt work factors.
+
+Runs the app in-process against a scratch SQLite database and reports p50/p99
+latency and throughput for each (cost, concurrency) pair. Compare the hashing
+pool with inline hashing by running once with --pool-size 0.
+
+    python -m benchmarks.login --costs 10 11 12 --concurrency 1 4 16
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+scratch = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+os.environ["DATABASE_URL"] = f"sqlite:///{scratch.name}"
+os.environ.setdefault("EXPIRY_SWEEP_INTERVAL", "0")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+from app import app, db, User, hash_password  # noqa: E402
+
+PASSWORD = "Bench1!"
+password_hasher = app.extensions["password_hasher"]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def login_once(email):
+    client = app.test_client()
+    started = time.perf_counter()
+    response = client.post("/login", json={"email": email, "password": PASSWORD})
+    elapsed = (time.perf_counter() - started) * 1000
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return elapsed
+
+
+def run(cost, concurrency, requests_per_level):
+    email = f"bench{cost}@example.com"
+    with app.app_context():
+        if not User.query.filter_by(email=email).first():
+            db.session.add(User(username=f"bench{cost}", email=email, password_hash=hash_password(PASSWORD, cost)))
+            db.session.commit()
+
+    # Target the same cost so the benchmark never triggers a rehash
+    password_hasher.rounds = cost
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(login_once, [email] * requests_per_level))
+    wall = time.perf_counter() - started
+
+    return {
+        "cost": cost,
+        "concurrency": concurrency,
+        "requests": requests_per_level,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "throughput_rps": round(requests_per_level / wall, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--costs", type=int, nargs="+", default=[10, 11, 12])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=64, help="logins per (cost, concurrency) pair")
+    parser.add_argument("--pool-size", type=int, default=None, help="override BCRYPT_POOL_SIZE (0 = inline)")
+    args = parser.parse_args()
+
+    if args.pool_size is not None:
+        password_hasher.pool_size = args.pool_size
+
+    try:
+        with app.app_context():
+            db.create_all()
+
+        print(f"🔐 /login with pool size {password_hasher.pool_size}")
+        print(f"{'cost':>6}{'conc':>6}{'p50 ms':>10}{'p99 ms':>10}{'req/s':>10}")
+        for cost in args.costs:
+            for concurrency in args.concurrency:
+                result = run(cost, concurrency, args.requests)
+                print(f"{result['cost']:>6}{result['concurrency']:>6}{result['p50_ms']:>10}"
+                      f"{result['p99_ms']:>10}{result['throughput_rps']:>10}")
+    finally:
+        scratch.close()
+        os.unlink(scratch.name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Compare rows per second for the list-endpoint JSON paths.
+
+Seeds an in-memory SQLite database and times, for /users and history rows:
+
+- marshmallow: ORM objects -> schema.dump -> json.dumps (the old path)
+- tuples: select(*columns) rows -> the precompiled RowSerializer
+- orjson: select(*columns) rows -> dicts -> orjson.dumps, for reference only;
+  its compact, non-ASCII-escaped output is not byte-compatible, so it is
+  reported but not used by the app (skipped when orjson isn't installed)
+
+Each path includes loading the rows, so the numbers reflect a whole page.
+
+    python -m benchmarks.serialization --rows 50000 --repeat 5
+"""
+
+import argparse
+import json
+import statistics
+import time
+
+import sqlalchemy as sa
+from sqlalchemy.orm import Session
+
+from app import User, UserPlanHistory, db, users_schema, user_plan_histories_schema
+from benchmarks.indexes import seed
+from serializers import RowSerializer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def marshmallow_path(session, model, schema):
+    return json.dumps(schema.dump(session.scalars(sa.select(model).order_by(model.id)).all()))
+
+
+def tuple_path(session, serializer):
+    rows = session.execute(sa.select(*serializer.columns).order_by(serializer.columns[0])).all()
+    return serializer.encode_all(rows)
+
+
+def orjson_path(session, serializer):
+    keys = [column.key for column in serializer.columns]
+    rows = session.execute(sa.select(*serializer.columns).order_by(serializer.columns[0])).all()
+    return orjson.dumps([dict(zip(keys, row)) for row in rows])
+
+
+def timed(run, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=50_000, help="users and history rows to seed")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    engine = sa.create_engine("sqlite://", poolclass=sa.pool.StaticPool)
+    db.metadata.create_all(engine)
+    seed(engine, args.rows, args.rows)
+
+    cases = [
+        ("users", User, users_schema, RowSerializer(User)),
+        ("history", UserPlanHistory, user_plan_histories_schema, RowSerializer(UserPlanHistory)),
+    ]
+    print(f"📦 {args.rows:,} rows per table, median of {args.repeat} runs")
+    print(f"{'table':<10}{'path':<14}{'rows/s':>14}{'speedup':>10}")
+    for name, model, schema, serializer in cases:
+        paths = {
+            "marshmallow": lambda: marshmallow_path(session, model, schema),
+            "tuples": lambda: tuple_path(session, serializer),
+        }
+        if orjson is not None:
+            paths["orjson*"] = lambda: orjson_path(session, serializer)
+
+        with Session(engine) as session:
+            assert paths["tuples"]() == paths["marshmallow"](), f"{name}: tuple path output differs"
+            session.expunge_all()
+            baseline = None
+            for label, run in paths.items():
+                # A fresh identity map each run so the ORM path pays for building objects
+                seconds = timed(lambda: (run(), session.expunge_all()), args.repeat)
+                baseline = baseline or seconds
+                print(f"{name:<10}{label:<14}{args.rows / seconds:>14,.0f}{baseline / seconds:>9.1f}x")
+
+    if orjson is not None:
+        print("* orjson output is not byte-compatible with the API responses; shown for reference")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Compare gunicorn worker models by throughput against a local server.
+
+Seeds a scratch SQLite database with `flask init-db`, then for each mode starts
+gunicorn with gunicorn.conf.py, drives keep-alive GET traffic at a fixed
+concurrency and reports requests/second with p50/p99 latency.
+
+    python -m benchmarks.server --concurrency 32 --duration 10
+"""
+
+import argparse
+import http.client
+import importlib.util
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PATHS = ["/plans", "/subscriptions/1", "/users?limit=50", "/user-plan-history/1"]
+CPUS = multiprocessing.cpu_count()
+
+MODES = {
+    "sync x1": {"WEB_CONCURRENCY": "1", "GUNICORN_THREADS": "1", "GUNICORN_WORKER_CLASS": "sync"},
+    f"sync x{CPUS * 2 + 1}": {"WEB_CONCURRENCY": str(CPUS * 2 + 1), "GUNICORN_THREADS": "1",
+                             "GUNICORN_WORKER_CLASS": "sync"},
+    f"gthread x{CPUS} (8 threads)": {"WEB_CONCURRENCY": str(CPUS), "GUNICORN_THREADS": "8",
+                                     "GUNICORN_WORKER_CLASS": "gthread"},
+    f"gevent x{CPUS}": {"WEB_CONCURRENCY": str(CPUS), "GUNICORN_WORKER_CLASS": "gevent"},
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_up(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server on port {port} did not start")
+
+
+def drive(port, concurrency, duration):
+    """Run `concurrency` keep-alive clients for `duration` seconds; return latencies and errors"""
+    latencies, errors = [], []
+    deadline = time.monotonic() + duration
+    lock = threading.Lock()
+
+    def client(offset):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        mine, failed, i = [], 0, offset
+        while time.monotonic() < deadline:
+            path = PATHS[i % len(PATHS)]
+            i += 1
+            started = time.perf_counter()
+            try:
+                conn.request("GET", path)
+                response = conn.getresponse()
+                response.read()
+                if response.status >= 500:
+                    failed += 1
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+                continue
+            mine.append((time.perf_counter() - started) * 1000)
+        with lock:
+            latencies.extend(mine)
+            errors.append(failed)
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, sum(errors)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of load per mode")
+    parser.add_argument("--modes", nargs="+", help="subset of modes to run (default: all)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        RATE_LIMIT_ENABLED="false",
+        EXPIRY_SWEEP_INTERVAL="0",
+        BCRYPT_LOG_ROUNDS="4",
+        GUNICORN_PRELOAD="true",
+    )
+    env.pop("FLASK_APP", None)
+    subprocess.run([sys.executable, "-m", "flask", "--app", "app", "init-db"], cwd=BACKEND_DIR, env=env,
+                   check=True, stdout=subprocess.DEVNULL)
+
+    have_gevent = importlib.util.find_spec("gevent") is not None
+    print(f"⚡ {args.concurrency} concurrent clients, {args.duration:.0f}s per mode, {CPUS} CPU(s)")
+    print(f"{'mode':<28}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+
+    for name, mode_env in MODES.items():
+        if args.modes and not any(name.startswith(mode) for mode in args.modes):
+            continue
+        if mode_env.get("GUNICORN_WORKER_CLASS") == "gevent" and not have_gevent:
+            print(f"{name:<28}{'skipped (pip install gevent)':>38}")
+            continue
+
+        port = free_port()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "--config", "gunicorn.conf.py", "app:app"],
+            cwd=BACKEND_DIR, env=dict(env, PORT=str(port), **mode_env),
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            wait_until_up(port)
+            latencies, errors = drive(port, args.concurrency, args.duration)
+        finally:
+            server.terminate()
+            server.wait()
+
+        print(f"{name:<28}{len(latencies) / args.duration:>10.1f}{percentile(latencies, 50):>10.2f}"
+              f"{percentile(latencies, 99):>10.2f}{errors:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Measure cold-start cost: importing the app and serving its first request.
+
+Each run is a fresh interpreter (like a new gunicorn worker or a Render cold
+start) against a scratch SQLite database seeded with `flask init-db`. Reports
+the median and worst import time, first-request latency and whole-process
+time, and exits with status 1 when a median is over its budget.
+
+    python -m benchmarks.startup --runs 10 --import-budget-ms 800 --first-request-budget-ms 250
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.server import BACKEND_DIR
+
+PROBE = """
+import json, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+response = app.app.test_client().get("/plans")
+served = time.perf_counter()
+assert response.status_code == 200, response.status_code
+print(json.dumps({"import_ms": (imported - started) * 1000, "first_request_ms": (served - imported) * 1000}))
+"""
+
+
+def probe(env):
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", PROBE], cwd=BACKEND_DIR, env=env,
+                            capture_output=True, text=True, check=True)
+    sample = json.loads(result.stdout.strip().splitlines()[-1])
+    sample["process_ms"] = (time.perf_counter() - started) * 1000
+    return sample
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--import-budget-ms", type=float, default=800.0)
+    parser.add_argument("--first-request-budget-ms", type=float, default=250.0)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'startup.db')}",
+        EXPIRY_SWEEP_INTERVAL="0",
+        BCRYPT_LOG_ROUNDS="4",
+        APP_ENV="production",
+    )
+    env.pop("FLASK_APP", None)
+    subprocess.run([sys.executable, "-m", "flask", "--app", "app", "init-db"], cwd=BACKEND_DIR, env=env,
+                   check=True, stdout=subprocess.DEVNULL)
+
+    samples = [probe(env) for _ in range(args.runs)]
+    budgets = {"import_ms": args.import_budget_ms, "first_request_ms": args.first_request_budget_ms}
+
+    print(f"🚀 {args.runs} cold starts")
+    print(f"{'phase':<18}{'median ms':>12}{'max ms':>10}{'budget ms':>12}")
+    over = []
+    for phase in ("import_ms", "first_request_ms", "process_ms"):
+        values = [sample[phase] for sample in samples]
+        median = statistics.median(values)
+        budget = budgets.get(phase)
+        print(f"{phase:<18}{median:>12.1f}{max(values):>10.1f}{budget if budget else '-':>12}")
+        if budget and median > budget:
+            over.append(f"{phase} median {median:.1f} ms exceeds budget {budget:.0f} ms")
+
+    for message in over:
+        print(f"❌ {message}")
+    if over:
+        sys.exit(1)
+    print("✅ Within startup budget")
+
+
+if __name__ == "__main__":
+    main()
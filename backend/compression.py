@@ -0,0 +1,73 @@
+"""
+Accept-Encoding negotiation and response body compression.
+
+gzip always works; br is offered only when the `brotli` package is
+pip-installed. Buffered bodies are compressed in one go, streamed bodies
+chunk by chunk so they are never held in memory.
+"""
+
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Server preference when the client rates several encodings equally
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def parse_accept_encoding(header):
+    """{coding: q} from an Accept-Encoding header; codings are lower-cased"""
+    weights = {}
+    for item in (header or "").split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[coding] = q
+    return weights
+
+
+def negotiate(header, encodings=ENCODINGS):
+    """The best of `encodings` the client accepts, or None to send the body as is"""
+    weights = parse_accept_encoding(header)
+    best, best_q = None, 0.0
+    for coding in encodings:
+        q = weights.get(coding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress(data, encoding, level=6):
+    if encoding == "br":
+        return brotli.compress(data, quality=min(level, 11))
+    return zlib.compress(data, level, wbits=31)
+
+
+def compress_stream(chunks, encoding, level=6):
+    """Compress an iterable of byte chunks, flushing after each so clients see data as it comes"""
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=min(level, 11))
+        for chunk in chunks:
+            data = compressor.process(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+        return
+
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,165 @@
+"""
+Configuration profiles for the WiFi Portal backend.
+
+Every setting comes from an environment variable; a profile only changes the
+defaults used when a variable is unset. The profile is picked by APP_ENV
+(development, testing or production), falling back to production when
+DATABASE_URL is set and development otherwise. The testing profile ignores
+DATABASE_URL and uses TEST_DATABASE_URL or an in-memory SQLite database.
+"""
+
+import os
+
+from dotenv import load_dotenv
+
+PROFILES = {
+    "production": {},
+    "development": {
+        # Surface slow statements and N+1 patterns while building features
+        "QUERY_DEBUG": "true",
+        "SLOW_QUERY_MS": "100",
+    },
+    "testing": {
+        "EXPIRY_SWEEP_INTERVAL": "0",
+        "BCRYPT_LOG_ROUNDS": "4",
+        "BCRYPT_POOL_SIZE": "0",
+        "METRICS_DIR": "",
+    },
+}
+
+
+def flag(value):
+    return str(value).lower() in ("1", "true", "yes")
+
+
+def load_config(app, profile=None, overrides=None):
+    """Fill app.config from the environment using `profile`'s defaults, then apply `overrides`"""
+    load_dotenv()
+    profile = profile or os.environ.get("APP_ENV") or ("production" if os.environ.get("DATABASE_URL") else "development")
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown APP_ENV {profile!r}; expected one of {', '.join(PROFILES)}")
+    defaults = PROFILES[profile]
+
+    def env(name, default=None):
+        return os.environ.get(name, defaults.get(name, default))
+
+    app.config["APP_ENV"] = profile
+    app.config["TESTING"] = profile == "testing"
+
+    # Database configuration - PostgreSQL for production, SQLite for development
+    if profile == "testing":
+        # Never the dev or production database: TEST_DATABASE_URL, else a private in-memory one
+        app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("TEST_DATABASE_URL", "sqlite://")
+    elif os.environ.get("DATABASE_URL"):
+        # Production: Use PostgreSQL from Render
+        app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL").replace("postgres://", "postgresql://", 1)
+    else:
+        # Development: Use SQLite
+        app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///app.db"
+
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+
+    # Connection pool: pre-ping and recycle drop connections the server (or Render's
+    # proxy) closed while idle; size/overflow are per worker process
+    def engine_options(uri):
+        options = {
+            "pool_pre_ping": flag(env("DB_POOL_PRE_PING", "true")),
+            "pool_recycle": int(env("DB_POOL_RECYCLE", 1800)),
+        }
+        if not uri.startswith("sqlite"):
+            options.update(
+                pool_size=int(env("DB_POOL_SIZE", 5)),
+                max_overflow=int(env("DB_MAX_OVERFLOW", 10)),
+                pool_timeout=int(env("DB_POOL_TIMEOUT", 30)),
+            )
+        return options
+
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(app.config["SQLALCHEMY_DATABASE_URI"])
+
+    # Read replica for GET requests (unset sends everything to the primary). A client that
+    # just wrote echoes the X-Last-Write header back and reads from the primary for
+    # REPLICA_MAX_LAG seconds; the replica is also skipped while it lags further than that.
+    app.config["REPLICA_DATABASE_URI"] = env("DATABASE_REPLICA_URL", "").replace("postgres://", "postgresql://", 1)
+    app.config["REPLICA_ENGINE_OPTIONS"] = engine_options(app.config["REPLICA_DATABASE_URI"])
+    app.config["REPLICA_MAX_LAG"] = float(env("REPLICA_MAX_LAG", 5))
+    app.config["REPLICA_LAG_CHECK_INTERVAL"] = float(env("REPLICA_LAG_CHECK_INTERVAL", 5))
+
+    app.config["SECRET_KEY"] = env("SECRET_KEY", "dev-secret-key-change-in-production")
+    # How long a worker trusts its cached plan catalog, and how long clients may cache /plans
+    app.config["PLAN_CACHE_TTL"] = int(env("PLAN_CACHE_TTL", 300))
+    app.config["PLANS_MAX_AGE"] = int(env("PLANS_MAX_AGE", 60))
+    # Background expiry sweeps; set the interval to 0 to rely on `flask expire-subscriptions`
+    app.config["EXPIRY_SWEEP_INTERVAL"] = int(env("EXPIRY_SWEEP_INTERVAL", 60))
+    app.config["EXPIRY_BATCH_SIZE"] = int(env("EXPIRY_BATCH_SIZE", 500))
+    # `flask archive` keeps this many whole months of ended subscriptions and history in the
+    # hot tables and moves older rows to the archive tables, ARCHIVE_BATCH_SIZE per transaction
+    app.config["ARCHIVE_AFTER_MONTHS"] = int(env("ARCHIVE_AFTER_MONTHS", 3))
+    app.config["ARCHIVE_BATCH_SIZE"] = int(env("ARCHIVE_BATCH_SIZE", 1000))
+    # Password hashing: bcrypt work factor and the size of the hashing process pool (0 hashes inline)
+    app.config["BCRYPT_LOG_ROUNDS"] = int(env("BCRYPT_LOG_ROUNDS", 12))
+    app.config["BCRYPT_POOL_SIZE"] = int(env("BCRYPT_POOL_SIZE", min(4, os.cpu_count() or 1)))
+    app.config["BCRYPT_MAX_PENDING"] = int(env("BCRYPT_MAX_PENDING", 64))
+    # Rate limits ("N/second|minute|hour|day", empty disables one) and where buckets live
+    app.config["RATE_LIMIT_ENABLED"] = flag(env("RATE_LIMIT_ENABLED", "true"))
+    app.config["RATE_LIMIT_STORAGE"] = env("RATE_LIMIT_STORAGE", "memory")
+    app.config["RATE_LIMIT_MAX_KEYS"] = int(env("RATE_LIMIT_MAX_KEYS", 100000))
+    app.config["RATE_LIMITS"] = {
+        "login_ip": env("RATE_LIMIT_LOGIN_IP", "20/minute"),
+        "login_email": env("RATE_LIMIT_LOGIN_EMAIL", "5/minute"),
+        "register_ip": env("RATE_LIMIT_REGISTER_IP", "10/minute"),
+    }
+    # Signed access tokens issued at login, and how many verified tokens each worker remembers
+    app.config["ACCESS_TOKEN_TTL"] = int(env("ACCESS_TOKEN_TTL", 12 * 3600))
+    app.config["PRINCIPAL_CACHE_SIZE"] = int(env("PRINCIPAL_CACHE_SIZE", 10000))
+    app.config["PRINCIPAL_CACHE_TTL"] = int(env("PRINCIPAL_CACHE_TTL", 300))
+    # How often each worker reloads its in-memory index of active subscriptions
+    app.config["ACCESS_INDEX_REFRESH"] = float(env("ACCESS_INDEX_REFRESH", 5))
+    app.config["ACCESS_CHECK_MAX_USERS"] = int(env("ACCESS_CHECK_MAX_USERS", 5000))
+    # Expiry events pushed to the gateway. Run `flask expiry-scheduler` as its own process,
+    # or set EXPIRY_SCHEDULER_IN_PROCESS when the API runs as a single worker.
+    app.config["EXPIRY_WEBHOOK_URL"] = env("EXPIRY_WEBHOOK_URL", "")
+    app.config["EXPIRY_WEBHOOK_SECRET"] = env("EXPIRY_WEBHOOK_SECRET", "")
+    app.config["EXPIRY_WEBHOOK_BATCH_SIZE"] = int(env("EXPIRY_WEBHOOK_BATCH_SIZE", 100))
+    app.config["EXPIRY_WEBHOOK_MAX_RETRIES"] = int(env("EXPIRY_WEBHOOK_MAX_RETRIES", 5))
+    app.config["EXPIRY_SCHEDULER_POLL"] = float(env("EXPIRY_SCHEDULER_POLL", 5))
+    app.config["EXPIRY_SCHEDULER_IN_PROCESS"] = flag(env("EXPIRY_SCHEDULER_IN_PROCESS", "false"))
+    # On startup, also fire for subscriptions that ended this many seconds ago and are still active
+    app.config["EXPIRY_SCHEDULER_CATCH_UP"] = int(env("EXPIRY_SCHEDULER_CATCH_UP", 24 * 3600))
+    # Live subscription streams (SSE), off by default: each open stream holds a worker under
+    # the default sync workers, so only enable them with gevent (or gthread) workers.
+    # Streams are opened with a short-lived stream token, since the URL lands in access logs.
+    # Then: keep-alive interval, reconnect-and-resync period, per-worker connection cap
+    # and per-connection event backlog
+    app.config["SSE_ENABLED"] = flag(env("SSE_ENABLED", "false"))
+    app.config["SSE_TOKEN_TTL"] = int(env("SSE_TOKEN_TTL", 60))
+    app.config["SSE_HEARTBEAT"] = float(env("SSE_HEARTBEAT", 15))
+    app.config["SSE_MAX_DURATION"] = float(env("SSE_MAX_DURATION", 300))
+    app.config["SSE_MAX_STREAMS"] = int(env("SSE_MAX_STREAMS", 1000))
+    app.config["SSE_QUEUE_SIZE"] = int(env("SSE_QUEUE_SIZE", 100))
+    # Prometheus metrics at /metrics. With several workers, point METRICS_DIR at a directory
+    # they share (gunicorn.conf.py sets one up) so a scrape sees every worker's numbers.
+    app.config["METRICS_ENABLED"] = flag(env("METRICS_ENABLED", "true"))
+    app.config["METRICS_DIR"] = env("METRICS_DIR", "")
+    app.config["METRICS_FLUSH_INTERVAL"] = float(env("METRICS_FLUSH_INTERVAL", 5))
+    # SQL diagnostics: log statements slower than SLOW_QUERY_MS (0 = off) with their plan;
+    # QUERY_DEBUG flags statement shapes repeated N_PLUS_ONE_THRESHOLD+ times in one request
+    app.config["SLOW_QUERY_MS"] = float(env("SLOW_QUERY_MS", 0))
+    app.config["QUERY_DEBUG"] = flag(env("QUERY_DEBUG", "false"))
+    app.config["N_PLUS_ONE_THRESHOLD"] = int(env("N_PLUS_ONE_THRESHOLD", 5))
+    # Compress text responses (gzip, or br when the brotli package is installed) once they
+    # reach COMPRESSION_MIN_SIZE bytes; streamed lists are compressed chunk by chunk
+    app.config["COMPRESSION_ENABLED"] = flag(env("COMPRESSION_ENABLED", "true"))
+    app.config["COMPRESSION_MIN_SIZE"] = int(env("COMPRESSION_MIN_SIZE", 1024))
+    app.config["COMPRESSION_LEVEL"] = int(env("COMPRESSION_LEVEL", 6))
+    # Venue operators authenticate bulk provisioning with this key (unset disables it)
+    app.config["OPERATOR_API_KEY"] = env("OPERATOR_API_KEY", "")
+    app.config["BULK_MAX_ITEMS"] = int(env("BULK_MAX_ITEMS", 10000))
+    # Number of reverse proxies (e.g. Render's router) in front of the app, for client IPs
+    app.config["TRUSTED_PROXY_COUNT"] = int(env("TRUSTED_PROXY_COUNT", 0))
+    # Frontend origins allowed by CORS; without FRONTEND_URL any origin is accepted
+    app.config["FRONTEND_URL"] = env("FRONTEND_URL", "")
+
+    if overrides:
+        app.config.update(overrides)
+        if "SQLALCHEMY_DATABASE_URI" in overrides and "SQLALCHEMY_ENGINE_OPTIONS" not in overrides:
+            app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(app.config["SQLALCHEMY_DATABASE_URI"])
@@ -0,0 +1,51 @@
+"""
+Shared pytest fixtures: every test gets its own app on a scratch SQLite file,
+so tests never touch the development or production database, or each other's rows
+"""
+
+import itertools
+
+import pytest
+
+from app import create_app, db, issue_access_token, Plan, User
+
+
+@pytest.fixture
+def app(tmp_path):
+    """A testing-profile app with every table created in a database file only this test uses"""
+    app = create_app("testing", SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'test.db'}")
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+@pytest.fixture
+def make_user(app):
+    """Factory: add a user (user1, user2, ...) and return (user id, bearer headers)"""
+    numbers = itertools.count(1)
+
+    def make(**fields):
+        number = next(numbers)
+        fields = {"username": f"user{number}", "email": f"user{number}@example.com", "password_hash": "x", **fields}
+        with app.app_context():
+            user = User(**fields)
+            db.session.add(user)
+            db.session.commit()
+            return user.id, {"Authorization": f"Bearer {issue_access_token(user)}"}
+
+    return make
+
+
+@pytest.fixture
+def make_plan(app):
+    """Factory: add a plan and return its id"""
+    def make(name="Test plan", duration_minutes=60, price=10):
+        with app.app_context():
+            plan = Plan(name=name, duration_minutes=duration_minutes, price=price)
+            db.session.add(plan)
+            db.session.commit()
+            return plan.id
+
+    return make
@@ -0,0 +1,105 @@
+"""
+Gunicorn configuration for the WiFi Portal backend.
+
+Gunicorn picks this file up automatically when started from the backend
+directory. Everything can be overridden through environment variables:
+
+    WEB_CONCURRENCY        worker processes (default: 2 x usable CPUs + 1, at most 6)
+    GUNICORN_THREADS       threads per worker; >1 switches to the gthread worker
+    GUNICORN_WORKER_CLASS  sync, gthread or gevent (gevent must be pip-installed);
+                           uvicorn.workers.UvicornWorker to serve asgi:app (see asgi.py)
+    GUNICORN_PRELOAD       import the app once in the master before forking
+    GUNICORN_TIMEOUT       seconds before a silent worker is restarted
+
+Keep DB_POOL_SIZE + DB_MAX_OVERFLOW at or above the threads (or gevent
+connections) per worker, and the total across workers below the database's
+connection limit. That is where the default cap comes from: each worker may
+hold up to 5 + 10 = 15 connections with the default pool settings, and 6 x 15
+stays under PostgreSQL's default max_connections of 100 with room for
+migrations and the CLI. Usable CPUs are the ones this process may run on
+(its affinity mask, further limited by a cgroup CPU quota), not the host's
+count, which inside a container can be far higher. Set WEB_CONCURRENCY to
+go past the cap, e.g. (max_connections - headroom) // (pool + overflow).
+
+The /subscriptions/<user_id>/events streams stay open for minutes at a time:
+under sync workers each one occupies a whole worker until `timeout` kills it,
+and under gthread a whole thread. They are off unless SSE_ENABLED is set;
+only set it together with GUNICORN_WORKER_CLASS=gevent (keeping
+SSE_MAX_STREAMS at or below GUNICORN_WORKER_CONNECTIONS). The frontend polls
+unless it is built with VITE_LIVE_UPDATES=true.
+"""
+
+import math
+import multiprocessing
+import os
+import tempfile
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+MAX_DEFAULT_WORKERS = 6
+
+
+def usable_cpus():
+    """CPUs available to this process, honouring container cpusets and CPU quotas"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        # Not available on macOS
+        cpus = multiprocessing.cpu_count()
+    try:
+        # cgroup v2: "<quota> <period>" in microseconds, or "max <period>" when unlimited
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+workers = int(os.environ.get("WEB_CONCURRENCY", min(usable_cpus() * 2 + 1, MAX_DEFAULT_WORKERS)))
+threads = int(os.environ.get("GUNICORN_THREADS", 1))
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread" if threads > 1 else "sync")
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", 1000))
+
+preload_app = os.environ.get("GUNICORN_PRELOAD", "true").lower() in ("1", "true", "yes")
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+
+# Recycle workers now and then so slow leaks can't build up
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 2000))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 200))
+
+accesslog = "-"
+errorlog = "-"
+
+# Workers publish metrics snapshots here so /metrics can sum them; a fresh
+# directory per master start keeps counters from a previous deploy out
+if not os.environ.get("METRICS_DIR"):
+    os.environ["METRICS_DIR"] = tempfile.mkdtemp(prefix="wifi-portal-metrics-")
+
+
+def post_fork(server, worker):
+    # With preload_app the master may have opened database connections while
+    # importing the app; sockets must never be shared across processes.
+    from app import app, db
+
+    with app.app_context():
+        db.engine.dispose(close=False)
+    app.extensions["rate_limiter"].reset()
+
+
+def when_ready(server):
+    # Runs in the master before any worker is forked: with preload_app, build the
+    # lazily-defined schemas here once instead of in every worker's first request
+    if preload_app:
+        from app import schema_classes
+
+        schema_classes()
+
+
+def worker_exit(server, worker):
+    # Save the final counts of a recycled worker before its process goes away
+    from app import metrics
+
+    metrics.export()
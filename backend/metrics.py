@@ -0,0 +1,259 @@
+"""
+Counters, gauges and histograms rendered in the Prometheus text exposition format.
+
+Recording a sample is a dict update under a per-metric lock, so it is cheap
+enough to do several times per request. Each process keeps its own values.
+
+Several gunicorn workers share numbers through a directory: every process
+periodically writes a JSON snapshot of its values to <dir>/<pid>.json, and
+a scrape sums the snapshots of all processes. Files left by workers that
+have exited are folded into archived.json so their counts are not lost, and
+the directory never grows past one file per live worker. Gauges are not
+summed: a scrape reports the highest value any live process holds, and an
+exited worker's gauges are dropped rather than archived.
+"""
+
+import bisect
+import fcntl
+import glob
+import json
+import os
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ARCHIVE = "archived.json"
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dump(self):
+        with self._lock:
+            return [[list(labels), value] for labels, value in self._values.items()]
+
+
+class Gauge(Counter):
+    """A value that goes up and down; the last `set` wins"""
+    type = "gauge"
+
+    def set(self, value, labels=()):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(Counter):
+    """Per label set: a count per bucket (non-cumulative), then the sum and total count"""
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, labels=()):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [0] * (len(self.buckets) + 3)
+            state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def dump(self):
+        with self._lock:
+            return [[list(labels), list(state)] for labels, state in self._values.items()]
+
+
+def merge(into, snapshot, gauges=frozenset()):
+    """Add one process's snapshot into an accumulated snapshot; metrics named in `gauges` keep the maximum"""
+    for name, samples in snapshot.items():
+        target = into.setdefault(name, {})
+        for labels, value in samples:
+            key = tuple(labels)
+            if name in gauges:
+                target[key] = max(target.get(key, value), value)
+            elif isinstance(value, list):
+                current = target.get(key)
+                target[key] = value[:] if current is None else [a + b for a, b in zip(current, value)]
+            else:
+                target[key] = target.get(key, 0) + value
+    return into
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(names, values, extra=()):
+    pairs = [f'{name}="{escape(value)}"' for name, value in (*zip(names, values), *extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Registry:
+    def __init__(self, directory=None, flush_interval=5.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._metrics = {}
+        self._flusher = None
+        self._flusher_pid = None
+        self._lock = threading.Lock()
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def _register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def snapshot(self):
+        return {name: metric.dump() for name, metric in self._metrics.items()}
+
+    def _gauges(self):
+        return frozenset(name for name, metric in self._metrics.items() if metric.type == "gauge")
+
+    def _archivable(self, snapshot):
+        """A dead process's snapshot without its gauges, which described a process that is gone"""
+        gauges = self._gauges()
+        return {name: samples for name, samples in snapshot.items() if name not in gauges}
+
+    # Sharing between worker processes
+
+    def _path(self, pid):
+        return os.path.join(self.directory, f"{pid}.json")
+
+    def _locked(self):
+        handle = open(os.path.join(self.directory, ".lock"), "a")
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        return handle
+
+    def export(self):
+        """Write this process's values to the shared directory (no-op without one)"""
+        if not self.directory:
+            return
+        path = self._path(os.getpid())
+        temporary = f"{path}.tmp"
+        with open(temporary, "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(temporary, path)
+
+    def _archive_dead(self):
+        """Fold snapshots of exited processes into the archive; caller holds the lock"""
+        archive_path = os.path.join(self.directory, ARCHIVE)
+        archived = None
+        for path in glob.glob(os.path.join(self.directory, "*.json")):
+            name = os.path.basename(path)
+            if name == ARCHIVE:
+                continue
+            pid = int(name.split(".")[0])
+            try:
+                os.kill(pid, 0)
+                continue
+            except ProcessLookupError:
+                pass
+            except PermissionError:
+                continue
+            if archived is None:
+                archived = self._read(archive_path)
+            merge(archived, self._archivable(self._read_raw(path)))
+            os.unlink(path)
+        if archived is not None:
+            self._write(archive_path, archived)
+
+    def _read_raw(self, path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _read(self, path):
+        return merge({}, self._read_raw(path))
+
+    def _write(self, path, merged):
+        temporary = f"{path}.tmp"
+        with open(temporary, "w") as f:
+            json.dump({name: [[list(k), v] for k, v in samples.items()] for name, samples in merged.items()}, f)
+        os.replace(temporary, path)
+
+    def collect(self):
+        """Values summed across every process that shares the directory"""
+        if not self.directory:
+            return merge({}, self.snapshot())
+        self.export()
+        with self._locked():
+            self._archive_dead()
+            merged = {}
+            for path in glob.glob(os.path.join(self.directory, "*.json")):
+                merge(merged, self._read_raw(path), self._gauges())
+        return merged
+
+    def start(self, directory, flush_interval=5.0):
+        """Begin exporting to `directory` every `flush_interval` seconds; safe to call on every request.
+
+        Values belong to the process, so the first app to start the registry
+        in a process picks the directory; later calls leave it alone.
+        """
+        if not directory or self._flusher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self.directory = directory
+            self.flush_interval = flush_interval
+            os.makedirs(self.directory, exist_ok=True)
+            # A reused pid means the file's previous owner is gone; keep its counts
+            if os.path.exists(self._path(os.getpid())):
+                with self._locked():
+                    archive_path = os.path.join(self.directory, ARCHIVE)
+                    previous = self._archivable(self._read_raw(self._path(os.getpid())))
+                    self._write(archive_path, merge(self._read(archive_path), previous))
+                    os.unlink(self._path(os.getpid()))
+            self._flusher_pid = os.getpid()
+            self._flusher = threading.Thread(target=self._flush_forever, name="metrics-flush", daemon=True)
+            self._flusher.start()
+
+    def _flush_forever(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.export()
+            except OSError:
+                pass
+
+    def render(self):
+        """The Prometheus text exposition of every registered metric"""
+        merged = self.collect()
+        lines = []
+        for name, metric in self._metrics.items():
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.type}")
+            for labels, value in sorted(merged.get(name, {}).items()):
+                if metric.type in ("counter", "gauge"):
+                    lines.append(f"{name}{format_labels(metric.labelnames, labels)} {value}")
+                    continue
+                cumulative = 0
+                for bound, count in zip((*metric.buckets, "+Inf"), value):
+                    cumulative += count
+                    le = format_labels(metric.labelnames, labels, [("le", bound)])
+                    lines.append(f"{name}_bucket{le} {cumulative}")
+                lines.append(f"{name}_sum{format_labels(metric.labelnames, labels)} {value[-2]}")
+                lines.append(f"{name}_count{format_labels(metric.labelnames, labels)} {value[-1]}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,80 @@
+"""Create missing core tables and add subscription/history hot-path indexes
+
+Revision ID: 5b7e2c41a9d3
+Revises: 0922c6ddc238
+Create Date: 2026-10-18 09:12:40.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b7e2c41a9d3'
+down_revision = '0922c6ddc238'
+branch_labels = None
+depends_on = None
+
+
+ACTIVE_ONLY = "status = 'active'"
+
+
+def create_missing_tables():
+    # The initial migration only created user_plan_history; older databases got
+    # the remaining tables from `flask init-db`, fresh ones need them here.
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if 'user' not in existing:
+        op.create_table('user',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('username', sa.String(length=80), nullable=False),
+        sa.Column('email', sa.String(length=120), nullable=False),
+        sa.Column('password_hash', sa.String(length=200), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('email'),
+        sa.UniqueConstraint('username')
+        )
+    if 'plan' not in existing:
+        op.create_table('plan',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('duration_minutes', sa.Integer(), nullable=False),
+        sa.Column('price', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+        )
+    if 'subscription' not in existing:
+        op.create_table('subscription',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('plan_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(length=50), nullable=True),
+        sa.Column('timestamp', sa.DateTime(), nullable=True),
+        sa.Column('ends_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['plan_id'], ['plan.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+
+
+def upgrade():
+    create_missing_tables()
+
+    # Build indexes without blocking writes on large PostgreSQL tables. Databases
+    # created by `flask init-db` may already have them from the model definitions.
+    concurrently = op.get_bind().dialect.name == 'postgresql'
+    with op.get_context().autocommit_block():
+        op.create_index('ix_subscription_user_status_ends', 'subscription',
+                        ['user_id', 'status', 'ends_at'], unique=False,
+                        postgresql_concurrently=concurrently, if_not_exists=True)
+        op.create_index('ix_subscription_active_ends', 'subscription', ['ends_at'], unique=False,
+                        postgresql_where=sa.text(ACTIVE_ONLY), sqlite_where=sa.text(ACTIVE_ONLY),
+                        postgresql_concurrently=concurrently, if_not_exists=True)
+        op.create_index('ix_user_plan_history_user_purchase', 'user_plan_history',
+                        ['user_id', 'purchase_date'], unique=False,
+                        postgresql_concurrently=concurrently, if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_user_plan_history_user_purchase', table_name='user_plan_history')
+    op.drop_index('ix_subscription_active_ends', table_name='subscription')
+    op.drop_index('ix_subscription_user_status_ends', table_name='subscription')
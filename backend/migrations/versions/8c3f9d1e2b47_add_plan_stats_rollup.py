@@ -0,0 +1,61 @@
+"""Add plan_stats rollup of per-plan purchases, revenue and ratings
+
+Revision ID: 8c3f9d1e2b47
+Revises: 5b7e2c41a9d3
+Create Date: 2026-10-18 11:02:17.553108
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c3f9d1e2b47'
+down_revision = '5b7e2c41a9d3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('plan_stats',
+    sa.Column('plan_id', sa.Integer(), nullable=False),
+    sa.Column('purchase_count', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.BigInteger(), nullable=False),
+    sa.Column('rating_count', sa.Integer(), nullable=False),
+    sa.Column('rating_sum', sa.Integer(), nullable=False),
+    sa.Column('review_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['plan_id'], ['plan.id'], ),
+    sa.PrimaryKeyConstraint('plan_id')
+    )
+
+    # Backfill purchases from subscriptions and ratings from history (purchases
+    # write a history row too, so reviews must not count as sales); afterwards
+    # the app keeps it up to date
+    op.execute("""
+        INSERT INTO plan_stats (plan_id, purchase_count, revenue, rating_count, rating_sum, review_count)
+        SELECT p.id,
+               COALESCE(s.purchase_count, 0),
+               COALESCE(s.purchase_count, 0) * p.price,
+               COALESCE(h.rating_count, 0),
+               COALESCE(h.rating_sum, 0),
+               COALESCE(h.review_count, 0)
+        FROM plan p
+        LEFT JOIN (
+            SELECT plan_id, COUNT(*) AS purchase_count
+            FROM subscription
+            GROUP BY plan_id
+        ) s ON s.plan_id = p.id
+        LEFT JOIN (
+            SELECT plan_id,
+                   COUNT(rating) AS rating_count,
+                   COALESCE(SUM(rating), 0) AS rating_sum,
+                   COUNT(CASE WHEN review != '' THEN 1 END) AS review_count
+            FROM user_plan_history
+            GROUP BY plan_id
+        ) h ON h.plan_id = p.id
+        WHERE s.plan_id IS NOT NULL OR h.plan_id IS NOT NULL
+    """)
+
+
+def downgrade():
+    op.drop_table('plan_stats')
@@ -0,0 +1,53 @@
+"""Add subscription and purchase history archive tables, partitioned by month on PostgreSQL
+
+Revision ID: d41a7c2e9f60
+Revises: 8c3f9d1e2b47
+Create Date: 2026-10-18 15:40:09.271845
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd41a7c2e9f60'
+down_revision = '8c3f9d1e2b47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Monthly partitions are created by `flask archive` as it moves rows in
+    op.create_table('subscription_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('plan_id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=50), nullable=True),
+    sa.Column('timestamp', sa.DateTime(), nullable=True),
+    sa.Column('ends_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id', 'ends_at'),
+    postgresql_partition_by='RANGE (ends_at)'
+    )
+    op.create_index('ix_subscription_archive_user_ends', 'subscription_archive',
+                    ['user_id', 'ends_at'], unique=False)
+
+    op.create_table('user_plan_history_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('plan_id', sa.Integer(), nullable=False),
+    sa.Column('purchase_date', sa.DateTime(), nullable=False),
+    sa.Column('rating', sa.Integer(), nullable=True),
+    sa.Column('review', sa.Text(), nullable=True),
+    sa.PrimaryKeyConstraint('id', 'purchase_date'),
+    postgresql_partition_by='RANGE (purchase_date)'
+    )
+    op.create_index('ix_user_plan_history_archive_user_purchase', 'user_plan_history_archive',
+                    ['user_id', 'purchase_date'], unique=False)
+
+
+def downgrade():
+    # Dropping a partitioned table drops its partitions with it
+    op.drop_index('ix_user_plan_history_archive_user_purchase', table_name='user_plan_history_archive')
+    op.drop_table('user_plan_history_archive')
+    op.drop_index('ix_subscription_archive_user_ends', table_name='subscription_archive')
+    op.drop_table('subscription_archive')
@@ -0,0 +1,82 @@
+"""
+In-process publish/subscribe for pushing events to open streaming responses.
+
+A Broker maps channel keys (e.g. a user id) to the listeners currently
+attached to them. Publishing is O(listeners on that channel) and never
+blocks: each listener owns a bounded queue, and a listener that falls too
+far behind is marked `overflowed` instead of slowing the publisher down, so
+its stream can resync from the database.
+
+Only the standard library's threading primitives are used, which gevent's
+monkey-patching turns cooperative, so a listener waiting for events costs a
+greenlet rather than an OS thread under the gevent worker.
+"""
+
+import queue
+import threading
+
+
+class Listener:
+    def __init__(self, broker, channel, maxsize):
+        self.broker = broker
+        self.channel = channel
+        self.overflowed = False
+        self._queue = queue.Queue(maxsize)
+
+    def put(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout=None):
+        """Next event, or None if nothing arrived within `timeout` seconds"""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Broker:
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self._channels = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel):
+        listener = Listener(self, channel, self.queue_size)
+        with self._lock:
+            self._channels.setdefault(channel, set()).add(listener)
+        return listener
+
+    def unsubscribe(self, listener):
+        with self._lock:
+            listeners = self._channels.get(listener.channel)
+            if listeners is not None:
+                listeners.discard(listener)
+                if not listeners:
+                    del self._channels[listener.channel]
+
+    def has_listeners(self, channel):
+        return channel in self._channels
+
+    def publish(self, channel, event):
+        """Hand `event` to every listener on `channel`; returns how many received it"""
+        with self._lock:
+            listeners = list(self._channels.get(channel, ()))
+        for listener in listeners:
+            listener.put(event)
+        return len(listeners)
+
+    def listener_count(self):
+        with self._lock:
+            return sum(len(listeners) for listeners in self._channels.values())
@@ -0,0 +1,84 @@
+"""
+Development helpers for spotting slow and repetitive SQL.
+
+- statement_shape(): a statement with literals and IN-lists collapsed, so
+  "WHERE id = 1" and "WHERE id = 2" count as the same shape
+- explain(): the database's plan for a statement, run on the raw DBAPI
+  connection so it never re-enters SQLAlchemy's execute events
+- n_plus_one_suspects(): shapes repeated at least `threshold` times
+- query_budget() / max_queries(): fail a block or test that runs more
+  statements than it declares
+"""
+
+import re
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+
+from sqlalchemy import event
+
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_NUMBERS = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r"\bIN\s*\((?:\s*(?:\?|%s|%\(\w+\)s|:\w+|__\[POSTCOMPILE_\w+\])\s*,?)+\)", re.IGNORECASE)
+_SPACE = re.compile(r"\s+")
+
+
+def statement_shape(statement):
+    shape = _STRINGS.sub("?", statement)
+    shape = _NUMBERS.sub("?", shape)
+    shape = _IN_LISTS.sub("IN (...)", shape)
+    return _SPACE.sub(" ", shape).strip()
+
+
+def explain(conn, statement, parameters):
+    """Best-effort query plan as text; returns None for statements that can't be explained"""
+    if not statement.lstrip().upper().startswith(("SELECT", "WITH")):
+        return None
+    prefix = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN "
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        return "\n".join(str(row[-1]) for row in cursor.fetchall())
+    except Exception as e:
+        return f"(EXPLAIN failed: {e})"
+    finally:
+        cursor.close()
+
+
+def n_plus_one_suspects(shapes, threshold):
+    """(shape, count) pairs for statement shapes run at least `threshold` times"""
+    return [(shape, count) for shape, count in Counter(shapes).most_common() if count >= threshold]
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def query_budget(engine, limit):
+    """Raise QueryBudgetExceeded if the block runs more than `limit` statements on `engine`"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    if len(statements) > limit:
+        listing = "\n".join(f"  {statement_shape(statement)}" for statement in statements)
+        raise QueryBudgetExceeded(f"{len(statements)} queries run, budget is {limit}:\n{listing}")
+
+
+def max_queries(limit, engine):
+    """Test decorator form of query_budget; `engine` may be a callable returning the engine"""
+    def decorator(test):
+        @wraps(test)
+        def wrapper(*args, **kwargs):
+            with query_budget(engine() if callable(engine) else engine, limit):
+                return test(*args, **kwargs)
+        return wrapper
+    return decorator
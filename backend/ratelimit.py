@@ -0,0 +1,178 @@
+"""
+Token-bucket rate limiting for the WiFi Portal API.
+
+Each key (e.g. "login:ip:1.2.3.4") owns a bucket holding up to `capacity`
+tokens that refills at `rate` tokens per second; a request spends one token.
+State per key is just (tokens, updated_at), so every check is O(1).
+
+Stores:
+- MemoryStore: per-process, LRU-bounded to `max_keys` buckets
+- SQLiteStore: a local SQLite file shared by every gunicorn worker on the host
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+class Limit:
+    """A parsed limit such as "10/minute": burst `capacity`, refill `rate` per second"""
+
+    def __init__(self, capacity, period_seconds):
+        self.capacity = float(capacity)
+        self.rate = capacity / period_seconds
+
+    @classmethod
+    def parse(cls, value):
+        """Parse "N/period" (period: second, minute, hour, day); empty disables the limit"""
+        if not value:
+            return None
+        count, _, period = value.partition("/")
+        period = period.strip().lower().rstrip("s")
+        if period not in PERIODS:
+            raise ValueError(f"Unknown rate limit period in {value!r}")
+        return cls(int(count), PERIODS[period])
+
+
+def spend(tokens, updated, limit, now):
+    """Refill a bucket up to `now` and try to take one token.
+
+    Returns (tokens_left, retry_after); retry_after is 0 when the request is allowed.
+    """
+    if tokens is None:
+        tokens = limit.capacity
+    else:
+        tokens = min(limit.capacity, tokens + (now - updated) * limit.rate)
+
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / limit.rate
+
+
+class MemoryStore:
+    """Buckets in a dict, evicting the least recently used key past `max_keys`"""
+
+    def __init__(self, max_keys=100_000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key, limit, now):
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (None, now))
+            tokens, retry_after = spend(tokens, updated, limit, now)
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return retry_after
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class SQLiteStore:
+    """Buckets in a local SQLite file so several worker processes share counters.
+
+    Buckets idle long enough to have refilled are indistinguishable from new
+    ones, so they are pruned periodically to keep the file bounded.
+
+    Connections are opened lazily, per thread and per process: a connection
+    inherited across fork() (gunicorn's preload_app) must never be used, nor
+    closed, since closing it can checkpoint the WAL under the parent's feet.
+    """
+
+    PRUNE_EVERY = 1000
+
+    def __init__(self, path, max_idle=86400):
+        self.path = path
+        self.max_idle = max_idle
+        self._local = threading.local()
+        self._inherited = []
+        self._hits = 0
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limit_bucket "
+                "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            if conn is not None:
+                self._inherited.append(conn)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def reset(self):
+        """Set aside connections opened so far, e.g. the parent's after a fork; the next hit reconnects"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            self._inherited.append(conn)
+        self._local = threading.local()
+
+    def hit(self, key, limit, now):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM rate_limit_bucket WHERE key = ?", (key,)).fetchone()
+            tokens, updated = row if row else (None, now)
+            tokens, retry_after = spend(tokens, updated, limit, now)
+            conn.execute(
+                "INSERT INTO rate_limit_bucket (key, tokens, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                (key, tokens, now),
+            )
+            self._hits += 1
+            if self._hits % self.PRUNE_EVERY == 0:
+                conn.execute("DELETE FROM rate_limit_bucket WHERE updated < ?", (now - self.max_idle,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return retry_after
+
+    def clear(self):
+        self._connect().execute("DELETE FROM rate_limit_bucket")
+
+
+def make_store(url, max_keys=100_000):
+    """Build a store from RATE_LIMIT_STORAGE: "memory" or "sqlite:///path/to/file.db" """
+    if not url or url == "memory":
+        return MemoryStore(max_keys)
+    if url.startswith("sqlite:///"):
+        return SQLiteStore(url[len("sqlite:///"):])
+    raise ValueError(f"Unsupported rate limit storage {url!r}")
+
+
+class RateLimiter:
+    """Checks request keys against per-endpoint limits"""
+
+    def __init__(self, store, limits):
+        self.store = store
+        self.limits = {name: Limit.parse(value) for name, value in limits.items()}
+
+    def hit(self, name, key):
+        """Spend a token for `key` under limit `name`; returns seconds to wait, or 0 if allowed"""
+        limit = self.limits.get(name)
+        if limit is None:
+            return 0.0
+        # Wall-clock time so buckets mean the same thing in every worker process
+        return self.store.hit(f"{name}:{key}", limit, time.time())
+
+    def reset(self):
+        """Drop store connections inherited from a parent process"""
+        reset = getattr(self.store, "reset", None)
+        if reset is not None:
+            reset()
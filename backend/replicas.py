@@ -0,0 +1,102 @@
+"""
+Read/write routing between the primary database and a read replica.
+
+- RoutingSession: a Flask-SQLAlchemy session that sends statements to the
+  app's replica engine while `session.info["read_replica"]` is set. Its
+  first write (a flush, or an INSERT/UPDATE/DELETE) pins it back to the
+  primary for the rest of its life, so a request always reads its own writes.
+- ReplicaMonitor: measures replication lag now and then and reports
+  whether the replica is close enough to the primary to serve reads.
+- wrote_recently(): whether an X-Last-Write value a client echoed back is
+  still inside the lag window, meaning its read must go to the primary.
+
+Locally, point DATABASE_REPLICA_URL at a second SQLite file (an absolute
+sqlite://// path, refreshed by copying the primary) or a second
+PostgreSQL database.
+"""
+
+import logging
+import threading
+import time
+
+from flask import current_app
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, text
+from sqlalchemy.sql.dml import UpdateBase
+
+REPLICA = "replica"
+
+logger = logging.getLogger(__name__)
+
+# Zero when the standby has replayed everything it received, so an idle primary
+# doesn't look like lag; NULL (not a standby) also counts as zero
+POSTGRES_LAG = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() "
+    "THEN 0 ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+def init_replica(app):
+    """Create the app's replica engine from REPLICA_DATABASE_URI (nothing when it is empty)"""
+    uri = app.config["REPLICA_DATABASE_URI"]
+    app.extensions[REPLICA] = create_engine(uri, **app.config["REPLICA_ENGINE_OPTIONS"]) if uri else None
+
+
+def replica_engine():
+    return current_app.extensions.get(REPLICA)
+
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self.info.get("read_replica"):
+            if self._flushing or isinstance(clause, UpdateBase):
+                self.info["read_replica"] = False
+            else:
+                engine = replica_engine()
+                if engine is not None:
+                    return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def replication_lag(engine):
+    """Seconds the replica is behind its primary; SQLite copies have no way to tell, so 0"""
+    if engine.dialect.name != "postgresql":
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        return 0.0
+    with engine.connect() as conn:
+        return float(conn.execute(POSTGRES_LAG).scalar() or 0)
+
+
+class ReplicaMonitor:
+    """Caches whether the replica is within `max_lag` seconds, rechecking every `check_interval`"""
+
+    def __init__(self, max_lag=5.0, check_interval=5.0):
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.lag = None
+        self.checked_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def healthy(self, engine):
+        now = time.monotonic()
+        if now - self.checked_at >= self.check_interval and self._lock.acquire(blocking=False):
+            # One thread measures; the others keep using the last answer meanwhile
+            try:
+                self.lag = replication_lag(engine)
+            except Exception as e:
+                logger.warning("Replica unavailable, reading from the primary: %s", e)
+                self.lag = None
+            finally:
+                self.checked_at = now
+                self._lock.release()
+        return self.lag is not None and self.lag <= self.max_lag
+
+
+def wrote_recently(last_write, window, now=None):
+    """True when an X-Last-Write timestamp (Unix seconds) is less than `window` seconds old"""
+    try:
+        last_write = float(last_write)
+    except (TypeError, ValueError):
+        return False
+    return (now if now is not None else time.time()) - last_write < window
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the gateway access-check endpoints
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app import db, Subscription
+
+OPERATOR_KEY = "test-operator-key"
+OPERATOR_HEADERS = {"X-Operator-Key": OPERATOR_KEY}
+
+
+@pytest.fixture(autouse=True)
+def operator_key(app):
+    app.config["OPERATOR_API_KEY"] = OPERATOR_KEY
+
+
+def test_purchase_and_cancel_update_access_immediately(app, make_user, make_plan):
+    user_id, user_headers = make_user()
+    plan_id = make_plan(duration_minutes=90)
+
+    client = app.test_client()
+    assert client.get(f"/access/{user_id}", headers=OPERATOR_HEADERS).get_json()["allowed"] is False
+
+    sub_id = client.post("/subscriptions", json={"plan_id": plan_id}, headers=user_headers).get_json()["id"]
+    decision = client.get(f"/access/{user_id}", headers=OPERATOR_HEADERS).get_json()
+    assert decision["allowed"] is True
+    assert decision["subscription_id"] == sub_id
+    assert 85 * 60 < decision["seconds_remaining"] <= 90 * 60
+
+    client.delete(f"/subscriptions/{sub_id}", headers=user_headers)
+    assert client.get(f"/access/{user_id}", headers=OPERATOR_HEADERS).get_json()["allowed"] is False
+
+
+def test_batch_check_after_reload_and_exact_expiry(app, make_user, make_plan):
+    online_id, _ = make_user()
+    offline_id, _ = make_user()
+    plan_id = make_plan()
+    index = app.extensions["access_index"]
+    with app.app_context():
+        db.session.add(Subscription(user_id=online_id, plan_id=plan_id, status="active",
+                                    ends_at=datetime.now(timezone.utc) + timedelta(minutes=5)))
+        db.session.commit()
+        index.reload()
+
+    response = app.test_client().post("/access/check", json={"user_ids": [online_id, offline_id]},
+                                      headers=OPERATOR_HEADERS)
+    results = response.get_json()["results"]
+    assert [result["allowed"] for result in results] == [True, False]
+
+    # Access ends at ends_at even before the next reload
+    index.grant(offline_id, 0, datetime.now(timezone.utc) - timedelta(seconds=1))
+    assert index.check([offline_id])[0]["allowed"] is False
+
+
+def test_access_check_requires_operator_key(app):
+    assert app.test_client().get("/access/1").status_code == 403
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__]))
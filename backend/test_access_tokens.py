@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Test script to verify signed access tokens on the subscription endpoints
+"""
+
+import pytest
+
+from app import hash_password
+
+PASSWORD = "Secret1!"
+
+
+@pytest.fixture
+def account(app, make_user):
+    """A user with a real password, logged in through /login: (user id, bearer headers)"""
+    user_id, _ = make_user(email="owner@example.com", password_hash=hash_password(PASSWORD, 4))
+    data = app.test_client().post("/login", json={"email": "owner@example.com", "password": PASSWORD}).get_json()
+    return user_id, {"Authorization": f"Bearer {data['access_token']}"}
+
+
+def test_login_issues_token_that_unlocks_own_subscriptions(app, account):
+    client = app.test_client()
+    user_id, headers = account
+
+    assert client.get(f"/subscriptions/{user_id}", headers=headers).status_code == 200
+    assert client.get(f"/subscriptions/{user_id}").status_code == 401
+
+
+def test_token_cannot_read_or_buy_for_someone_else(app, account, make_user, make_plan):
+    client = app.test_client()
+    _, headers = account
+    other_id, _ = make_user()
+    plan_id = make_plan()
+
+    assert client.get(f"/subscriptions/{other_id}", headers=headers).status_code == 403
+    response = client.post("/subscriptions", json={"user_id": other_id, "plan_id": plan_id}, headers=headers)
+    assert response.status_code == 403
+
+
+def test_account_changes_need_own_token(app, account, make_user):
+    client = app.test_client()
+    user_id, headers = account
+    other_id, _ = make_user()
+
+    assert client.patch(f"/users/{user_id}", json={"username": "taken_over"}).status_code == 401
+    assert client.delete(f"/users/{user_id}").status_code == 401
+    assert client.patch(f"/users/{other_id}", json={"username": "taken_over"}, headers=headers).status_code == 403
+    assert client.delete(f"/users/{other_id}", headers=headers).status_code == 403
+
+    renamed = client.patch(f"/users/{user_id}", json={"username": "renamed"}, headers=headers)
+    assert renamed.status_code == 200 and renamed.get_json()["username"] == "renamed"
+    assert client.delete(f"/users/{user_id}", headers=headers).status_code == 200
+
+
+def test_reviews_are_recorded_for_the_token_holder(app, account, make_user, make_plan):
+    client = app.test_client()
+    user_id, headers = account
+    other_id, _ = make_user()
+    plan_id = make_plan()
+
+    assert client.post("/user-plan-history", json={"plan_id": plan_id, "rating": 5}).status_code == 401
+    response = client.post("/user-plan-history", json={"user_id": other_id, "plan_id": plan_id}, headers=headers)
+    assert response.status_code == 403
+    response = client.post("/user-plan-history", json={"plan_id": plan_id, "rating": 5}, headers=headers)
+    assert response.status_code == 201 and response.get_json()["user_id"] == user_id
+
+
+def test_history_is_only_readable_by_its_owner(app, account, make_user):
+    client = app.test_client()
+    user_id, headers = account
+    other_id, _ = make_user()
+
+    assert client.get(f"/user-plan-history/{user_id}", headers=headers).status_code == 200
+    for path in ("", "?stream=true", "?include_archived=true"):
+        assert client.get(f"/user-plan-history/{user_id}{path}").status_code == 401
+        assert client.get(f"/user-plan-history/{other_id}{path}", headers=headers).status_code == 403
+
+
+def test_tampered_token_rejected(app, account):
+    user_id, headers = account
+    tampered = {"Authorization": headers["Authorization"][:-2] + "xx"}
+
+    response = app.test_client().get(f"/subscriptions/{user_id}", headers=tampered)
+    assert response.status_code == 401
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__]))
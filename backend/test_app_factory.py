@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the create_app() factory, config profiles and lazy imports
+"""
+
+import subprocess
+import sys
+
+import pytest
+
+from app import create_app
+
+
+def test_profiles_change_defaults_and_overrides_win(app):
+    testing = create_app("testing", OPERATOR_API_KEY="factory-key")
+    assert testing.config["TESTING"] is True
+    assert testing.config["EXPIRY_SWEEP_INTERVAL"] == 0
+    assert testing.config["OPERATOR_API_KEY"] == "factory-key"
+    assert testing.test_client().get("/").status_code == 200
+
+    # Each app gets its own services; building one leaves the others alone
+    assert testing.extensions["password_hasher"].pool_size == 0
+    assert testing.extensions["password_hasher"] is not app.extensions["password_hasher"]
+    assert app.extensions["password_hasher"].rounds == app.config["BCRYPT_LOG_ROUNDS"]
+    assert testing.extensions["access_index"] is not app.extensions["access_index"]
+
+    # The testing profile never points at the dev or production database
+    assert testing.config["SQLALCHEMY_DATABASE_URI"] == "sqlite://"
+    assert app.config["SQLALCHEMY_DATABASE_URI"].endswith("/test.db")
+
+    with pytest.raises(ValueError, match="staging"):
+        create_app("staging")
+
+
+def test_import_skips_migrations_and_marshmallow():
+    probe = "import sys, app; print(sorted(m for m in ('flask_migrate', 'flask_marshmallow') if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__]))
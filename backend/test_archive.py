@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Test script to verify `flask archive` moves cold rows and readers only see them on request
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app import (
+    db, PlanStats, Subscription, SubscriptionArchive, UserPlanHistory, UserPlanHistoryArchive,
+    archive_cold_rows, rebuild_plan_stats,
+)
+from archival import add_months, month_start, months
+
+
+def seed(user_id, plan_id):
+    """An old and a recent purchase, plus an old subscription the sweeper hasn't expired"""
+    now = datetime.now(timezone.utc)
+    old = now - timedelta(days=400)
+    subs = {
+        "old": Subscription(user_id=user_id, plan_id=plan_id, status="expired", timestamp=old, ends_at=old),
+        "stale_active": Subscription(user_id=user_id, plan_id=plan_id, status="active", timestamp=old, ends_at=old),
+        "recent": Subscription(user_id=user_id, plan_id=plan_id, status="active", ends_at=now + timedelta(hours=1)),
+    }
+    history = {
+        "old": UserPlanHistory(user_id=user_id, plan_id=plan_id, purchase_date=old, rating=3, review="Old"),
+        "recent": UserPlanHistory(user_id=user_id, plan_id=plan_id, purchase_date=now),
+    }
+    db.session.add_all([*subs.values(), *history.values()])
+    db.session.commit()
+    return {name: sub.id for name, sub in subs.items()}, {name: row.id for name, row in history.items()}
+
+
+def test_month_helpers():
+    assert add_months(datetime(2026, 1, 1), -1) == datetime(2025, 12, 1)
+    assert add_months(datetime(2026, 11, 1), 3) == datetime(2027, 2, 1)
+    assert month_start(datetime(2026, 5, 17, 8, 30)) == datetime(2026, 5, 1)
+    assert list(months(datetime(2025, 11, 20), datetime(2026, 2, 3))) == [
+        datetime(2025, 11, 1), datetime(2025, 12, 1), datetime(2026, 1, 1),
+    ]
+
+
+def test_archive_moves_cold_rows_in_batches(app, make_user, make_plan):
+    user_id, headers = make_user()
+    plan_id = make_plan(price=7)
+    with app.app_context():
+        sub_ids, history_ids = seed(user_id, plan_id)
+        cutoff = add_months(month_start(datetime.now(timezone.utc)), -3)
+        moved = archive_cold_rows(cutoff, batch_size=1)
+        assert moved == {"subscription": 1, "user_plan_history": 1}
+
+        # Ended subscriptions leave the hot table; active ones stay however old
+        assert db.session.get(Subscription, sub_ids["old"]) is None
+        assert db.session.get(Subscription, sub_ids["stale_active"]) is not None
+        assert db.session.execute(db.select(SubscriptionArchive.status).filter_by(id=sub_ids["old"])).scalar() == "expired"
+        assert db.session.get(UserPlanHistory, history_ids["old"]) is None
+        archived = db.session.execute(db.select(UserPlanHistoryArchive).filter_by(id=history_ids["old"])).scalar_one()
+        assert (archived.rating, archived.review) == (3, "Old")
+
+        # Lifetime stats still count archived purchases
+        rebuild_plan_stats()
+        assert db.session.get(PlanStats, plan_id).purchase_count == 3
+
+        # Running again finds nothing more to move
+        assert archive_cold_rows(cutoff) == {"subscription": 0, "user_plan_history": 0}
+        assert db.session.get(UserPlanHistory, history_ids["recent"]) is not None
+
+    client = app.test_client()
+    hot = client.get(f"/user-plan-history/{user_id}", headers=headers).get_json()["items"]
+    assert [item["id"] for item in hot] == [history_ids["recent"]]
+    everything = client.get(f"/user-plan-history/{user_id}?include_archived=true&limit=1", headers=headers).get_json()
+    assert [item["id"] for item in everything["items"]] == [history_ids["old"]]
+    rest = client.get(f"/user-plan-history/{user_id}?include_archived=true&after={everything['next_cursor']}",
+                      headers=headers)
+    assert [item["id"] for item in rest.get_json()["items"]] == [history_ids["recent"]]
+
+    subs = client.get(f"/subscriptions/{user_id}", headers=headers).get_json()
+    assert sub_ids["old"] not in {sub["id"] for sub in subs}
+    subs = client.get(f"/subscriptions/{user_id}?include_archived=true", headers=headers).get_json()
+    assert {sub["id"] for sub in subs} == set(sub_ids.values())
+    assert all(sub["plan"]["id"] == plan_id for sub in subs)
+
+
+def test_archive_command(app):
+    result = app.test_cli_runner().invoke(args=["archive", "--months", "3", "--batch-size", "50"])
+    assert result.exit_code == 0, result.output
+    assert "subscription rows" in result.output
+    assert "user_plan_history rows" in result.output
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__]))
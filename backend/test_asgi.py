@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the async ASGI deployment answers like the Flask app on the same database
+"""
+
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("starlette")
+pytest.importorskip("aiosqlite")
+pytest.importorskip("httpx")
+
+from starlette.testclient import TestClient
+
+import asgi
+from app import db, PasswordHasher, Subscription, subscription_schema
+
+
+def test_async_database_url():
+    url, connect_args = asgi.async_database_url("sqlite:////tmp/portal.db")
+    assert (url.drivername, url.database, connect_args) == ("sqlite+aiosqlite", "/tmp/portal.db", {})
+
+    url, connect_args = asgi.async_database_url("postgresql://u:p@db.example.com/portal?sslmode=require")
+    assert url.drivername == "postgresql+asyncpg" and "sslmode" not in url.query
+    assert connect_args == {"ssl": "require"}
+
+    with pytest.raises(ValueError):
+        asgi.async_database_url("mysql://u:p@localhost/portal")
+
+
+def test_async_app_matches_the_flask_app(app, make_plan):
+    plan_id, other_plan_id = make_plan(), make_plan(name="Other plan")
+    sync = app.test_client()
+
+    with TestClient(asgi.create_asgi_app(app)) as client:
+        account = {"name": "async", "email": "async@example.com", "password": "Secret1!"}
+        registered = client.post("/register", json=account)
+        assert registered.status_code == 201, registered.text
+        assert client.post("/register", json=account).json() == {"message": "User already exists"}
+        assert client.post("/login", json={"email": account["email"], "password": "wrong"}).status_code == 401
+
+        logged_in = client.post("/login", json={"email": account["email"], "password": "Secret1!"}).json()
+        user_id = logged_in["id"]
+        headers = {"Authorization": f"Bearer {logged_in['access_token']}"}
+        assert client.get(f"/subscriptions/{user_id}").json() == {"message": "Missing access token"}
+        assert client.get(f"/subscriptions/{user_id + 1}", headers=headers).status_code == 403
+
+        # Tokens from either deployment work on the other; purchases serialize across both
+        bought = client.post("/subscriptions", json={"plan_id": plan_id}, headers=headers)
+        assert bought.status_code == 201, bought.text
+        assert sync.post("/subscriptions", json={"plan_id": other_plan_id}, headers=headers).status_code == 409
+        conflict = client.post("/subscriptions", json={"plan_id": other_plan_id}, headers=headers)
+        assert conflict.status_code == 409
+        assert conflict.json()["error"] == "You already have an active subscription"
+        with app.app_context():
+            assert bought.json() == subscription_schema.dump(db.session.get(Subscription, bought.json()["id"]))
+
+        assert client.post("/user-plan-history", json={"plan_id": plan_id, "rating": 5}).status_code == 401
+        reviewed = client.post("/user-plan-history", json={"plan_id": plan_id, "rating": 5}, headers=headers)
+        assert reviewed.status_code == 201 and reviewed.json()["rating"] == 5
+        assert reviewed.json()["user_id"] == user_id
+        for body in ({"plan_id": plan_id, "rating": "5"}, {"user_id": user_id + 1, "plan_id": plan_id}):
+            rejected = client.post("/user-plan-history", json=body, headers=headers)
+            expected = sync.post("/user-plan-history", json=body, headers=headers)
+            assert (rejected.status_code, rejected.json()) == (expected.status_code, expected.get_json()), body
+
+        # Listings are byte-identical to the Flask app's
+        for path in (
+            f"/subscriptions/{user_id}",
+            f"/subscriptions/{user_id}?fields=status,plan.name&active_only=true",
+            f"/user-plan-history/{user_id}?limit=1",
+            f"/user-plan-history/{user_id}?stream=true",
+        ):
+            expected = sync.get(path, headers=headers)
+            actual = client.get(path, headers=headers)
+            assert (actual.status_code, actual.content) == (expected.status_code, expected.data), path
+        assert client.get(f"/user-plan-history/{user_id}?fields=nope", headers=headers).status_code == 400
+        assert client.get(f"/user-plan-history/{user_id}").status_code == 401
+        assert client.get(f"/user-plan-history/{user_id + 1}?stream=true", headers=headers).status_code == 403
+
+        plans = client.get("/plans")
+        expected = sync.get("/plans")
+        assert (plans.content, plans.headers["ETag"]) == (expected.data, expected.headers["ETag"])
+        assert client.get("/plans", headers={"If-None-Match": plans.headers["ETag"]}).status_code == 304
+
+        cancelled = client.delete(f"/subscriptions/{bought.json()['id']}", headers=headers)
+        assert cancelled.json() == {"message": f"Subscription {bought.json()['id']} cancelled"}
+        assert client.delete(f"/subscriptions/{bought.json()['id']}", headers=headers).status_code == 404
+
+
+def test_hashing_does_not_block_the_event_loop():
+    hasher = asgi.AsyncPasswordHasher(PasswordHasher(rounds=12, pool_size=0))
+
+    async def run():
+        ticks = 0
+        task = asyncio.ensure_future(hasher.hash("Secret1!"))
+        while not task.done():
+            await asyncio.sleep(0.01)
+            ticks += 1
+        return ticks, await task
+
+    started = time.perf_counter()
+    ticks, password_hash = asyncio.run(run())
+    # bcrypt at 12 rounds takes a few hundred ms; the loop kept running throughout
+    assert ticks >= 3, (ticks, time.perf_counter() - started)
+    assert password_hash.startswith("$2b$12$")
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__]))
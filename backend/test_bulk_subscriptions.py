@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Test script to verify bulk subscription provisioning for venue operators
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app import db, User, Subscription, UserPlanHistory
+
+OPERATOR_KEY = "test-operator-key"
+
+
+@pytest.fixture
+def provision(app):
+    app.config["OPERATOR_API_KEY"] = OPERATOR_KEY
+
+    def post(items, key=OPERATOR_KEY):
+        return app.test_client().post("/subscriptions/bulk", json={"items": items}, headers={"X-Operator-Key": key})
+
+    return post
+
+
+def test_bulk_requires_operator_key(provision):
+    assert provision([{"user_id": 1, "plan_id": 1}], key="wrong").status_code == 403
+
+
+def test_bulk_reports_each_item(app, provision, make_user, make_plan):
+    """New users are created, busy/duplicate users conflict, unknown ids are invalid"""
+    busy, fresh, twice = (make_user()[0] for _ in range(3))
+    plan_id = make_plan(duration_minutes=120, price=20)
+    with app.app_context():
+        db.session.add(Subscription(user_id=busy, plan_id=plan_id, status="active",
+                                    ends_at=datetime.now(timezone.utc) + timedelta(hours=1)))
+        db.session.commit()
+
+    response = provision([
+        {"user_id": fresh, "plan_id": plan_id},
+        {"user_id": busy, "plan_id": plan_id},
+        {"user_id": twice, "plan_id": plan_id},
+        {"user_id": twice, "plan_id": plan_id},
+        {"user_id": fresh, "plan_id": 10 ** 9},
+        {"user_id": "nope"},
+    ])
+    data = response.get_json()
+    assert response.status_code == 200
+    assert [r["status"] for r in data["results"]] == [
+        "created", "conflict", "created", "conflict", "invalid", "invalid"
+    ]
+    assert data["summary"] == {"created": 2, "conflict": 2, "invalid": 2}
+
+    with app.app_context():
+        assert Subscription.query.filter_by(user_id=fresh).count() == 1
+        assert UserPlanHistory.query.filter_by(user_id=twice).count() == 1
+
+
+def test_bulk_thousands_of_items(app, provision, make_plan):
+    """Every item of a large batch is created; python -m benchmarks.bulk times it"""
+    plan_id = make_plan(duration_minutes=120, price=20)
+    with app.app_context():
+        users = [User(username=f"bulk{i}", email=f"bulk{i}@example.com", password_hash="x") for i in range(2000)]
+        db.session.add_all(users)
+        db.session.commit()
+        user_ids = [user.id for user in users]
+
+    response = provision([{"user_id": user_id, "plan_id": plan_id} for user_id in user_ids])
+
+    assert response.get_json()["summary"] == {"created": len(user_ids), "conflict": 0, "invalid": 0}
+    with app.app_context():
+        assert Subscription.query.filter(Subscription.user_id.in_(user_ids)).count() == len(user_ids)
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__]))
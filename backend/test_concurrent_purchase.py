@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Stress test: parallel purchases for one user produce exactly one subscription
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app import Subscription, UserPlanHistory
+
+PARALLEL_CLICKS = 12
+
+
+def purchase(app, headers, plan_id):
+    return app.test_client().post("/subscriptions", json={"plan_id": plan_id}, headers=headers).status_code
+
+
+def test_parallel_purchases_single_winner(app, make_user, make_plan):
+    """Only one of many simultaneous clicks from the same user succeeds"""
+    user_id, headers = make_user()
+    plan_id = make_plan(price=15)
+
+    with ThreadPoolExecutor(max_workers=PARALLEL_CLICKS) as pool:
+        codes = list(pool.map(lambda _: purchase(app, headers, plan_id), range(PARALLEL_CLICKS)))
+
+    assert codes.count(201) == 1, codes
+    assert codes.count(409) == PARALLEL_CLICKS - 1, codes
+
+    with app.app_context():
+        assert Subscription.query.filter_by(user_id=user_id).count() == 1
+        # Subscription and history are written in the same transaction
+        assert UserPlanHistory.query.filter_by(user_id=user_id).count() == 1
+
+
+def test_parallel_purchases_different_users(app, make_user, make_plan):
+    """Concurrent purchases for different users never block each other out"""
+    users = [make_user() for _ in range(PARALLEL_CLICKS)]
+    plan_id = make_plan(price=15)
+
+    with ThreadPoolExecutor(max_workers=PARALLEL_CLICKS) as pool:
+        codes = list(pool.map(lambda user: purchase(app, user[1], plan_id), users))
+
+    assert codes == [201] * PARALLEL_CLICKS
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__]))
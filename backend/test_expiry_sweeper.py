@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the subscription expiry sweeper
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app import db, metrics, Subscription, ExpirySweeper
+
+
+def recorded(name):
+    """This process's unlabelled value for one metric"""
+    return {tuple(labels): value for labels, value in metrics.snapshot()[name]}.get((), 0)
+
+
+def test_sweeper_expires_only_overdue_rows(app, make_user, make_plan):
+    """Overdue active rows become expired in batches; current ones stay active"""
+    user_id, _ = make_user()
+    plan_id = make_plan(price=15)
+    with app.app_context():
+        now = datetime.now(timezone.utc)
+        overdue = [
+            Subscription(user_id=user_id, plan_id=plan_id, status="active", ends_at=now - timedelta(minutes=i + 1))
+            for i in range(5)
+        ]
+        current = Subscription(user_id=user_id, plan_id=plan_id, status="active", ends_at=now + timedelta(hours=1))
+        db.session.add_all(overdue + [current])
+        db.session.commit()
+        overdue_ids = [sub.id for sub in overdue]
+        current_id = current.id
+
+        sweeper = ExpirySweeper(batch_size=2)
+        expired_before = recorded("subscriptions_expired_total")
+        expired = sweeper.sweep()
+        assert expired == len(overdue_ids)
+        assert sweeper.stats["lag_seconds"] >= 5 * 60
+        assert sweeper.stats["runs"] == 1
+
+        # The run is also recorded in /metrics
+        assert recorded("subscriptions_expired_total") - expired_before == expired
+        assert recorded("expiry_sweep_lag_seconds") == sweeper.stats["lag_seconds"]
+        assert recorded("expiry_sweep_rows_per_second") == sweeper.stats["rows_per_second"] > 0
+
+        statuses = dict(db.session.execute(
+            db.select(Subscription.id, Subscription.status)
+            .where(Subscription.id.in_(overdue_ids + [current_id]))
+        ).all())
+        assert all(statuses[sub_id] == "expired" for sub_id in overdue_ids)
+        assert statuses[current_id] == "active"
+
+        # Nothing left to do on the next pass
+        assert sweeper.sweep() == 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__]))
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the tuple-row JSON path matches the marshmallow output byte for byte
+"""
+
+import itertools
+import json
+
+import pytest
+
+from app import (
+    db, User, UserPlanHistory,
+    user_schema, users_schema, user_plan_history_schema, user_plan_histories_schema,
+)
+
+
+@pytest.fixture
+def make_history(app, make_user, make_plan):
+    """Factory: a user with awkward text plus history rows with and without ratings; returns (user id, headers)"""
+    numbers = itertools.count(1)
+
+    def make():
+        user_id, headers = make_user(username=f'fast "{next(numbers)}" ü', password_hash="x\\y\n")
+        plan_id = make_plan(price=1)
+        with app.app_context():
+            db.session.add_all([
+                UserPlanHistory(user_id=user_id, plan_id=plan_id, rating=5, review="Schnell ✓ </script>\t"),
+                UserPlanHistory(user_id=user_id, plan_id=plan_id),
+            ])
+            db.session.commit()
+        return user_id, headers
+
+    return make
+
+
+def marshmallow_page(schema, rows, limit):
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    page = {"items": schema.dump(rows), "limit": limit, "next_cursor": rows[-1].id if has_more else None}
+    return (json.dumps(page) + "\n").encode()
+
+
+def test_users_page_matches_marshmallow(app, make_history):
+    """A /users page is byte-identical to the schema + Flask-RESTful encoding"""
+    make_history()
+    make_history()
+    with app.app_context():
+        expected = marshmallow_page(users_schema, User.query.order_by(User.id).limit(3).all(), 2)
+
+    response = app.test_client().get("/users?limit=2")
+    assert response.status_code == 200
+    assert response.mimetype == "application/json"
+    assert response.data == expected
+
+
+def test_history_page_and_stream_match_marshmallow(app, make_history):
+    """History pages and streams keep the schema's keys, nulls, escaping and timestamps"""
+    user_id, headers = make_history()
+    with app.app_context():
+        rows = UserPlanHistory.query.filter_by(user_id=user_id).order_by(UserPlanHistory.id).all()
+        expected_page = marshmallow_page(user_plan_histories_schema, rows, 50)
+        expected_stream = ("[" + ",".join(json.dumps(user_plan_history_schema.dump(row)) for row in rows) + "]").encode()
+
+    client = app.test_client()
+    assert client.get(f"/user-plan-history/{user_id}", headers=headers).data == expected_page
+    assert client.get(f"/user-plan-history/{user_id}?stream=true", headers=headers).data == expected_stream
+
+
+def test_users_stream_matches_marshmallow(app, make_history):
+    """?stream=true on /users joins rows exactly as before"""
+    make_history()
+    with app.app_context():
+        expected = ("[" + ",".join(json.dumps(user_schema.dump(user)) for user in User.query.order_by(User.id)) + "]")
+
+    assert app.test_client().get("/users?stream=true").data == expected.encode()
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__]))
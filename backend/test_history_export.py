@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the streaming purchase history export
+"""
+
+import csv
+import gzip
+import io
+import json
+from datetime import datetime
+
+import pytest
+
+from app import db, UserPlanHistory
+
+OPERATOR_KEY = "test-operator-key"
+
+
+@pytest.fixture
+def history(app, make_user, make_plan):
+    """Three purchases of one plan, in January, February and March 2001"""
+    user_id, _ = make_user()
+    plan_id = make_plan(name="Export", price=15)
+    with app.app_context():
+        db.session.add_all([
+            UserPlanHistory(user_id=user_id, plan_id=plan_id, purchase_date=datetime(2001, 1, 15), review="a, \"quoted\" review"),
+            UserPlanHistory(user_id=user_id, plan_id=plan_id, purchase_date=datetime(2001, 2, 15), rating=4),
+            UserPlanHistory(user_id=user_id, plan_id=plan_id, purchase_date=datetime(2001, 3, 15)),
+        ])
+        db.session.commit()
+
+
+@pytest.fixture
+def export(app):
+    app.config["OPERATOR_API_KEY"] = OPERATOR_KEY
+
+    def get(query):
+        return app.test_client().get(f"/exports/history?{query}", headers={"X-Operator-Key": OPERATOR_KEY})
+
+    return get
+
+
+def test_ndjson_export_with_date_range(history, export):
+    response = export("start=2001-02-01&end=2001-03-01")
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert len(records) == 1
+    assert records[0]["plan_name"] == "Export"
+    assert records[0]["rating"] == 4
+    assert records[0]["purchase_date"].startswith("2001-02-15")
+
+
+def test_gzipped_csv_export(history, export):
+    response = export("format=csv&gzip=true&end=2001-12-31")
+    assert response.mimetype == "application/gzip"
+    rows = list(csv.DictReader(io.StringIO(gzip.decompress(response.data).decode("utf-8"))))
+    assert len(rows) == 3
+    assert rows[0]["review"] == 'a, "quoted" review'
+
+
+def test_export_rejects_bad_input(app, export):
+    assert export("format=xml").status_code == 400
+    assert export("start=yesterday").status_code == 400
+    assert app.test_client().get("/exports/history").status_code == 403
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__]))
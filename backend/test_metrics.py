@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Test script to verify request metrics and the Prometheus /metrics endpoint
+"""
+
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+
+import pytest
+
+from app import hash_password
+from metrics import Registry
+
+
+def sample(text, name, **labels):
+    """Value of one exposition line, or 0 when the series is absent"""
+    wanted = ",".join(f'{key}="{value}"' for key, value in labels.items())
+    match = re.search(rf"^{re.escape(name)}\{{{re.escape(wanted)}\}} (\S+)$", text, re.MULTILINE)
+    return float(match.group(1)) if match else 0.0
+
+
+def test_requests_queries_and_bcrypt_are_recorded(app, make_user):
+    make_user(email="metrics@example.com", password_hash=hash_password("Secret1!", 4))
+
+    client = app.test_client()
+    before = client.get("/metrics").get_data(as_text=True)
+    client.get("/users?limit=5")
+    client.post("/login", json={"email": "metrics@example.com", "password": "Secret1!"})
+    response = client.get("/metrics")
+    after = response.get_data(as_text=True)
+
+    assert response.mimetype == "text/plain"
+    assert "# TYPE http_request_duration_seconds histogram" in after
+    route = dict(method="GET", route="/users")
+    assert sample(after, "http_requests_total", **route, status="200") - \
+        sample(before, "http_requests_total", **route, status="200") == 1
+    assert sample(after, "http_request_duration_seconds_count", **route) > 0
+    assert sample(after, "db_queries_total", route="/users") > sample(before, "db_queries_total", route="/users")
+    assert sample(after, "bcrypt_duration_seconds_count", operation="verify") > \
+        sample(before, "bcrypt_duration_seconds_count", operation="verify")
+
+
+def test_snapshots_from_exited_workers_are_summed_and_archived():
+    directory = tempfile.mkdtemp()
+    registry = Registry(directory)
+    hits = registry.counter("hits_total", "Hits", ("route",))
+    hits.inc(("/plans",), 2)
+
+    # A worker that has already exited left its last snapshot behind
+    gone = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"],
+                          capture_output=True, text=True).stdout.strip()
+    with open(os.path.join(directory, f"{gone}.json"), "w") as f:
+        json.dump({"hits_total": [[["/plans"], 3]]}, f)
+
+    assert 'hits_total{route="/plans"} 5' in registry.render()
+    assert not os.path.exists(os.path.join(directory, f"{gone}.json"))
+    assert 'hits_total{route="/plans"} 5' in registry.render()
+
+
+def test_gauges_report_the_highest_live_value():
+    directory = tempfile.mkdtemp()
+    registry = Registry(directory)
+    lag = registry.gauge("lag_seconds", "Lag")
+    lag.set(4.0)
+    lag.set(2.5)
+
+    # Another live worker (our parent) is further behind; a dead one's value is stale
+    gone = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"],
+                          capture_output=True, text=True).stdout.strip()
+    for pid, value in ((os.getppid(), 7.5), (gone, 60.0)):
+        with open(os.path.join(directory, f"{pid}.json"), "w") as f:
+            json.dump({"lag_seconds": [[[], value]]}, f)
+
+    rendered = registry.render()
+    assert "# TYPE lag_seconds gauge" in rendered
+    assert "\nlag_seconds 7.5\n" in rendered
+    os.unlink(os.path.join(directory, f"{os.getppid()}.json"))
+    assert "\nlag_seconds 2.5\n" in registry.render()
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__]))
@@ -15,14 +15,25 @@ def test_subscription_overlap():
     base_url = "http://localhost:5000"
     
     # Test user credentials
-    user_id = 1
+    print("0. Logging in as test user...")
+    try:
+        response = requests.post(f"{base_url}/login", json={
+            'email': 'user1@gmail.com',
+            'password': 'User1!'
+        })
+        login = response.json()
+        user_id = login['id']
+        headers = {'Authorization': f"Bearer {login['access_token']}"}
+        print(f"✅ Logged in as user {user_id}")
+    except Exception as e:
+        print(f"❌ Error logging in: {e}")
+        return
     
     print("1. Testing first subscription creation...")
     try:
         response = requests.post(f"{base_url}/subscriptions", json={
-            'user_id': user_id,
             'plan_id': 1  # 1 Hour plan
-        })
+        }, headers=headers)
         
         if response.status_code == 201:
             print("✅ First subscription created successfully")
@@ -39,9 +50,8 @@ def test_subscription_overlap():
     print("\n2. Testing overlap prevention...")
     try:
         response = requests.post(f"{base_url}/subscriptions", json={
-            'user_id': user_id,
             'plan_id': 2  # 3 Hours plan
-        })
+        }, headers=headers)
         
         if response.status_code == 409:
             data = response.json()
@@ -61,7 +71,7 @@ def test_subscription_overlap():
     
     print("\n3. Checking user's current subscriptions...")
     try:
-        response = requests.get(f"{base_url}/subscriptions/{user_id}")
+        response = requests.get(f"{base_url}/subscriptions/{user_id}", headers=headers)
         
         if response.status_code == 200:
             subscriptions = response.json()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Test script to verify keyset pagination on /users and /user-plan-history
+"""
+
+import pytest
+
+from app import db, UserPlanHistory
+
+
+def test_users_keyset_pagination(app, make_user):
+    """Walking /users page by page returns every row exactly once"""
+    user_ids = [make_user()[0] for _ in range(5)]
+
+    client = app.test_client()
+    seen = []
+    cursor = 0
+    while True:
+        data = client.get(f"/users?limit=2&after={cursor}").get_json()
+        assert len(data["items"]) <= 2
+        seen.extend(item["id"] for item in data["items"])
+        cursor = data["next_cursor"]
+        if cursor is None:
+            break
+
+    assert seen == user_ids
+
+
+def test_users_stream_matches_pages(app, make_user):
+    """?stream=true returns the same rows as a plain JSON array"""
+    user_ids = [make_user()[0] for _ in range(3)]
+
+    response = app.test_client().get("/users?stream=true")
+    assert response.status_code == 200
+    users = response.get_json()
+    assert isinstance(users, list)
+    assert [user["id"] for user in users] == user_ids
+
+
+def test_history_pagination_for_one_user(app, make_user, make_plan):
+    """History pages only contain the requested user's rows"""
+    user_id, headers = make_user()
+    other_id, _ = make_user()
+    plan_id = make_plan(price=1)
+    with app.app_context():
+        db.session.add_all([UserPlanHistory(user_id=user_id, plan_id=plan_id) for _ in range(3)])
+        db.session.add(UserPlanHistory(user_id=other_id, plan_id=plan_id))
+        db.session.commit()
+
+    client = app.test_client()
+    first = client.get(f"/user-plan-history/{user_id}?limit=2", headers=headers).get_json()
+    assert len(first["items"]) == 2
+    assert first["next_cursor"] is not None
+
+    second = client.get(f"/user-plan-history/{user_id}?limit=2&after={first['next_cursor']}",
+                        headers=headers).get_json()
+    assert len(second["items"]) == 1
+    assert second["next_cursor"] is None
+    assert all(item["user_id"] == user_id for item in first["items"] + second["items"])
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__]))
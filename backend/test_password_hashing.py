@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Test script to verify pooled bcrypt hashing and rehash-on-login
+"""
+
+import pytest
+
+from app import bcrypt, User, hash_password
+
+
+def test_pool_hashes_are_flask_bcrypt_compatible(app):
+    """Hashes from the pool verify with Flask-Bcrypt and vice versa"""
+    hasher = app.extensions["password_hasher"]
+    with app.app_context():
+        pooled = hasher.hash("Secret1!")
+        assert bcrypt.check_password_hash(pooled, "Secret1!")
+
+        legacy = bcrypt.generate_password_hash("Secret1!", 4).decode("utf-8")
+        assert hasher.verify(legacy, "Secret1!")
+        assert not hasher.verify(legacy, "wrong")
+
+
+def test_login_rehashes_old_work_factor(app, make_user):
+    """Logging in upgrades a hash whose cost differs from BCRYPT_LOG_ROUNDS"""
+    email = "rehash@example.com"
+    make_user(email=email, password_hash=hash_password("Secret1!", 4))
+    hasher = app.extensions["password_hasher"]
+    hasher.rounds = 5
+
+    client = app.test_client()
+    assert client.post("/login", json={"email": email, "password": "wrong"}).status_code == 401
+    assert client.post("/login", json={"email": email, "password": "Secret1!"}).status_code == 200
+
+    with app.app_context():
+        stored = User.query.filter_by(email=email).one().password_hash
+        assert stored.split("$")[2] == "05"
+        assert hasher.verify(stored, "Secret1!")
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__]))
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the cached /plans catalog and its ETag handling
+"""
+
+import pytest
+
+from app import db, Plan
+
+
+def test_plans_etag_round_trip(app):
+    """A matching If-None-Match gets a bodyless 304"""
+    client = app.test_client()
+    first = client.get("/plans")
+    assert first.status_code == 200
+    assert first.headers["ETag"]
+    assert "max-age" in first.headers["Cache-Control"]
+
+    second = client.get("/plans", headers={"If-None-Match": first.headers["ETag"]})
+    assert second.status_code == 304
+    assert second.data == b""
+
+
+def test_plan_write_invalidates_cache(app):
+    """Committing a Plan change publishes a new catalog and ETag"""
+    client = app.test_client()
+    before = client.get("/plans")
+
+    name = "Cache test"
+    with app.app_context():
+        db.session.add(Plan(name=name, duration_minutes=30, price=5))
+        db.session.commit()
+
+    after = client.get("/plans", headers={"If-None-Match": before.headers["ETag"]})
+    assert after.status_code == 200
+    assert after.headers["ETag"] != before.headers["ETag"]
+    assert [plan["name"] for plan in after.get_json()] == [name]
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__]))
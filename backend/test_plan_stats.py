@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the incrementally maintained plan_stats rollup
+"""
+
+import pytest
+
+from app import db, PlanStats, plan_stats_summary, rebuild_plan_stats
+
+
+def test_writes_update_stats_incrementally(app, make_user, make_plan):
+    _, headers = make_user()
+    _, other_headers = make_user()
+    plan_id = make_plan(price=40)
+
+    client = app.test_client()
+    assert client.post("/subscriptions", json={"plan_id": plan_id}, headers=headers).status_code == 201
+    # A cancelled purchase takes its sale back out
+    cancelled = client.post("/subscriptions", json={"plan_id": plan_id}, headers=other_headers).get_json()["id"]
+    assert client.delete(f"/subscriptions/{cancelled}", headers=other_headers).status_code == 200
+    # Reviews count towards ratings only, never towards purchases or revenue
+    for rating, review in [(5, "Fast"), (2, None)]:
+        response = client.post("/user-plan-history", json={
+            "plan_id": plan_id, "rating": rating, "review": review
+        }, headers=headers)
+        assert response.status_code == 201
+    # Ratings that are not a whole number from 1 to 5 are rejected before anything is written
+    for rating in ["5", 4.5, True, 0, 6]:
+        response = client.post("/user-plan-history", json={"plan_id": plan_id, "rating": rating}, headers=headers)
+        assert response.status_code == 400, rating
+        assert response.get_json() == {"error": "rating must be a whole number from 1 to 5"}
+
+    with app.app_context():
+        summary = plan_stats_summary(db.session.get(PlanStats, plan_id))
+        assert summary == {
+            "purchase_count": 1, "revenue": 40, "review_count": 1, "rating_count": 2, "average_rating": 3.5
+        }
+
+        # A full recompute agrees with the incremental totals
+        rebuild_plan_stats()
+        assert plan_stats_summary(db.session.get(PlanStats, plan_id)) == summary
+
+    listed = {plan["id"]: plan for plan in client.get("/plans").get_json()}
+    assert listed[plan_id]["stats"] == summary
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__]))
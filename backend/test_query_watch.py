@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the slow-query log, N+1 detection and query budgets
+"""
+
+import logging
+
+import pytest
+from flask import Response
+
+from app import db, User, start_request_metrics, record_request_metrics
+from querywatch import QueryBudgetExceeded, query_budget, statement_shape
+
+
+class Captured(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def test_statement_shape_ignores_literals_and_in_lists():
+    assert statement_shape("SELECT * FROM t WHERE id = 1") == statement_shape("SELECT * FROM t  WHERE id = 22")
+    assert statement_shape("SELECT * FROM t WHERE id IN (?, ?, ?)") == "SELECT * FROM t WHERE id IN (...)"
+    assert statement_shape("SELECT * FROM t WHERE name = 'a'") == "SELECT * FROM t WHERE name = ?"
+
+
+def test_repeated_lookups_flagged_as_n_plus_one(app, make_user):
+    user_ids = [make_user()[0] for _ in range(6)]
+    captured = Captured()
+    app.logger.addHandler(captured)
+    app.config["QUERY_DEBUG"] = True
+    try:
+        with app.test_request_context("/users"):
+            start_request_metrics()
+            for user_id in user_ids:
+                db.session.get(User, user_id)
+            response = record_request_metrics(Response())
+    finally:
+        app.logger.removeHandler(captured)
+
+    assert response.headers["X-N-Plus-One"] == "1"
+    assert int(response.headers["X-Query-Count"]) >= 6
+    assert any("Possible N+1" in message for message in captured.messages)
+
+
+def test_slow_queries_logged_with_plan(app):
+    captured = Captured()
+    app.logger.addHandler(captured)
+    app.config["SLOW_QUERY_MS"] = 0.000001
+    try:
+        with app.app_context():
+            db.session.execute(db.select(User).where(User.email == "nobody@example.com")).all()
+    finally:
+        app.logger.removeHandler(captured)
+
+    slow = [message for message in captured.messages if message.startswith("Slow query")]
+    assert slow and "FROM user" in slow[0]
+    # SQLite's plan names the index used for the email lookup
+    assert "SEARCH" in slow[0] or "SCAN" in slow[0]
+
+
+def test_query_budget_fails_when_exceeded(app, make_user):
+    user_id, headers = make_user()
+    client = app.test_client()
+    with app.app_context():
+        engine = db.engine
+
+    with query_budget(engine, 1):
+        client.get(f"/subscriptions/{user_id}", headers=headers)
+
+    try:
+        with query_budget(engine, 1):
+            client.get(f"/subscriptions/{user_id}", headers=headers)
+            client.get(f"/subscriptions/{user_id}", headers=headers)
+    except QueryBudgetExceeded as e:
+        assert "budget is 1" in str(e)
+    else:
+        raise AssertionError("query budget was not enforced")
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__]))
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Test script to verify token-bucket rate limiting on /login and /register
+"""
+
+import os
+import tempfile
+
+import pytest
+
+from ratelimit import Limit, MemoryStore, SQLiteStore
+
+
+def test_bucket_refills_over_time():
+    """A bucket allows `capacity` hits, then refills at `rate` per second"""
+    store = MemoryStore()
+    limit = Limit(3, 60)
+    assert [store.hit("k", limit, 100.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert store.hit("k", limit, 100.0) > 0
+    # One token comes back after 20 seconds
+    assert store.hit("k", limit, 120.0) == 0.0
+
+
+def test_memory_store_evicts_least_recently_used():
+    store = MemoryStore(max_keys=2)
+    limit = Limit(1, 60)
+    store.hit("a", limit, 0.0)
+    store.hit("b", limit, 0.0)
+    store.hit("c", limit, 0.0)
+    # "a" was evicted, so it starts again with a full bucket
+    assert store.hit("a", limit, 0.0) == 0.0
+    assert len(store._buckets) == 2
+
+
+def test_sqlite_store_shared_between_instances():
+    """Two stores on the same file (e.g. two workers) share counters"""
+    path = os.path.join(tempfile.mkdtemp(), "ratelimit.db")
+    first, second = SQLiteStore(path), SQLiteStore(path)
+    limit = Limit(2, 60)
+    assert first.hit("k", limit, 0.0) == 0.0
+    assert second.hit("k", limit, 0.0) == 0.0
+    assert first.hit("k", limit, 0.0) > 0
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork()")
+def test_sqlite_store_reconnects_in_forked_child(tmp_path):
+    """A worker forked from a preloaded master opens its own connection and still shares counters"""
+    store = SQLiteStore(str(tmp_path / "ratelimit.db"))
+    limit = Limit(2, 60)
+    assert store.hit("k", limit, 0.0) == 0.0
+    inherited = store._connect()
+
+    read_end, write_end = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            fresh = store._connect() is not inherited
+            limited = store.hit("k", limit, 0.0) == 0.0 and store.hit("k", limit, 0.0) > 0
+            os.write(write_end, b"ok" if fresh and limited else b"reused")
+        finally:
+            os._exit(0)
+    os.close(write_end)
+    os.waitpid(pid, 0)
+    assert os.read(read_end, 16) == b"ok"
+    os.close(read_end)
+    assert store._connect() is inherited
+    assert store.hit("k", limit, 0.0) > 0
+
+
+def test_login_returns_429_before_checking_credentials(app):
+    email = "limit@example.com"
+    client = app.test_client()
+    app.extensions["rate_limiter"].limits["login_email"] = Limit(2, 60)
+
+    codes = [client.post("/login", json={"email": email, "password": "x"}).status_code for _ in range(3)]
+    limited = client.post("/login", json={"email": email, "password": "x"})
+
+    assert codes[:2] == [401, 401]
+    assert codes[2] == 429
+    assert limited.status_code == 429
+    assert int(limited.headers["Retry-After"]) > 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__]))
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Test script to verify GET requests read from the replica and writes stick to the primary
+"""
+
+import sqlite3
+
+import pytest
+
+from app import create_app, db, issue_access_token, Plan, User
+from replicas import replica_engine
+
+
+def copy_database(source, target):
+    """Stand-in for replication: make the replica an exact copy of the primary"""
+    with sqlite3.connect(source) as src, sqlite3.connect(target) as dst:
+        src.backup(dst)
+
+
+@pytest.fixture
+def replica_app(tmp_path):
+    """Factory: an app with a primary and an up-to-date replica, both seeded with one user and one plan"""
+    def make(replica_url=None, **overrides):
+        primary = tmp_path / "primary.db"
+        replica = tmp_path / "replica.db"
+        routed = create_app(
+            "testing",
+            SQLALCHEMY_DATABASE_URI=f"sqlite:///{primary}",
+            REPLICA_DATABASE_URI=replica_url or f"sqlite:///{replica}",
+            RATE_LIMIT_ENABLED=False,
+            REPLICA_LAG_CHECK_INTERVAL=0,
+            **overrides,
+        )
+        with routed.app_context():
+            db.create_all()
+            db.session.add(User(username="seeded", email="seeded@example.com", password_hash="x"))
+            db.session.add(Plan(name="Seeded", duration_minutes=60, price=5))
+            db.session.commit()
+        copy_database(primary, replica)
+        return routed
+
+    return make
+
+
+def catch_up(routed):
+    copy_database(routed.config["SQLALCHEMY_DATABASE_URI"][len("sqlite:///"):],
+                  routed.config["REPLICA_DATABASE_URI"][len("sqlite:///"):])
+
+
+def register(client):
+    response = client.post("/register", json={
+        "name": "replica", "email": "replica@example.com", "password": "Secret1!",
+    })
+    assert response.status_code == 201, response.get_json()
+    return response, "replica"
+
+
+def usernames(response):
+    return {item["username"] for item in response.get_json()["items"]}
+
+
+def test_reads_go_to_replica_until_the_client_wrote(replica_app):
+    routed = replica_app()
+    client = routed.test_client()
+
+    written, username = register(client)
+    last_write = written.headers["X-Last-Write"]
+
+    # The replica hasn't caught up: plain reads miss the new user...
+    assert username not in usernames(client.get("/users"))
+    # ...but the writer, echoing X-Last-Write, reads from the primary
+    assert username in usernames(client.get("/users", headers={"X-Last-Write": last_write}))
+    # Outside the lag window the echo no longer pins reads to the primary
+    assert username not in usernames(client.get("/users", headers={"X-Last-Write": "1000"}))
+    assert "X-Last-Write" not in client.get("/users").headers
+
+
+def test_a_write_pins_the_rest_of_the_request_to_the_primary(replica_app):
+    routed = replica_app()
+    with routed.test_request_context("/users"):
+        routed.preprocess_request()
+        assert db.session.info["read_replica"] is True
+        assert db.session.get_bind() is replica_engine()
+
+        db.session.add(User(username="pinned", email="pinned@example.com", password_hash="x"))
+        db.session.flush()
+        assert db.session.info["read_replica"] is False
+        assert db.session.execute(db.select(User.id).filter_by(username="pinned")).first() is not None
+        db.session.rollback()
+
+
+def test_own_subscriptions_are_read_from_the_primary(replica_app):
+    """A purchase shows up straight away even when the client doesn't echo X-Last-Write"""
+    routed = replica_app()
+    client = routed.test_client()
+    with routed.app_context():
+        user = db.session.execute(db.select(User)).scalar_one()
+        headers = {"Authorization": f"Bearer {issue_access_token(user)}"}
+        user_id = user.id
+
+    sub_id = client.post("/subscriptions", json={"plan_id": 1}, headers=headers).get_json()["id"]
+    assert [sub["id"] for sub in client.get(f"/subscriptions/{user_id}", headers=headers).get_json()] == [sub_id]
+
+
+def test_unreachable_replica_falls_back_to_primary(replica_app):
+    routed = replica_app(replica_url="sqlite:////nonexistent/dir/replica.db")
+    client = routed.test_client()
+    _, username = register(client)
+    assert username in usernames(client.get("/users"))
+
+
+def test_access_checks_plans_and_exports_pick_the_right_database(replica_app):
+    routed = replica_app(ACCESS_INDEX_REFRESH=0, OPERATOR_API_KEY="operator")
+    client = routed.test_client()
+    operator = {"X-Operator-Key": "operator"}
+    with routed.app_context():
+        user = db.session.execute(db.select(User)).scalar_one()
+        headers = {"Authorization": f"Bearer {issue_access_token(user)}"}
+
+    sub_id = client.post("/subscriptions", json={"plan_id": 1}, headers=headers).get_json()["id"]
+    # Exports are report reads: they come from the replica, which hasn't seen the purchase yet
+    assert client.get("/exports/history", headers=operator).data == b""
+
+    catch_up(routed)
+    assert client.get("/exports/history", headers=operator).data.count(b"\n") == 1
+
+    # The replica still has the subscription; the gateway must not grant it again after a cancel
+    client.delete(f"/subscriptions/{sub_id}", headers=headers)
+    assert client.get(f"/access/{user.id}", headers=operator).get_json()["allowed"] is False
+
+    # A plan written here is in the next catalog, not the replica's older one
+    with routed.app_context():
+        db.session.add(Plan(name="Fresh", duration_minutes=30, price=3))
+        db.session.commit()
+    assert "Fresh" in {plan["name"] for plan in client.get("/plans").get_json()}
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__]))
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Test script to verify negotiated response compression and ?fields= sparse fieldsets
+"""
+
+import gzip
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from flask import Response
+
+from app import db, Subscription, UserPlanHistory, compress_response
+from compression import compress_stream, negotiate
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+from querywatch import query_budget
+
+
+@pytest.fixture
+def seeded(app, make_user, make_plan):
+    """A user with five long reviews and an active subscription: (user id, bearer headers)"""
+    user_id, headers = make_user()
+    plan_id = make_plan(name="Size test", price=5)
+    with app.app_context():
+        db.session.add_all(
+            [UserPlanHistory(user_id=user_id, plan_id=plan_id, rating=4, review="Long review " * 50) for _ in range(5)]
+            + [Subscription(user_id=user_id, plan_id=plan_id, status="active",
+                            ends_at=datetime.now(timezone.utc) + timedelta(hours=1))]
+        )
+        db.session.commit()
+    return user_id, headers
+
+
+def test_negotiate():
+    """q-values pick the encoding; q=0 and unknown codings are refused"""
+    assert negotiate("gzip, deflate") == "gzip"
+    assert negotiate("gzip;q=0") is None
+    assert negotiate("deflate") is None
+    assert negotiate("*") is not None
+    assert negotiate("") is None
+
+
+def test_large_responses_are_gzipped(app, seeded):
+    """Bodies over the threshold are gzipped when asked and identical once decoded"""
+    user_id, headers = seeded
+
+    client = app.test_client()
+    plain = client.get(f"/user-plan-history/{user_id}", headers=headers)
+    encoded = client.get(f"/user-plan-history/{user_id}", headers={**headers, "Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in plain.headers
+    assert encoded.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in encoded.headers["Vary"]
+    assert len(encoded.data) < len(plain.data)
+    assert gzip.decompress(encoded.data) == plain.data
+
+    streamed = client.get(f"/user-plan-history/{user_id}?stream=true", headers={**headers, "Accept-Encoding": "gzip"})
+    assert streamed.headers["Content-Encoding"] == "gzip"
+    assert len(json.loads(gzip.decompress(streamed.data))) == 5
+
+
+@pytest.mark.skipif(brotli is None, reason="brotli is not installed")
+def test_streamed_responses_round_trip_through_brotli(app, seeded):
+    """Every chunk reaches the client as it is produced, and the whole decodes to the original"""
+    chunks = [json.dumps({"row": i, "review": "Long review " * 50}).encode() for i in range(20)]
+    # Brotli only hands back output from process() once several MB are buffered
+    chunks.insert(10, os.urandom(4_000_000).hex().encode())
+    pieces = list(compress_stream(iter(chunks), "br"))
+    assert all(pieces[:len(chunks)])
+    assert brotli.decompress(b"".join(pieces)) == b"".join(chunks)
+
+    user_id, headers = seeded
+    client = app.test_client()
+    streamed = client.get(f"/user-plan-history/{user_id}?stream=true", headers={**headers, "Accept-Encoding": "br"})
+    assert streamed.headers["Content-Encoding"] == "br"
+    assert brotli.decompress(streamed.data) == client.get(f"/user-plan-history/{user_id}?stream=true",
+                                                          headers=headers).data
+
+
+def test_small_and_event_stream_responses_are_left_alone(app):
+    """Tiny bodies skip compression and SSE is never buffered in a compressor"""
+    with app.test_request_context(headers={"Accept-Encoding": "gzip"}):
+        small = compress_response(Response('{"ok": true}', mimetype="application/json"))
+        assert "Content-Encoding" not in small.headers
+
+        events = compress_response(Response(iter(["data: x\n\n"] * 1000), mimetype="text/event-stream"))
+        assert "Content-Encoding" not in events.headers
+
+
+def test_plans_etag_survives_compression(app):
+    """A compressed /plans carries a weak ETag that still yields 304s"""
+    client = app.test_client()
+    first = client.get("/plans", headers={"Accept-Encoding": "gzip"})
+    etag = first.headers["ETag"]
+    if first.headers.get("Content-Encoding"):
+        assert etag.startswith("W/")
+    again = client.get("/plans", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert again.status_code == 304
+
+
+def test_sparse_fieldsets(app, seeded):
+    """?fields= narrows the JSON and the SQL column list; unknown names are a 400"""
+    user_id, headers = seeded
+    with app.app_context():
+        engine = db.engine
+
+    client = app.test_client()
+    with query_budget(engine, 10) as statements:
+        page = client.get(f"/user-plan-history/{user_id}?fields=rating", headers=headers).get_json()
+    assert all(set(item) == {"id", "rating"} for item in page["items"])
+    assert not any("review" in statement for statement in statements)
+
+    users = client.get("/users?fields=username&limit=2").get_json()
+    assert all(set(item) == {"id", "username"} for item in users["items"])
+
+    with query_budget(engine, 10) as statements:
+        subs = client.get(f"/subscriptions/{user_id}?fields=status,plan.name", headers=headers).get_json()
+    assert subs == [{"id": subs[0]["id"], "status": "active", "plan": {"name": "Size test"}}]
+    assert not any("duration_minutes" in statement for statement in statements)
+
+    bare = client.get(f"/subscriptions/{user_id}?fields=ends_at", headers=headers).get_json()
+    assert set(bare[0]) == {"id", "ends_at"}
+
+    assert client.get("/users?fields=password").status_code == 400
+    assert client.get(f"/subscriptions/{user_id}?fields=plan.cost", headers=headers).status_code == 400
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__]))
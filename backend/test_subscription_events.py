@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the Server-Sent Events feed of a user's subscriptions
+"""
+
+import json
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app import db, Subscription
+
+
+@pytest.fixture(autouse=True)
+def sse_enabled(app):
+    app.config["SSE_ENABLED"] = True
+
+
+def read_events(chunks, count):
+    """Parse the next `count` named events off a streaming response body"""
+    events, buffer = [], ""
+    while len(events) < count:
+        chunk = next(chunks)
+        buffer += chunk.decode() if isinstance(chunk, bytes) else chunk
+        while "\n\n" in buffer:
+            frame, buffer = buffer.split("\n\n", 1)
+            fields = dict(line.split(": ", 1) for line in frame.splitlines() if not line.startswith(":"))
+            if "event" in fields:
+                events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_stream_pushes_purchase_and_cancellation(app, make_user, make_plan):
+    user_id, headers = make_user()
+    plan_id = make_plan(duration_minutes=30, price=5)
+    client = app.test_client()
+
+    issued = client.post(f"/subscriptions/{user_id}/events/token", headers=headers)
+    assert issued.status_code == 201
+    stream_token = issued.get_json()["stream_token"]
+    stream = client.get(f"/subscriptions/{user_id}/events?stream_token={stream_token}", buffered=False)
+    assert stream.status_code == 200
+    assert stream.mimetype == "text/event-stream"
+    chunks = iter(stream.response)
+    assert read_events(chunks, 1) == [("snapshot", [])]
+
+    sub_id = client.post("/subscriptions", json={"plan_id": plan_id}, headers=headers).get_json()["id"]
+    ((kind, sub),) = read_events(chunks, 1)
+    assert kind == "created" and sub["id"] == sub_id and sub["plan"]["id"] == plan_id
+
+    client.delete(f"/subscriptions/{sub_id}", headers=headers)
+    assert read_events(chunks, 1) == [("cancelled", {"type": "cancelled", "subscription_id": sub_id})]
+
+    stream.close()
+    assert not app.extensions["subscription_events"].has_listeners(user_id)
+
+
+def test_stream_announces_expiry(app, make_user, make_plan):
+    user_id, headers = make_user()
+    plan_id = make_plan(duration_minutes=30, price=5)
+    with app.app_context():
+        db.session.add(Subscription(user_id=user_id, plan_id=plan_id, status="active",
+                                    ends_at=datetime.now(timezone.utc) + timedelta(seconds=0.5)))
+        db.session.commit()
+
+    stream = app.test_client().get(f"/subscriptions/{user_id}/events", headers=headers, buffered=False)
+    chunks = iter(stream.response)
+
+    (kind, snapshot), (expired_kind, expired) = read_events(chunks, 2)
+    stream.close()
+    assert kind == "snapshot" and len(snapshot) == 1
+    assert expired_kind == "expired" and expired["subscription_id"] == snapshot[0]["id"]
+
+
+def test_stream_requires_own_token(app, make_user):
+    user_id, headers = make_user()
+    other_id, other_headers = make_user()
+    token = headers["Authorization"].removeprefix("Bearer ")
+    other_token = other_headers["Authorization"].removeprefix("Bearer ")
+    client = app.test_client()
+
+    assert client.get(f"/subscriptions/{user_id}/events").status_code == 401
+    # Access tokens are never taken from the query string, where access logs would keep them
+    assert client.get(f"/subscriptions/{user_id}/events?access_token={token}").status_code == 401
+    other_stream = client.post(f"/subscriptions/{other_id}/events/token",
+                               headers={"Authorization": f"Bearer {other_token}"}).get_json()["stream_token"]
+    assert client.get(f"/subscriptions/{user_id}/events?stream_token={other_stream}").status_code == 403
+    assert client.post(f"/subscriptions/{user_id}/events/token",
+                       headers={"Authorization": f"Bearer {other_token}"}).status_code == 403
+    # A stream token can't stand in for the access token anywhere else
+    assert client.get(f"/subscriptions/{other_id}", headers={"Authorization": f"Bearer {other_stream}"}).status_code == 401
+
+
+def test_stream_tokens_expire_quickly(app, make_user):
+    user_id, headers = make_user()
+    client = app.test_client()
+    stream_token = client.post(f"/subscriptions/{user_id}/events/token", headers=headers).get_json()["stream_token"]
+    app.config["SSE_TOKEN_TTL"] = 0
+    time.sleep(1.1)
+    expired = client.get(f"/subscriptions/{user_id}/events?stream_token={stream_token}")
+    assert expired.status_code == 401
+
+
+def test_streams_are_off_unless_enabled(app, make_user):
+    user_id, headers = make_user()
+    app.config["SSE_ENABLED"] = False
+    client = app.test_client()
+    assert client.post(f"/subscriptions/{user_id}/events/token", headers=headers).status_code == 404
+    assert client.get(f"/subscriptions/{user_id}/events", headers=headers).status_code == 404
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__]))
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Test script to verify GET /subscriptions/<user_id> runs a single query
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app import db, Subscription
+from querywatch import query_budget
+
+
+@pytest.fixture
+def subscriber(app, make_user, make_plan):
+    """A user with a current, an overdue and an expired subscription on three plans: (user id, bearer headers)"""
+    user_id, headers = make_user()
+    plan_ids = [make_plan(name=f"Plan {i}") for i in range(3)]
+    now = datetime.now(timezone.utc)
+    with app.app_context():
+        db.session.add_all([
+            Subscription(user_id=user_id, plan_id=plan_ids[0], status="active", ends_at=now + timedelta(hours=1)),
+            Subscription(user_id=user_id, plan_id=plan_ids[1], status="active", ends_at=now - timedelta(hours=1)),
+            Subscription(user_id=user_id, plan_id=plan_ids[2], status="expired", ends_at=now - timedelta(hours=2)),
+        ])
+        db.session.commit()
+    return user_id, headers
+
+
+def test_user_subscriptions_single_query(app, subscriber):
+    """Plans come back with their subscriptions without a query per row"""
+    user_id, headers = subscriber
+    with app.app_context():
+        engine = db.engine
+
+    with query_budget(engine, 1) as statements:
+        response = app.test_client().get(f"/subscriptions/{user_id}", headers=headers)
+
+    subs = response.get_json()
+    assert response.status_code == 200
+    assert len(subs) == 3
+    assert all(sub["plan"]["name"].startswith("Plan") for sub in subs)
+    assert len(statements) == 1
+    # Newest expiry first by default
+    assert subs[0]["ends_at"] > subs[1]["ends_at"] > subs[2]["ends_at"]
+
+
+def test_user_subscriptions_filters(app, subscriber):
+    """status and active_only narrow the result set"""
+    user_id, headers = subscriber
+
+    client = app.test_client()
+    active = client.get(f"/subscriptions/{user_id}?active_only=true", headers=headers).get_json()
+    assert len(active) == 1
+
+    expired = client.get(f"/subscriptions/{user_id}?status=expired", headers=headers).get_json()
+    assert [sub["status"] for sub in expired] == ["expired"]
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__]))
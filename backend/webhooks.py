@@ -0,0 +1,102 @@
+"""
+Batched webhook delivery with retries and exponential backoff.
+
+Events are queued with `send()` and posted by a background thread as
+{"events": [...]} JSON batches. When a secret is configured each request is
+signed with an X-Signature: sha256=<hmac of the body> header so the receiver
+can verify it came from us.
+"""
+
+import hashlib
+import hmac
+import json
+import logging
+import queue
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+
+logger = logging.getLogger(__name__)
+
+
+class WebhookSender:
+    def __init__(self, url, secret="", batch_size=100, batch_window=0.2,
+                 max_retries=5, backoff=0.5, max_backoff=30.0, timeout=5.0):
+        self.url = url
+        self.secret = secret
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.stats = {"delivered": 0, "batches": 0, "retries": 0, "dropped": 0}
+        self._queue = queue.Queue()
+        self._thread = None
+
+    def send(self, event):
+        """Queue one event for delivery"""
+        self._queue.put(event)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="webhook-sender", daemon=True)
+            self._thread.start()
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                self.deliver(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def post(self, events):
+        """POST one batch; returns True on a 2xx response"""
+        body = json.dumps({"events": events}).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        if self.secret:
+            signature = hmac.new(self.secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+            headers["X-Signature"] = f"sha256={signature}"
+        request = urllib.request.Request(self.url, data=body, headers=headers, method="POST")
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return 200 <= response.status < 300
+        except (urllib.error.URLError, OSError) as e:
+            logger.warning("Webhook delivery to %s failed: %s", self.url, e)
+            return False
+
+    def deliver(self, events):
+        """Send a batch, retrying with jittered exponential backoff; drops it after max_retries"""
+        for attempt in range(self.max_retries + 1):
+            if self.post(events):
+                self.stats["delivered"] += len(events)
+                self.stats["batches"] += 1
+                return True
+            if attempt < self.max_retries:
+                self.stats["retries"] += 1
+                delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+                time.sleep(delay * random.uniform(0.5, 1.0))
+
+        self.stats["dropped"] += len(events)
+        logger.error("Dropping %d webhook events after %d attempts", len(events), self.max_retries + 1)
+        return False
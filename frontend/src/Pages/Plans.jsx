@@ -1,7 +1,7 @@
 import { useState, useEffect } from "react";
 import axios from "axios";
 import { useNavigate } from "react-router-dom";
-import { API_ENDPOINTS } from "../config";
+import { API_ENDPOINTS, authHeaders } from "../config";
 
 export default function Plans() {
   const [plans, setPlans] = useState([]);
@@ -32,16 +32,19 @@ export default function Plans() {
 
     try {
       const res = await axios.post(API_ENDPOINTS.SUBSCRIPTIONS, {
-        user_id: user.id,
         plan_id: planId,
-      });
+      }, { headers: authHeaders() });
       setMessage("✅ Subscription successful! Check your subscriptions page.");
 
 
       setTimeout(() => setMessage(""), 5000);
     } catch (err) {
       // Handle overlap error specifically
-      if (err.response?.status === 409) {
+      if (err.response?.status === 401) {
+        localStorage.removeItem("user");
+        navigate("/login");
+        return;
+      } else if (err.response?.status === 409) {
         const errorData = err.response.data;
         setMessage(`❌ ${errorData.message || errorData.error}`);
       } else {
@@ -1,6 +1,9 @@
 import { useEffect, useState } from "react";
 import { useNavigate } from "react-router-dom";
-import { API_ENDPOINTS } from "../config";
+import { API_ENDPOINTS, LIVE_UPDATES, authHeaders } from "../config";
+
+const POLL_INTERVAL_MS = 60000;
+const STREAM_RETRY_MS = 3000;
 
 export default function Subscriptions() {
   const [subscriptions, setSubscriptions] = useState([]);
@@ -17,16 +20,97 @@ export default function Subscriptions() {
     const userObj = JSON.parse(savedUser);
     setUser(userObj);
 
-    fetch(API_ENDPOINTS.USER_SUBSCRIPTIONS(userObj.id))
-      .then((res) => res.json())
-      .then((data) => setSubscriptions(data))
-      .catch((err) => console.error("Error fetching subscriptions:", err));
+    let stopped = false;
+    let source = null;
+    let pollTimer = null;
+    let retryTimer = null;
+    let retryDelay = STREAM_RETRY_MS;
+
+    const logout = () => {
+      localStorage.removeItem("user");
+      navigate("/login");
+    };
+
+    const refresh = () =>
+      fetch(`${API_ENDPOINTS.USER_SUBSCRIPTIONS(userObj.id)}?active_only=true`, {
+        headers: authHeaders(),
+      })
+        .then((res) => {
+          if (res.status === 401) {
+            logout();
+            return null;
+          }
+          return res.json();
+        })
+        .then((data) => {
+          if (data && !stopped) setSubscriptions(data);
+        })
+        .catch((err) => console.error("Error fetching subscriptions:", err));
+
+    const poll = () => {
+      refresh();
+      pollTimer = setInterval(refresh, POLL_INTERVAL_MS);
+    };
+
+    // Live feed: a snapshot on connect, then pushes instead of re-fetching
+    const listen = async () => {
+      // The stream URL ends up in server logs, so it carries a short-lived stream token
+      const res = await fetch(API_ENDPOINTS.USER_SUBSCRIPTION_STREAM_TOKEN(userObj.id), {
+        method: "POST",
+        headers: authHeaders(),
+      });
+      if (res.status === 401) return logout();
+      if (!res.ok) return poll(); // Live updates are off on this server
+      const { stream_token } = await res.json();
+      if (stopped) return;
+
+      source = new EventSource(API_ENDPOINTS.USER_SUBSCRIPTION_EVENTS(userObj.id, stream_token));
+      source.addEventListener("snapshot", (e) => {
+        retryDelay = STREAM_RETRY_MS;
+        setSubscriptions(JSON.parse(e.data));
+      });
+      source.addEventListener("created", (e) => {
+        const sub = JSON.parse(e.data);
+        setSubscriptions((subs) => [sub, ...subs.filter((s) => s.id !== sub.id)]);
+      });
+      const remove = (e) => {
+        const { subscription_id } = JSON.parse(e.data);
+        setSubscriptions((subs) => subs.filter((s) => s.id !== subscription_id));
+      };
+      source.addEventListener("cancelled", remove);
+      source.addEventListener("expired", remove);
+      source.onerror = () => {
+        // The browser retries dropped streams itself; CLOSED means the server refused the
+        // reconnect, usually because the stream token expired or the server is at its stream
+        // limit. Neither means the session is over: refresh once, then get a new token.
+        if (source.readyState !== EventSource.CLOSED) return;
+        refresh();
+        retryTimer = setTimeout(() => {
+          if (!stopped) listen().catch(poll);
+        }, retryDelay);
+        retryDelay = Math.min(retryDelay * 2, POLL_INTERVAL_MS);
+      };
+    };
+
+    if (LIVE_UPDATES) {
+      listen().catch(poll);
+    } else {
+      poll();
+    }
+
+    return () => {
+      stopped = true;
+      source?.close();
+      clearInterval(pollTimer);
+      clearTimeout(retryTimer);
+    };
   }, [navigate]);
 
   const cancelSubscription = async (subId) => {
     try {
       await fetch(API_ENDPOINTS.CANCEL_SUBSCRIPTION(subId), {
         method: "DELETE",
+        headers: authHeaders(),
       });
       setSubscriptions(subscriptions.filter((sub) => sub.id !== subId));
     } catch (err) {
@@ -6,6 +6,9 @@ const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:5000';
 // Remove trailing slash if present
 export const API_BASE_URL = API_URL.replace(/\/$/, '');
 
+// Live subscription updates over Server-Sent Events; the backend must also set SSE_ENABLED
+export const LIVE_UPDATES = import.meta.env.VITE_LIVE_UPDATES === 'true';
+
 // API endpoints
 export const API_ENDPOINTS = {
   LOGIN: `${API_BASE_URL}/login`,
@@ -13,11 +16,20 @@ export const API_ENDPOINTS = {
   PLANS: `${API_BASE_URL}/plans`,
   SUBSCRIPTIONS: `${API_BASE_URL}/subscriptions`,
   USER_SUBSCRIPTIONS: (userId) => `${API_BASE_URL}/subscriptions/${userId}`,
+  USER_SUBSCRIPTION_EVENTS: (userId, streamToken) =>
+    `${API_BASE_URL}/subscriptions/${userId}/events?stream_token=${encodeURIComponent(streamToken)}`,
+  USER_SUBSCRIPTION_STREAM_TOKEN: (userId) => `${API_BASE_URL}/subscriptions/${userId}/events/token`,
   CANCEL_SUBSCRIPTION: (subId) => `${API_BASE_URL}/subscriptions/${subId}`,
   USERS: `${API_BASE_URL}/users`,
   USER_PLAN_HISTORY: `${API_BASE_URL}/user-plan-history`,
 };
 
+// Authorization header for the logged-in user's access token
+export const authHeaders = () => {
+  const user = JSON.parse(localStorage.getItem("user") || "null");
+  return user?.access_token ? { Authorization: `Bearer ${user.access_token}` } : {};
+};
+
 // Helper function for API calls with better error handling
 export const apiCall = async (url, options = {}) => {
   try {